@@ -0,0 +1,272 @@
+"""
+Chat backends: how a prompt reaches the model.
+
+A ChatBackend turns a context-aware prompt into an answer, forwarding response
+parts to an optional on_chunk callback as they arrive. CodexManager keeps the
+Codex CLI backend (defined in main, next to the process handling it uses) for
+requests that edit files, and can answer read-only requests through another
+backend.
+
+HTTPChatBackend talks to an OpenAI-compatible chat completions endpoint
+(OpenAI, Azure OpenAI or OpenRouter) in-process. It keeps one httpx client with
+a keep-alive connection pool per event loop, so consecutive requests reuse
+the same TLS connection instead of paying for a process start, a TLS handshake
+and CLI bootstrap on every message. Answers are streamed as server-sent events.
+The HTTP backend cannot see or change the workspace; it answers from the
+conversation context only.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from codex_parser import ASSISTANT_TEXT
+from structured_logging import get_logger, log_event, redact
+from tracing import current_trace
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only needed when AI_BACKEND=http
+    httpx = None
+
+log = get_logger("backend")
+
+# Callback invoked with (kind, text) for every response part
+ChunkCallback = Callable[[str, str], Awaitable[None]]
+
+SYSTEM_PROMPT = (
+    "You are the assistant of a website content management system. Answer questions about "
+    "the site and the conversation so far. You cannot read or modify the site's files."
+)
+
+# Provider defaults; AI_HTTP_BASE_URL and AI_HTTP_MODEL override them
+PROVIDERS = {
+    "openai": {"base_url": "https://api.openai.com/v1", "key": "OPENAI_API_KEY", "model": "gpt-4o-mini"},
+    "azure": {"base_url": None, "key": "AZURE_OPENAI_API_KEY", "model": "gpt-4o-mini"},
+    "openrouter": {"base_url": "https://openrouter.ai/api/v1", "key": "OPENROUTER_API_KEY",
+                   "model": "openai/gpt-4o-mini"},
+}
+
+
+class BackendConfigError(ValueError):
+    """The configured backend cannot be used"""
+
+
+def _configured(name: str) -> str:
+    """Environment value, treating the .env.example placeholders as unset"""
+    value = os.getenv(name, "")
+    return "" if value.startswith("your-") else value
+
+
+class ChatBackend:
+    """Interface shared by every way of reaching the model"""
+
+    name = "base"
+    description = "chat backend"
+    # Whether requests with auto_save (file edits) can be sent to this backend
+    can_edit_files = False
+
+    async def complete(self, prompt: str, session_id: str, cwd: str, auto_save: bool,
+                       on_chunk: Optional[ChunkCallback] = None) -> dict:
+        """Answer prompt; returns a result dict with success and stdout or error"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release pooled resources"""
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+@dataclass
+class HTTPBackendConfig:
+    """Where and how to send chat completion requests"""
+
+    provider: str
+    url: str
+    model: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    timeout: float = 120.0
+    max_connections: int = 10
+    keepalive_expiry: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "HTTPBackendConfig":
+        """Build the configuration from AI_HTTP_* and the provider key variables"""
+        provider = os.getenv("AI_HTTP_PROVIDER", "").lower()
+        if not provider:
+            # First provider with a real key, OpenAI when none has one
+            provider = next((name for name, spec in PROVIDERS.items() if _configured(spec["key"])), "openai")
+        if provider not in PROVIDERS:
+            raise BackendConfigError(f"Unknown AI_HTTP_PROVIDER {provider!r}, expected one of {', '.join(PROVIDERS)}")
+        spec = PROVIDERS[provider]
+        key = _configured(spec["key"])
+        model = os.getenv("AI_HTTP_MODEL") or spec["model"]
+        base_url = os.getenv("AI_HTTP_BASE_URL", "")
+
+        if provider == "azure":
+            endpoint = base_url or _configured("AZURE_OPENAI_ENDPOINT")
+            if not endpoint:
+                raise BackendConfigError("AZURE_OPENAI_ENDPOINT is not set")
+            deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT") or model
+            version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+            url = f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/chat/completions?api-version={version}"
+            headers = {"api-key": key}
+        else:
+            url = f"{(base_url or spec['base_url']).rstrip('/')}/chat/completions"
+            headers = {"Authorization": f"Bearer {key}"}
+
+        return cls(
+            provider=provider,
+            url=url,
+            model=model,
+            headers=headers,
+            timeout=float(os.getenv("AI_HTTP_TIMEOUT", "120")),
+            max_connections=int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("AI_HTTP_KEEPALIVE", "30")),
+        )
+
+
+def _error_message(status_code: int, body: bytes) -> str:
+    """Readable message from an OpenAI-style error response"""
+    try:
+        error = json.loads(body).get("error")
+        if isinstance(error, dict) and error.get("message"):
+            return error["message"]
+        if isinstance(error, str):
+            return error
+    except (ValueError, AttributeError):
+        pass
+    text = body.decode("utf-8", errors="replace").strip()
+    return text[:500] or f"HTTP {status_code}"
+
+
+class HTTPChatBackend(ChatBackend):
+    """Streaming chat completions over a pooled keep-alive HTTP client"""
+
+    name = "http"
+    can_edit_files = False
+
+    def __init__(self, config: HTTPBackendConfig):
+        if httpx is None:
+            raise BackendConfigError("AI_BACKEND=http requires httpx (pip install httpx)")
+        self.config = config
+        self.description = f"the {config.provider} API"
+        self.requests = 0
+        self.failures = 0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "HTTPChatBackend":
+        return cls(HTTPBackendConfig.from_env())
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        # Pooled connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers=self.config.headers,
+                timeout=httpx.Timeout(self.config.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.config.max_connections,
+                                    max_keepalive_connections=self.config.max_connections,
+                                    keepalive_expiry=self.config.keepalive_expiry),
+            )
+            self._loop = loop
+        return self._client
+
+    def request_body(self, prompt: str) -> dict:
+        return {
+            "model": self.config.model,
+            "stream": True,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+        }
+
+    async def complete(self, prompt: str, session_id: str, cwd: str, auto_save: bool,
+                       on_chunk: Optional[ChunkCallback] = None) -> dict:
+        trace = current_trace()
+        client = self._get_client()
+        self.requests += 1
+        started = time.perf_counter()
+        parts: List[str] = []
+        log_event(log, logging.INFO, "backend.request", backend=self.name, provider=self.config.provider,
+                  session_id=session_id, prompt=redact(prompt))
+
+        try:
+            async with client.stream("POST", self.config.url, json=self.request_body(prompt)) as response:
+                trace.add_span("request", started)
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    self.failures += 1
+                    error = _error_message(response.status_code, body)
+                    log_event(log, logging.WARNING, "backend.error", backend=self.name,
+                              status=response.status_code, error=error)
+                    if response.status_code in (401, 403):
+                        error = f"⚠️ {self.config.provider} API key rejected: {error}"
+                    return {"success": False, "error": error, "stderr": "", "stdout": "",
+                            "exit_code": None, "status_code": response.status_code}
+
+                first = True
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    # Keep reading past [DONE] so the connection goes back to the pool
+                    if payload == "[DONE]":
+                        continue
+                    event = json.loads(payload)
+                    if event.get("error"):
+                        raise ValueError(_error_message(200, json.dumps(event).encode("utf-8")))
+                    choices = event.get("choices") or [{}]
+                    text = (choices[0].get("delta") or {}).get("content")
+                    if not text:
+                        continue
+                    if first:
+                        trace.add_span("first_output", started)
+                        first = False
+                    parts.append(text)
+                    if on_chunk is not None:
+                        await on_chunk(ASSISTANT_TEXT, text)
+        except (httpx.HTTPError, ValueError) as e:
+            self.failures += 1
+            log_event(log, logging.WARNING, "backend.error", backend=self.name, error=str(e))
+            return {"success": False, "error": f"Error calling {self.description}: {e}", "stderr": "",
+                    "stdout": "".join(parts), "exit_code": None}
+
+        trace.add_span("exit", started)
+        log_event(log, logging.INFO, "backend.done", backend=self.name, session_id=session_id,
+                  seconds=round(time.perf_counter() - started, 3), chunks=len(parts))
+        answer = "".join(parts).strip() or "AI response received successfully"
+        return {"success": True, "stdout": answer, "stderr": "", "exit_code": 0, "chunks": len(parts)}
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "provider": self.config.provider,
+            "model": self.config.model,
+            "requests": self.requests,
+            "failures": self.failures,
+            "max_connections": self.config.max_connections,
+        }
+
+
+def create_readonly_backend() -> Optional[ChatBackend]:
+    """Backend for read-only chat from AI_BACKEND; None keeps the Codex CLI"""
+    kind = os.getenv("AI_BACKEND", "cli").lower()
+    if kind == "cli":
+        return None
+    if kind == "http":
+        return HTTPChatBackend.from_env()
+    raise BackendConfigError(f"Unknown AI_BACKEND {kind!r}, expected 'cli' or 'http'")
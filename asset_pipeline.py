@@ -0,0 +1,316 @@
+"""
+Build step for the frontend's static assets, run at startup.
+
+build() minifies each asset, names the result after a hash of its contents
+(styles.3f9a1c2b7d.css) and keeps gzip/brotli encoded copies in memory, also
+writing them to an output directory for inspection or a front proxy. Because a
+hashed URL never changes meaning, those files are served with a year-long
+immutable Cache-Control, and rewrite_html() points index.html at them so
+browsers stop revalidating the assets on every page load. refresh() rebuilds
+any asset whose source changed since, so edits show up without a restart.
+
+The minifiers are deliberately conservative: they strip comments and
+indentation but keep line breaks in JavaScript, so automatic semicolon
+insertion behaves exactly as in the source.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from static_page import ENCODINGS, compress
+
+# URL prefix the hashed assets are served under
+ASSETS_URL = "/assets"
+# Hashed names never change meaning, so browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+DEFAULT_ASSETS = ("styles.css", "script.js")
+
+MEDIA_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+}
+
+# Characters after which a "/" in JavaScript starts a regex literal, not a division
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^") | {""}
+# Keywords after which a "/" starts a regex literal; after any other word it divides
+_REGEX_KEYWORDS = {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+                   "throw", "case", "do", "else", "yield", "await"}
+
+
+def _regex_allowed(out: List[str], last: str) -> bool:
+    """Whether a "/" after the output so far starts a regex literal"""
+    if last in _REGEX_PRECEDERS:
+        return True
+    if not (last.isalnum() or last in "_$"):
+        return False
+    # Identifier characters are emitted one at a time: walk back over them
+    end = len(out) - 1
+    if out[end] == " ":
+        end -= 1
+    start = end
+    while start >= 0 and len(out[start]) == 1 and (out[start].isalnum() or out[start] in "_$"):
+        start -= 1
+    if start >= 0 and out[start] == ".":
+        return False  # A property such as x.return
+    return "".join(out[start + 1:end + 1]) in _REGEX_KEYWORDS
+
+
+def minify_css(source: str) -> str:
+    """Drop comments and redundant whitespace from a stylesheet"""
+    out: List[str] = []
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+        if char in "\"'":
+            end = i + 1
+            while end < n and source[end] != char:
+                end += 2 if source[end] == "\\" else 1
+            out.append(source[i:end + 1])
+            i = end + 1
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif char.isspace():
+            while i < n and source[i].isspace():
+                i += 1
+            out.append(" ")
+        else:
+            out.append(char)
+            i += 1
+
+    css = "".join(out)
+    # Whitespace around these is never significant; ":" is left alone because
+    # "a :hover" and "a:hover" are different selectors
+    css = re.sub(r" ?([{};,>]) ?", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def minify_js(source: str) -> str:
+    """Drop comments, indentation and blank lines from a script, keeping line breaks"""
+    out: List[str] = []
+    i, n = 0, len(source)
+    last = ""  # last significant character emitted, for regex detection
+    while i < n:
+        char = source[i]
+        if char in "\"'`":
+            # String and template literals are copied verbatim (template
+            # expressions containing backticks are not used by our scripts)
+            end = i + 1
+            while end < n and source[end] != char:
+                end += 2 if source[end] == "\\" else 1
+            out.append(source[i:end + 1])
+            last = char
+            i = end + 1
+        elif source.startswith("//", i):
+            while i < n and source[i] != "\n":
+                i += 1
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            if out and not out[-1].isspace():
+                out.append(" ")
+        elif char == "/" and _regex_allowed(out, last):
+            # Regex literal: copy up to the closing slash outside a character class
+            end, in_class = i + 1, False
+            while end < n and source[end] != "\n":
+                current = source[end]
+                if current == "\\":
+                    end += 2
+                    continue
+                if current == "[":
+                    in_class = True
+                elif current == "]":
+                    in_class = False
+                elif current == "/" and not in_class:
+                    break
+                end += 1
+            out.append(source[i:end + 1])
+            last = "/"
+            i = end + 1
+        elif char.isspace():
+            newline = False
+            while i < n and source[i].isspace():
+                newline = newline or source[i] == "\n"
+                i += 1
+            if not out or out[-1] == "\n":
+                continue
+            if newline:
+                if out[-1] == " ":
+                    out.pop()
+                out.append("\n")
+            elif out[-1] != " ":
+                out.append(" ")
+        else:
+            out.append(char)
+            last = char
+            i += 1
+    return "".join(out).strip() + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+class BuiltAsset:
+    """A minified, content-hashed asset and its encoded variants"""
+
+    __slots__ = ("source", "name", "media_type", "bodies")
+
+    def __init__(self, source: str, name: str, media_type: str, bodies: Dict[Optional[str], bytes]):
+        self.source = source
+        self.name = name
+        self.media_type = media_type
+        self.bodies = bodies
+
+    @property
+    def url(self) -> str:
+        return f"{ASSETS_URL}/{self.name}"
+
+
+def hashed_name(filename: str, data: bytes, length: int = 10) -> str:
+    """styles.css -> styles.<hash>.css"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:length]}{ext}"
+
+
+def _write_atomic(path: str, data: bytes):
+    # Several workers may build at once; never let one see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetPipeline:
+    """Builds hashed assets at startup and rewrites references to them"""
+
+    def __init__(self, source_dir: str = "static", output_dir: Optional[str] = "static/build",
+                 assets=DEFAULT_ASSETS, source_url: str = "/static", encodings=ENCODINGS):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.assets = assets
+        self.source_url = source_url
+        self.encodings = encodings
+        self.built: Dict[str, BuiltAsset] = {}
+        self.by_name: Dict[str, BuiltAsset] = {}
+        self.build_seconds: Optional[float] = None
+        # Bumped whenever built assets change; pages rewritten against an older one are stale
+        self.generation = 0
+        self._pattern: Optional[re.Pattern] = None
+        # (mtime_ns, size) of each source when it was last built
+        self._source_keys: Dict[str, Tuple[int, int]] = {}
+
+    def build(self) -> float:
+        """Minify, hash and precompress every asset; returns the build time in seconds"""
+        started = time.perf_counter()
+        built: Dict[str, BuiltAsset] = {}
+        for filename in self.assets:
+            built[filename] = self._build_one(filename)
+        self._install(built, built.values())
+        if built:
+            alternatives = "|".join(re.escape(filename) for filename in built)
+            self._pattern = re.compile(rf"{re.escape(self.source_url)}/({alternatives})(?![\w.-])")
+        else:
+            self._pattern = None
+        self.build_seconds = time.perf_counter() - started
+        return self.build_seconds
+
+    def refresh(self) -> int:
+        """Rebuild assets whose source changed since it was built; returns the generation.
+
+        Costs one stat per asset when nothing changed, so it can run on every
+        homepage revalidation and keep edits to the sources live without a restart.
+        """
+        if not self.built:
+            return self.generation
+        changed = []
+        for filename in self.built:
+            try:
+                if self._source_key(filename) != self._source_keys.get(filename):
+                    changed.append(filename)
+            except OSError:
+                continue  # Removed or unreadable: keep serving the last build
+        if changed:
+            built = dict(self.built)
+            rebuilt = []
+            for filename in changed:
+                try:
+                    built[filename] = self._build_one(filename)
+                except (OSError, UnicodeDecodeError):
+                    continue  # Half-written or unreadable: try again on the next check
+                rebuilt.append(built[filename])
+            if rebuilt:
+                self._install(built, rebuilt)
+        return self.generation
+
+    def _install(self, built: Dict[str, BuiltAsset], written):
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            for asset in written:
+                for encoding, body in asset.bodies.items():
+                    suffix = "" if encoding is None else f".{'br' if encoding == 'br' else 'gz'}"
+                    _write_atomic(os.path.join(self.output_dir, asset.name + suffix), body)
+        # New dicts, so request handlers reading the old ones are never disturbed
+        self.built = built
+        self.by_name = {asset.name: asset for asset in built.values()}
+        self.generation += 1
+
+    def _source_key(self, filename: str) -> Tuple[int, int]:
+        stat = os.stat(os.path.join(self.source_dir, filename))
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build_one(self, filename: str) -> BuiltAsset:
+        # Taken before reading, so a write during the build triggers another one
+        self._source_keys[filename] = self._source_key(filename)
+        with open(os.path.join(self.source_dir, filename), "r", encoding="utf-8") as f:
+            source = f.read()
+        ext = os.path.splitext(filename)[1]
+        minifier = MINIFIERS.get(ext)
+        data = (minifier(source) if minifier else source).encode("utf-8")
+
+        bodies: Dict[Optional[str], bytes] = {None: data}
+        for encoding in self.encodings:
+            encoded = compress(data, encoding)
+            if len(encoded) < len(data):
+                bodies[encoding] = encoded
+        return BuiltAsset(filename, hashed_name(filename, data), MEDIA_TYPES.get(ext, "application/octet-stream"), bodies)
+
+    def rewrite_html(self, html: bytes) -> bytes:
+        """Point references to source assets at their hashed, built copies"""
+        if self._pattern is None:
+            return html
+        text = html.decode("utf-8")
+        return self._pattern.sub(lambda match: self.built[match.group(1)].url, text).encode("utf-8")
+
+    def get(self, name: str) -> Optional[BuiltAsset]:
+        return self.by_name.get(name)
+
+    def stats(self) -> Dict[str, object]:
+        assets = {}
+        for filename, asset in self.built.items():
+            sizes: Dict[str, int] = {}
+            try:
+                sizes["source"] = os.path.getsize(os.path.join(self.source_dir, filename))
+            except OSError:
+                pass
+            for encoding, body in asset.bodies.items():
+                sizes[encoding or "minified"] = len(body)
+            assets[filename] = {"name": asset.name, "bytes": sizes}
+        return {
+            "build_ms": round(self.build_seconds * 1000, 2) if self.build_seconds is not None else None,
+            "assets": assets,
+        }
+
+
+def build_summary(pipeline: AssetPipeline) -> List[Tuple[str, int, int, int]]:
+    """(name, source bytes, minified bytes, smallest encoded bytes) per asset"""
+    rows = []
+    for filename, asset in pipeline.built.items():
+        source_size = os.path.getsize(os.path.join(pipeline.source_dir, filename))
+        minified = len(asset.bodies[None])
+        smallest = min(len(body) for body in asset.bodies.values())
+        rows.append((asset.name, source_size, minified, smallest))
+    return rows
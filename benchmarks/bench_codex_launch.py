@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Launch benchmark: Codex process start
+
+Measures the time from "start a Codex run" to the first byte of its stdout
+for two launch paths, using a stub codex that prints one line at once (so
+the numbers are pure launch overhead):
+
+    legacy  the original per-request setup: dict(os.environ), PATH lookup
+    cold    CodexLauncher: resolved binary and prebuilt environment
+
+With the real Node-based CLI both paths additionally pay Node start-up.
+
+Usage: python benchmarks/bench_codex_launch.py [runs] [stub]
+       (stub defaults to a /bin/sh script; pass a path to benchmark another binary)
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codex_runner import CodexLauncher  # noqa: E402
+
+STUB = '#!/bin/sh\necho \'{"type":"message","role":"assistant","content":"ok"}\'\n'
+
+
+async def first_byte(start_process) -> float:
+    started = time.perf_counter()
+    process = await start_process()
+    await process.stdout.read(1)
+    elapsed = time.perf_counter() - started
+    await process.communicate()
+    return elapsed
+
+
+async def measure(runs: int, cwd: str):
+    launcher = CodexLauncher()
+
+    async def legacy():
+        return await asyncio.create_subprocess_exec(
+            "codex", "-q", "hello", cwd=cwd,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            env=dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "")),
+            start_new_session=True,
+        )
+
+    async def cold():
+        return await launcher.spawn(launcher.command("hello", False), cwd)
+
+    results = {}
+    for name, start_process in (("legacy", legacy), ("cold", cold)):
+        await first_byte(start_process)  # warm up caches
+        results[name] = sorted([await first_byte(start_process) for _ in range(runs)])
+    return results
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as bin_dir:
+        if len(sys.argv) > 2:
+            os.symlink(os.path.abspath(sys.argv[2]), os.path.join(bin_dir, "codex"))
+        else:
+            stub = os.path.join(bin_dir, "codex")
+            with open(stub, "w") as f:
+                f.write(STUB)
+            os.chmod(stub, 0o755)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        results = asyncio.run(measure(runs, bin_dir))
+
+    print(f"time to first stdout byte over {runs} runs")
+    print(f"{'launch':>8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for name, values in results.items():
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{name:>8} {statistics.median(values) * 1000:>8.2f} {p95 * 1000:>8.2f} "
+              f"{statistics.fmean(values) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
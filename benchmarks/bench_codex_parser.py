@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: incremental Codex transcript parser vs the original buffered parser
+
+Generates synthetic multi-megabyte Codex JSONL transcripts and reports
+throughput and peak Python memory for each implementation.
+
+Usage: python benchmarks/bench_codex_parser.py [size_mb ...]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codex_parser import ERROR, CodexStreamParser  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def legacy_parse_codex_response(codex_output: str) -> str:
+    """Baseline CodexManager.parse_codex_response, kept for comparison"""
+    try:
+        # Split by lines and try to parse each JSON line
+        lines = codex_output.strip().split('\n')
+        responses = []
+        
+        for line in lines:
+            if not line.strip():
+                continue
+                
+            try:
+                data = json.loads(line)
+                
+                # Look for assistant messages
+                if data.get('type') == 'message' and data.get('role') == 'assistant':
+                    content = data.get('content', [])
+                    if isinstance(content, list):
+                        for item in content:
+                            if item.get('type') == 'output_text':
+                                responses.append(item.get('text', ''))
+                    elif isinstance(content, str):
+                        responses.append(content)
+                
+                # Look for function call outputs that might contain responses
+                elif data.get('type') == 'function_call_output':
+                    output_data = data.get('output', {})
+                    if isinstance(output_data, str):
+                        try:
+                            parsed_output = json.loads(output_data)
+                            if 'output' in parsed_output:
+                                responses.append(parsed_output['output'].strip())
+                        except json.JSONDecodeError:
+                            responses.append(output_data.strip())
+                    elif isinstance(output_data, dict) and 'output' in output_data:
+                        responses.append(output_data['output'].strip())
+                
+            except json.JSONDecodeError:
+                # If it's not JSON, it might be plain text response
+                if line.strip() and not line.startswith('{'):
+                    responses.append(line.strip())
+        
+        # Join all responses
+        if responses:
+            final_response = '\n'.join(responses).strip()
+            # Clean up any escape characters
+            final_response = final_response.replace('\\n', '\n').replace('\\"', '"')
+            return final_response or "Response processed successfully"
+        else:
+            # Fallback: return the first non-empty line that looks like text
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith('{') and len(line) > 10:
+                    return line
+            
+            return "AI response received successfully"
+            
+    except Exception as e:
+        print(f"Error parsing Codex response: {e}")
+        # Return a cleaned version of the original output as fallback
+        cleaned = codex_output.replace('\\n', '\n').replace('\\"', '"')
+        return cleaned[:500] + "..." if len(cleaned) > 500 else cleaned
+
+
+def build_transcript(size_mb: float) -> bytes:
+    """Build a realistic transcript mixing reasoning, tool calls and messages"""
+    file_body = "<div class=\"card\">Lorem ipsum dolor sit amet</div>\n" * 40
+    records = [
+        json.dumps({"type": "reasoning", "summary": ["Inspecting the workspace files " * 4]}),
+        json.dumps({"type": "function_call", "name": "shell",
+                    "arguments": json.dumps({"command": ["cat", "index.html"]})}),
+        json.dumps({"type": "function_call_output",
+                    "output": json.dumps({"output": file_body, "metadata": {"exit_code": 0}})}),
+        json.dumps({"type": "message", "role": "assistant",
+                    "content": [{"type": "output_text", "text": "Updated the hero section. " * 8}]}),
+    ]
+    block = ("\n".join(records) + "\n").encode("utf-8")
+    repeats = max(1, int(size_mb * 1024 * 1024 / len(block)))
+    return block * repeats
+
+
+def run_incremental(transcript: bytes) -> int:
+    """Feed the transcript in stdout-sized chunks, as execute_ai_chat does"""
+    parser = CodexStreamParser()
+    total = 0
+    for start in range(0, len(transcript), CHUNK_SIZE):
+        for event in parser.feed(transcript[start:start + CHUNK_SIZE]):
+            if event.kind != ERROR:
+                total += len(event.text)
+    for event in parser.close():
+        total += len(event.text)
+    return total
+
+
+def run_legacy(transcript: bytes) -> int:
+    """Decode the whole transcript and parse it with the original function"""
+    return len(legacy_parse_codex_response(transcript.decode("utf-8", errors="replace").strip()))
+
+
+def measure(func, transcript: bytes, repeat: int = 3):
+    """Return (best seconds, peak traced bytes); timing runs without tracemalloc"""
+    elapsed = min(_timed(func, transcript) for _ in range(repeat))
+    tracemalloc.start()
+    func(transcript)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def _timed(func, transcript: bytes) -> float:
+    start = time.perf_counter()
+    func(transcript)
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 8, 32]
+    print(f"{'size':>8} {'parser':>12} {'MB/s':>10} {'peak MB':>10}")
+    for size_mb in sizes:
+        transcript = build_transcript(size_mb)
+        actual_mb = len(transcript) / (1024 * 1024)
+        for name, func in (("legacy", run_legacy), ("incremental", run_incremental)):
+            elapsed, peak = measure(func, transcript)
+            print(f"{actual_mb:>7.1f}M {name:>12} {actual_mb / elapsed:>10.1f} {peak / (1024 * 1024):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
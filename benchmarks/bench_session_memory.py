@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: conversation history representation
+
+Fills 10k sessions x 20 messages (by default) with the original representation
+(dict messages holding datetime.now().isoformat() strings, dict sessions
+rewritten on every access) and with CodexManager's slotted records, and
+reports the traced Python heap for each.
+
+Usage: python benchmarks/bench_session_memory.py [sessions] [messages_per_session]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import CodexManager  # noqa: E402
+
+
+def make_content(session: int, index: int) -> str:
+    """Distinct, realistically sized message text"""
+    return f"Session {session} message {index}: please update the landing page hero copy. " * 2
+
+
+def fill_legacy(sessions: int, messages: int):
+    """The original representation, as built by the baseline CodexManager"""
+    session_data = {}
+    conversation_history = {}
+    for s in range(sessions):
+        session_id = f"session-{s:08d}"
+        session_data[session_id] = {
+            "created_at": datetime.now().isoformat(),
+            "last_activity": datetime.now().isoformat(),
+        }
+        history = conversation_history[session_id] = []
+        for m in range(messages):
+            session_data[session_id]["last_activity"] = datetime.now().isoformat()
+            history.append({
+                "role": "user" if m % 2 == 0 else "assistant",
+                "content": make_content(s, m),
+                "timestamp": datetime.now().isoformat(),
+            })
+    return session_data, conversation_history
+
+
+def fill_current(sessions: int, messages: int):
+    """The slotted-record representation used by CodexManager today"""
+    manager = CodexManager(max_sessions=sessions + 1)
+    for s in range(sessions):
+        session_id = f"session-{s:08d}"
+        for m in range(messages):
+            manager.add_to_conversation(session_id, "user" if m % 2 == 0 else "assistant", make_content(s, m))
+    return manager
+
+
+def measure(fill, sessions: int, messages: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = fill(sessions, messages)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    total = sessions * messages
+    content_bytes = sum(sys.getsizeof(make_content(0, m)) for m in range(messages)) * sessions
+
+    print(f"{sessions} sessions x {messages} messages ({total} messages, ~{content_bytes / 2**20:.1f} MiB of text)")
+    print(f"{'representation':>16} {'total MiB':>10} {'overhead MiB':>13} {'bytes/msg':>10}")
+    for name, fill in (("legacy dicts", fill_legacy), ("slotted records", fill_current)):
+        used = measure(fill, sessions, messages)
+        overhead = used - content_bytes
+        print(f"{name:>16} {used / 2**20:>10.1f} {overhead / 2**20:>13.1f} {used / total:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the codex CLI used by the load test
+
+Emits a realistic Codex JSONL transcript (reasoning, a shell call and its
+output, then the assistant's answer in several parts) without touching the
+network. Shape and timing come from environment variables:
+
+    FAKE_CODEX_LATENCY   seconds before the first line (model "thinking"), default 0.2
+    FAKE_CODEX_BYTES     approximate transcript size in bytes, default 4096
+    FAKE_CODEX_PARTS     assistant message parts, default 4
+    FAKE_CODEX_INTERVAL  seconds between parts, default 0.05
+    FAKE_CODEX_EXIT      exit code, default 0
+"""
+import json
+import os
+import sys
+import time
+
+WORDS = ("update", "the", "landing", "page", "hero", "copy", "and", "tighten", "spacing", "on", "mobile")
+
+
+def filler(size: int) -> str:
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(size // 6 + 1))
+    return text[:size]
+
+
+def emit(record: dict):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    if "--version" in sys.argv[1:]:
+        print("codex-cli 0.0.0-fake")
+        return 0
+
+    latency = float(os.getenv("FAKE_CODEX_LATENCY", "0.2"))
+    size = int(os.getenv("FAKE_CODEX_BYTES", "4096"))
+    parts = max(1, int(os.getenv("FAKE_CODEX_PARTS", "4")))
+    interval = float(os.getenv("FAKE_CODEX_INTERVAL", "0.05"))
+
+    time.sleep(latency)
+    emit({"type": "reasoning", "summary": [{"type": "summary_text", "text": filler(min(size // 8, 400))}]})
+    emit({"type": "function_call", "name": "shell", "arguments": json.dumps({"command": ["cat", "index.html"]})})
+    emit({"type": "function_call_output",
+          "output": json.dumps({"output": filler(size // 4), "metadata": {"exit_code": 0}})})
+
+    part_size = max(1, size // 2 // parts)
+    for index in range(parts):
+        if index:
+            time.sleep(interval)
+        emit({"type": "message", "role": "assistant",
+              "content": [{"type": "output_text", "text": filler(part_size)}]})
+    return int(os.getenv("FAKE_CODEX_EXIT", "0"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
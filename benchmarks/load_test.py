@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Load test: N concurrent /ws clients against a local server and a fake codex
+
+Starts the server with benchmarks/fake_codex.py installed as `codex` on PATH
+(so no API key or network is needed), connects --clients WebSocket clients and
+has each one send --requests commands drawn from --mix, waiting for every
+answer before sending the next. Reports throughput, p50/p95/p99 latency per
+command and the server's resident memory.
+
+Usage:
+    python benchmarks/load_test.py --clients 20 --requests 10
+    python benchmarks/load_test.py --mix ai_chat=1 --latency 1.0 --bytes 65536
+    python benchmarks/load_test.py --url ws://localhost:8000/ws   # existing server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_CODEX = os.path.join(ROOT, "benchmarks", "fake_codex.py")
+
+# Frame that completes each command
+RESPONSE_TYPES = {
+    "ai_chat": "ai_response",
+    "get_conversation_history": "conversation_history",
+    "clear_conversation": "conversation_cleared",
+}
+DEFAULT_MIX = "ai_chat=6,get_conversation_history=3,clear_conversation=1"
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in RESPONSE_TYPES:
+            raise SystemExit(f"Unknown command in --mix: {name}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident bytes of pid and its worker children, excluding fake codex runs (Linux only)"""
+    pids = [pid]
+    try:
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        if int(f.read().rsplit(")", 1)[1].split()[1]) != pid:
+                            continue
+                    with open(f"/proc/{entry}/cmdline", "rb") as f:
+                        if b"fake_codex" in f.read():
+                            continue
+                    pids.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+    except OSError:
+        return 0
+
+    total = 0
+    for child in pids:
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class Server:
+    """The CMS server in a subprocess with the fake codex on PATH"""
+
+    def __init__(self, args, workdir: str):
+        self.port = free_port()
+        bin_dir = os.path.join(workdir, "bin")
+        os.makedirs(bin_dir)
+        codex = os.path.join(bin_dir, "codex")
+        with open(codex, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_CODEX}" "$@"\n')
+        os.chmod(codex, 0o755)
+
+        env = dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            FAKE_CODEX_LATENCY=str(args.latency),
+            FAKE_CODEX_BYTES=str(args.bytes),
+            FAKE_CODEX_PARTS=str(args.parts),
+            FAKE_CODEX_INTERVAL=str(args.interval),
+            CODEX_MAX_CONCURRENCY=str(args.concurrency),
+            CODEX_MAX_QUEUE=str(args.max_queue),
+            LOG_LEVEL="WARNING",
+        )
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                   "--port", str(self.port), "--log-level", "warning"]
+        if args.workers > 1:
+            command += ["--workers", str(args.workers)]
+            env["CODEX_HISTORY_BACKEND"] = "sqlite"
+            env["CODEX_HISTORY_DB"] = os.path.join(workdir, "conversations.db")
+        self.process = subprocess.Popen(command, cwd=ROOT, env=env)
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/ws"
+
+    def wait_ready(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"Server exited with {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/health", timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise SystemExit("Server did not become healthy in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def run_client(url: str, client_index: int, args, mix: Dict[str, int], workspace: str,
+                     results: Dict[str, List[float]], errors: Dict[str, int]):
+    rng = random.Random(args.seed + client_index)
+    commands, weights = list(mix), list(mix.values())
+    async with websockets.connect(url, max_size=None) as ws:
+        json.loads(await ws.recv())  # session frame
+        for index in range(args.requests):
+            command = rng.choices(commands, weights)[0]
+            request_id = f"c{client_index}-r{index}"
+            message = {"type": command, "request_id": request_id}
+            if command == "ai_chat":
+                message.update(prompt=f"Client {client_index} request {index}: tweak the hero copy",
+                               workspace=workspace, auto_save=True, stream=args.stream)
+
+            started = time.perf_counter()
+            await ws.send(json.dumps(message))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame.get("request_id") == request_id and frame.get("type") == RESPONSE_TYPES[command]:
+                    break
+            elapsed = time.perf_counter() - started
+
+            results.setdefault(command, []).append(elapsed)
+            if command == "ai_chat" and not frame["result"].get("success"):
+                errors[command] = errors.get(command, 0) + 1
+
+
+async def sample_rss(pid: int, samples: List[int], interval: float = 0.2):
+    while True:
+        samples.append(process_tree_rss(pid))
+        await asyncio.sleep(interval)
+
+
+async def run_load(url: str, args, mix: Dict[str, int], workspace: str, server_pid: Optional[int]) -> dict:
+    results: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    rss: List[int] = []
+    sampler = asyncio.create_task(sample_rss(server_pid, rss)) if server_pid else None
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(url, i, args, mix, workspace, results, errors) for i in range(args.clients)))
+    duration = time.perf_counter() - started
+
+    if sampler is not None:
+        sampler.cancel()
+        rss.append(process_tree_rss(server_pid))
+
+    total = sum(len(values) for values in results.values())
+    report = {
+        "clients": args.clients,
+        "requests": total,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 2) if duration else 0.0,
+        "commands": {},
+        "server_rss_mib": None,
+    }
+    for command, values in sorted(results.items()):
+        values.sort()
+        report["commands"][command] = {
+            "count": len(values),
+            "errors": errors.get(command, 0),
+            "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    if rss:
+        report["server_rss_mib"] = {
+            "start": round(rss[0] / 2**20, 1),
+            "peak": round(max(rss) / 2**20, 1),
+            "end": round(rss[-1] / 2**20, 1),
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['clients']} clients, {report['requests']} requests in {report['duration_s']} s "
+          f"-> {report['throughput_rps']} req/s")
+    print(f"{'command':>26} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for command, stats in report["commands"].items():
+        print(f"{command:>26} {stats['count']:>6} {stats['errors']:>6} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}")
+    if report["server_rss_mib"]:
+        rss = report["server_rss_mib"]
+        print(f"server RSS: {rss['start']} MiB at start, {rss['peak']} MiB peak, {rss['end']} MiB at end")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="concurrent WebSocket clients")
+    parser.add_argument("--requests", type=int, default=10, help="commands sent by each client")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"command weights (default {DEFAULT_MIX})")
+    parser.add_argument("--stream", action="store_true", help="request streamed ai_chat chunks")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake codex delay before output (s)")
+    parser.add_argument("--bytes", type=int, default=4096, help="fake codex transcript size")
+    parser.add_argument("--parts", type=int, default=4, help="assistant parts per fake answer")
+    parser.add_argument("--interval", type=float, default=0.05, help="delay between answer parts (s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="server CODEX_MAX_CONCURRENCY")
+    parser.add_argument("--max-queue", type=int, default=256, help="server CODEX_MAX_QUEUE")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--url", help="run against an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workspace = os.path.join(workdir, "workspace")
+        os.makedirs(workspace)
+        server = None
+        url = args.url
+        if url is None:
+            server = Server(args, workdir)
+            server.wait_ready()
+            url = server.url
+        try:
+            report = asyncio.run(run_load(url, args, mix, workspace, server.process.pid if server else None))
+        finally:
+            if server is not None:
+                server.stop()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Incremental parser for Codex CLI JSONL transcripts.
+
+Codex prints one JSON object per line while it works. CodexStreamParser consumes
+raw stdout bytes in arbitrary chunks, carries partial lines across chunk
+boundaries and yields typed CodexEvent records in a single pass, so a transcript
+never has to be held in memory as a whole.
+"""
+
+import json
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+# Event kinds
+ASSISTANT_TEXT = "assistant"
+TOOL_OUTPUT = "tool_output"
+PLAIN_TEXT = "text"
+ERROR = "error"
+
+# Only lines mentioning one of these are worth decoding as JSON; everything else
+# Codex emits (reasoning, function calls, status records) is skipped unparsed.
+_interesting_line = re.compile(rb'"(?:assistant|function_call_output|error)"').search
+
+_NO_EVENTS = ()
+
+
+class CodexEvent(NamedTuple):
+    """A typed piece of Codex output"""
+    kind: str
+    text: str
+
+
+class CodexStreamParser:
+    """Single-pass, chunk-fed parser for Codex CLI stdout"""
+
+    def __init__(self):
+        # Pieces of the current, not yet newline-terminated line
+        self._pending: List[bytes] = []
+        self.lines_seen = 0
+        self.bytes_seen = 0
+
+    def feed(self, data: bytes) -> Iterator[CodexEvent]:
+        """Consume a chunk of stdout and yield events for every completed line"""
+        self.bytes_seen += len(data)
+        if b"\n" not in data:
+            # Still inside a (possibly very long) line; defer joining until it ends
+            if data:
+                self._pending.append(data)
+            return
+
+        if self._pending:
+            self._pending.append(data)
+            data = b"".join(self._pending)
+            self._pending.clear()
+
+        lines = data.split(b"\n")
+        tail = lines.pop()
+        if tail:
+            self._pending.append(tail)
+
+        parse_line = self._parse_line
+        for line in lines:
+            events = parse_line(line)
+            if events:
+                yield from events
+
+    def close(self) -> Iterator[CodexEvent]:
+        """Flush a final line that was not newline-terminated"""
+        if self._pending:
+            line = b"".join(self._pending)
+            self._pending.clear()
+            yield from self._parse_line(line)
+
+    def _parse_line(self, raw_line: bytes) -> Sequence[CodexEvent]:
+        line = raw_line.strip()
+        if not line:
+            return _NO_EVENTS
+        self.lines_seen += 1
+
+        if line[:1] != b"{":
+            # If it's not a JSON object, it might be plain text response
+            text = line.decode("utf-8", errors="replace")
+            try:
+                json.loads(text)
+            except ValueError:
+                return [CodexEvent(PLAIN_TEXT, text)]
+            return _NO_EVENTS
+
+        if _interesting_line(line) is None:
+            return _NO_EVENTS
+
+        try:
+            data = json.loads(line.decode("utf-8", errors="replace"))
+        except ValueError:
+            return _NO_EVENTS
+        if not isinstance(data, dict):
+            return _NO_EVENTS
+
+        events = []
+        event_type = data.get("type")
+        # Look for assistant messages
+        if event_type == "message" and data.get("role") == "assistant":
+            content = data.get("content", [])
+            if isinstance(content, list):
+                for item in content:
+                    if isinstance(item, dict) and item.get("type") == "output_text":
+                        events.append(CodexEvent(ASSISTANT_TEXT, item.get("text", "")))
+            elif isinstance(content, str):
+                events.append(CodexEvent(ASSISTANT_TEXT, content))
+
+        # Look for function call outputs that might contain responses
+        elif event_type == "function_call_output":
+            output = _function_output_text(data.get("output", {}))
+            if output is not None:
+                events.append(CodexEvent(TOOL_OUTPUT, output))
+
+        elif event_type == "error":
+            message = data.get("message") or data.get("error") or ""
+            events.append(CodexEvent(ERROR, str(message)))
+
+        return events
+
+
+def _function_output_text(output_data) -> Optional[str]:
+    """Extract the text of a function_call_output payload"""
+    if isinstance(output_data, dict):
+        if "output" in output_data:
+            return str(output_data["output"]).strip()
+        return None
+
+    if not isinstance(output_data, str):
+        return None
+
+    # Only payloads that look like JSON objects are decoded a second time
+    if output_data.lstrip().startswith("{"):
+        try:
+            parsed_output = json.loads(output_data)
+        except ValueError:
+            return output_data.strip()
+        if isinstance(parsed_output, dict):
+            if "output" in parsed_output:
+                return str(parsed_output["output"]).strip()
+            return None
+    return output_data.strip()
+
+
+def iter_codex_events(chunks: Iterable[bytes]) -> Iterator[CodexEvent]:
+    """Yield events from an iterable of raw stdout chunks"""
+    parser = CodexStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
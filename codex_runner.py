@@ -0,0 +1,85 @@
+"""
+Launching Codex CLI processes.
+
+CodexLauncher does the per-process setup once instead of on every request: it
+resolves the codex binary to an absolute path, builds the base environment
+and validates the configuration. Both are rebuilt only when PATH changes.
+"""
+
+import asyncio
+import os
+import shutil
+from typing import Dict, List, Optional
+
+
+class CodexLauncher:
+    """Resolved codex binary and base environment, shared by every run"""
+
+    def __init__(self, binary: Optional[str] = None):
+        self.binary = binary or os.getenv("CODEX_BINARY", "codex")
+        self._path_key: Optional[str] = None
+        self._resolved: Optional[str] = None
+        self._env: Dict[str, str] = {}
+
+    def _refresh(self):
+        path_key = os.environ.get("PATH", "")
+        if path_key == self._path_key:
+            return
+        self._path_key = path_key
+        self._resolved = shutil.which(self.binary)
+        self._env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", ""))
+
+    @property
+    def resolved(self) -> Optional[str]:
+        """Absolute path to codex, or None if it could not be resolved"""
+        self._refresh()
+        return self._resolved
+
+    @property
+    def executable(self) -> str:
+        """Absolute path to codex, or the bare name if it could not be resolved"""
+        return self.resolved or self.binary
+
+    @property
+    def env(self) -> Dict[str, str]:
+        self._refresh()
+        return self._env
+
+    def command(self, prompt: str, auto_save: bool) -> List[str]:
+        """argv for a non-interactive Codex run"""
+        argv = [self.executable, "-q"]  # -q for quiet/non-interactive mode
+        if auto_save:
+            argv.append("--full-auto")
+        argv.append(prompt)
+        return argv
+
+    def validate(self, timeout: float, kill_grace: float) -> List[str]:
+        """Configuration problems worth reporting at startup"""
+        # Startup is the one place a fresh resolution is wanted
+        self._path_key = None
+        self._refresh()
+        problems = []
+        if self._resolved is None:
+            problems.append(f"{self.binary} not found on PATH")
+        elif not os.access(self._resolved, os.X_OK):
+            problems.append(f"{self._resolved} is not executable")
+        if not self._env.get("OPENAI_API_KEY"):
+            problems.append("OPENAI_API_KEY is not set")
+        if timeout <= 0:
+            problems.append(f"Codex timeout must be positive, got {timeout}")
+        if kill_grace < 0:
+            problems.append(f"CODEX_KILL_GRACE must not be negative, got {kill_grace}")
+        return problems
+
+    async def spawn(self, argv: List[str], cwd: str):
+        """Start a Codex process the usual way"""
+        return await asyncio.create_subprocess_exec(
+            *argv,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self.env,
+            # Own process group, so cancellation reaches tool subprocesses too
+            start_new_session=True
+        )
+
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures
+"""
+import threading
+
+import pytest
+
+import dev_server
+
+
+@pytest.fixture
+def start_dev_server(monkeypatch):
+    """Start dev_server on a free port serving root; returns the running ThreadingHTTPServer.
+
+    The handler's shared state is set for the test and restored afterwards;
+    page_cache defaults to a fresh, empty InjectedPageCache.
+    """
+    servers = []
+
+    def start(root, broadcaster=None, page_cache=None, file_index=None):
+        monkeypatch.chdir(root)
+        handler = dev_server.ReloadableHTTPRequestHandler
+        monkeypatch.setattr(handler, "reload_broadcaster", broadcaster)
+        monkeypatch.setattr(handler, "page_cache", page_cache or dev_server.InjectedPageCache())
+        monkeypatch.setattr(handler, "file_index", file_index)
+        httpd = dev_server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,193 @@
+"""
+Incrementally maintained conversation context.
+
+A Conversation keeps the recent messages of a session in a bounded deque, with
+the prompt cost of each message's context snippet computed once when it is
+added. Messages that fall out of the window leave a short gist in a rolling
+summary. build_prompt then assembles the context newest-first until a token
+budget is spent, instead of rebuilding fixed-size slices on every request;
+whatever budget the recent messages leave goes to the newest gists.
+"""
+
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+# Rough characters-per-token ratio for English text and code; avoids pulling in a tokenizer
+CHARS_PER_TOKEN = 4
+
+CONTEXT_HEADER = "Previous conversation context:"
+REQUEST_HEADER = "\nCurrent request:"
+SUMMARY_PREFIX = "Earlier: "
+
+# Offset turning time.monotonic() readings into Unix timestamps
+_MONOTONIC_TO_WALL = time.time() - time.monotonic()
+
+
+def format_timestamp(monotonic_ts: float) -> str:
+    """ISO-8601 wall-clock time for a time.monotonic() reading"""
+    return datetime.fromtimestamp(monotonic_ts + _MONOTONIC_TO_WALL).isoformat()
+
+
+def parse_timestamp(iso_timestamp: str) -> float:
+    """time.monotonic()-based reading for an ISO-8601 wall-clock time"""
+    return datetime.fromisoformat(iso_timestamp).timestamp() - _MONOTONIC_TO_WALL
+
+
+class Message:
+    """A conversation message; the timestamp is only formatted when serialised"""
+
+    __slots__ = ("role", "content", "created", "tokens")
+
+    def __init__(self, role: str, content: str, created: Optional[float] = None):
+        self.role = role
+        self.content = content
+        self.created = time.monotonic() if created is None else created
+        # Estimated prompt cost of this message's context line, set by Conversation
+        self.tokens = 0
+
+    @property
+    def timestamp(self) -> str:
+        return format_timestamp(self.created)
+
+    def to_dict(self) -> dict:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Message":
+        return cls(data["role"], data["content"], parse_timestamp(data["timestamp"]))
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content[:30]!r})"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, marking the cut with an ellipsis"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "..."
+
+
+class Conversation:
+    """Bounded message window with precomputed prompt costs and a rolling summary"""
+
+    __slots__ = ("max_messages", "snippet_tokens", "gist_chars", "summary_items", "messages", "_summary")
+
+    def __init__(self, messages: Iterable[Message] = (), max_messages: int = 20,
+                 snippet_tokens: int = 50, gist_chars: int = 60, summary_items: int = 20):
+        self.max_messages = max_messages
+        self.snippet_tokens = snippet_tokens
+        self.gist_chars = gist_chars
+        self.summary_items = summary_items
+        self.messages: deque = deque(maxlen=max_messages)
+        # One-line gists of messages that left the window, oldest first; created on first use
+        self._summary: Optional[deque] = None
+        for message in messages:
+            self.append(message)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.messages)
+
+    def __getitem__(self, index) -> Message:
+        return self.messages[index]
+
+    def to_list(self) -> List[dict]:
+        """Messages as JSON-serialisable dicts"""
+        return [message.to_dict() for message in self.messages]
+
+    def append(self, message: Message):
+        """Add a message, folding the one it displaces into the summary"""
+        if len(self.messages) == self.max_messages:
+            if self._summary is None:
+                self._summary = deque(maxlen=self.summary_items)
+            self._summary.append(self._gist(self.messages[0]))
+
+        # len(role) + len(": "), plus the snippet, which is capped at snippet_tokens
+        snippet_chars = min(len(message.content), self.snippet_tokens * CHARS_PER_TOKEN + 3)
+        message.tokens = (len(message.role) + 2 + snippet_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        self.messages.append(message)
+
+    def clear(self):
+        self.messages.clear()
+        self._summary = None
+
+    def summary(self) -> Optional[str]:
+        """Rolling summary of messages no longer in the window"""
+        if not self._summary:
+            return None
+        return SUMMARY_PREFIX + " | ".join(self._summary)
+
+    def summary_within(self, max_tokens: int) -> Optional[str]:
+        """Rolling summary cut to max_tokens, keeping the most recent gists"""
+        if not self._summary:
+            return None
+        budget = max_tokens * CHARS_PER_TOKEN - len(SUMMARY_PREFIX)
+        gists: List[str] = []
+        for gist in reversed(self._summary):
+            # Each gist after the first costs its " | " separator too
+            budget -= len(gist) + (3 if gists else 0)
+            if budget < 0:
+                break
+            gists.append(gist)
+        if not gists:
+            return None
+        return SUMMARY_PREFIX + " | ".join(reversed(gists))
+
+    def snippet(self, message: Message) -> str:
+        """Context line for a message"""
+        return f"{message.role.capitalize()}: {truncate_to_tokens(message.content, self.snippet_tokens)}"
+
+    def build_prompt(self, new_prompt: str, token_budget: int) -> str:
+        """Assemble recent context plus the new prompt within token_budget"""
+        if not self.messages:
+            # First message, no context needed
+            return new_prompt
+
+        remaining = token_budget - estimate_tokens(new_prompt) \
+            - estimate_tokens(CONTEXT_HEADER) - estimate_tokens(REQUEST_HEADER)
+
+        # Costs are precomputed, so choosing messages never touches their text
+        selected: List[Message] = []
+        for message in reversed(self.messages):
+            if message.tokens > remaining:
+                break
+            selected.append(message)
+            remaining -= message.tokens
+
+        context_parts = [CONTEXT_HEADER]
+        # Whatever the recent messages left over goes to gists of older ones
+        summary = self.summary_within(remaining)
+        if summary:
+            context_parts.append(summary)
+        context_parts.extend(self.snippet(message) for message in reversed(selected))
+
+        if len(context_parts) == 1:
+            # Not even the latest message fits the budget
+            return new_prompt
+
+        context_parts.append(REQUEST_HEADER)
+        context_parts.append(new_prompt)
+        return "\n".join(context_parts)
+
+    def _gist(self, message: Message) -> str:
+        content = " ".join(message.content.split())
+        if len(content) > self.gist_chars:
+            content = content[:self.gist_chars] + "..."
+        return f"{message.role}: {content}"
+
+    def approx_size(self) -> int:
+        """Bytes held by the rolling summary"""
+        if not self._summary:
+            return 0
+        return sys.getsizeof(self._summary) + sum(sys.getsizeof(gist) for gist in self._summary)
@@ -1,55 +1,203 @@
 #!/usr/bin/env python3
 """
 Development server with auto-reload functionality for HTML files.
-Serves static files and automatically refreshes the browser when files change.
+Serves static files and automatically refreshes the browser when files change:
+the watcher pushes reload events to open pages over Server-Sent Events
+(/__reload), and stylesheet changes are swapped in without a page reload.
 """
 
 import os
+import io
 import sys
-import time
+import json
+import email.utils
+import datetime
+import hashlib
+import queue
 import asyncio
 import threading
+from collections import OrderedDict
 from pathlib import Path
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 from socketserver import ThreadingMixIn
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 import webbrowser
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs
 
-class AutoReloadHandler(FileSystemEventHandler):
-    """Handler for file system events that triggers browser refresh."""
+from file_events import ChangeBatcher, CoalescingEventHandler, PathFilter
+from file_index import FileIndexService
+from static_page import etag_matches
+
+# Injected before </body>: listens for reload events pushed over Server-Sent Events
+RELOAD_SCRIPT = '''
+<script>
+(function() {
+    if (!window.EventSource) return;
+    let connected = false;
+    const source = new EventSource('/__reload');
     
-    def __init__(self, websocket_clients):
-        self.websocket_clients = websocket_clients
-        self.last_reload = 0
-        
-    def on_modified(self, event):
-        """Called when a file is modified."""
-        if event.is_directory:
-            return
-            
-        # Debounce rapid file changes
-        current_time = time.time()
-        if current_time - self.last_reload < 0.5:  # 500ms debounce
-            return
-        self.last_reload = current_time
+    source.addEventListener('open', () => {
+        // A reconnect means the server restarted, and files may have changed meanwhile
+        if (connected) window.location.reload();
+        connected = true;
+    });
+    
+    source.addEventListener('reload', () => {
+        console.log('🔄 Reloading page due to file changes...');
+        window.location.reload();
+    });
+    
+    source.addEventListener('css', (event) => {
+        // Swap changed stylesheets in place, keeping scroll position and page state
+        const paths = JSON.parse(event.data).paths;
+        const links = document.querySelectorAll('link[rel="stylesheet"]');
+        let swapped = 0;
+        links.forEach(link => {
+            const url = new URL(link.href, window.location.href);
+            if (url.origin !== window.location.origin || !paths.includes(url.pathname)) return;
+            url.searchParams.set('v', Date.now());
+            const replacement = link.cloneNode();
+            replacement.href = url.toString();
+            replacement.addEventListener('load', () => link.remove());
+            link.after(replacement);
+            swapped++;
+        });
+        // A stylesheet this page does not link (e.g. @import-ed) needs a full reload
+        if (swapped === 0) window.location.reload();
+        else console.log('🎨 Hot-swapped stylesheets:', paths);
+    });
+    
+    console.log('🚀 Auto-reload enabled - page will refresh when files change');
+})();
+</script>
+'''
+
+def inject_reload_script(content):
+    """Insert the reload script before closing body tag, or before closing html tag if no body."""
+    if '</body>' in content:
+        return content.replace('</body>', RELOAD_SCRIPT + '\n</body>')
+    if '</html>' in content:
+        return content.replace('</html>', RELOAD_SCRIPT + '\n</html>')
+    return content + RELOAD_SCRIPT
+
+class InjectedPage:
+    """One HTML file with the reload script injected, ready to send."""
+    
+    __slots__ = ('stat_key', 'body', 'etag', 'mtime')
+    
+    def __init__(self, stat_key, body, mtime):
+        self.stat_key = stat_key
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.mtime = mtime
+
+class InjectedPageCache:
+    """Injected HTML pages keyed by path and validated against (mtime, size) on every request."""
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path):
+        stat = os.stat(path)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            page = self.entries.get(path)
+            if page is not None and page.stat_key == stat_key:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return page
+            self.misses += 1
         
-        # Check if it's a relevant file type
-        file_path = event.src_path
-        relevant_extensions = {'.html', '.css', '.js', '.htm', '.xml', '.json'}
-        if any(file_path.endswith(ext) for ext in relevant_extensions):
-            print(f"📝 File changed: {file_path}")
-            self.trigger_reload()
-    
-    def trigger_reload(self):
-        """Trigger browser reload via WebSocket or inject script."""
-        print("🔄 Triggering page reload...")
-        # In a simple setup, we'll use the injection method
+        # Read after stat: a write in between changes the key again, so the next request reloads
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        page = InjectedPage(stat_key, inject_reload_script(content).encode('utf-8'), stat.st_mtime)
+        with self.lock:
+            self.entries[path] = page
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return page
+
+class ReloadBroadcaster:
+    """Pushes reload events to every connected /__reload stream."""
+    
+    def __init__(self, heartbeat=15.0):
+        self.heartbeat = heartbeat
+        self.clients = set()
+        self.lock = threading.Lock()
+    
+    def subscribe(self):
+        """Register a client; returns the queue its events arrive on."""
+        client = queue.Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+    
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+    
+    def broadcast(self, event, data=None):
+        """Send an event (with optional JSON data) to every client."""
+        message = f"event: {event}\ndata: {json.dumps(data or {})}\n\n".encode('utf-8')
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(message)
+        return len(clients)
+    
+    def close(self):
+        """End every stream."""
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(None)
+
+# Files whose changes reload open pages
+RELOAD_PATTERNS = ('*.html', '*.htm', '*.css', '*.js', '*.xml', '*.json')
+# Quiet period that ends a burst of file events; one reload is sent per burst
+RELOAD_SETTLE = 0.2
+
+class AutoReloadHandler(CoalescingEventHandler):
+    """Batches file system events and pushes one browser refresh per burst."""
+    
+    def __init__(self, broadcaster, root=".", settle=RELOAD_SETTLE):
+        self.broadcaster = broadcaster
+        self.root = os.path.realpath(root)
+        batcher = ChangeBatcher(self.handle_changes, self.root, PathFilter(include=RELOAD_PATTERNS), settle=settle)
+        super().__init__(batcher)
+    
+    def handle_changes(self, changes):
+        """Called once per settled batch with the consolidated change set."""
+        for kind in ('created', 'modified', 'deleted'):
+            for path in getattr(changes, kind):
+                print(f"📝 File {kind}: {path}")
+        # Only edits to existing stylesheets can be hot-swapped
+        stylesheets_only = not changes.created and not changes.deleted and \
+            all(path.endswith('.css') for path in changes.modified)
+        self.broadcast(['/' + path for path in changes.paths], 'css' if stylesheets_only else 'reload')
+    
+    def broadcast(self, paths, event):
+        clients = self.broadcaster.broadcast(event, {"paths": paths})
+        print(f"🔄 Sent {event} to {clients} page(s)")
+    
+    def close(self):
+        self.batcher.close()
 
 class ReloadableHTTPRequestHandler(SimpleHTTPRequestHandler):
     """HTTP request handler that injects auto-reload script into HTML pages."""
     
+    # Shared file index of the served directory and the reload event source, set by main()
+    file_index = None
+    reload_broadcaster = None
+    # Injected HTML shared by all request threads
+    page_cache = InjectedPageCache()
+    
     def end_headers(self):
         # Add CORS headers for development
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -57,77 +205,162 @@ class ReloadableHTTPRequestHandler(SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', '*')
         super().end_headers()
     
-    def do_GET(self):
-        """Override GET to inject reload script into HTML files."""
-        # Get the file path
-        path = self.translate_path(self.path)
-        
-        if os.path.isfile(path) and path.endswith(('.html', '.htm')):
+    def send_file_index(self):
+        """Serve /__files: the indexed files, or with ?since=<cursor> what changed after it"""
+        root = os.getcwd()
+        query = parse_qs(urlparse(self.path).query)
+        if 'since' in query:
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Inject auto-reload script before closing </body> tag
-                reload_script = '''
-<script>
-(function() {
-    let lastModified = Date.now();
-    
-    function checkForUpdates() {
-        fetch(window.location.href, {
-            method: 'HEAD',
-            cache: 'no-cache'
-        }).then(response => {
-            const modified = new Date(response.headers.get('Last-Modified')).getTime();
-            if (modified > lastModified) {
-                console.log('🔄 Reloading page due to file changes...');
-                window.location.reload();
+                since = int(query['since'][0])
+            except ValueError:
+                self.send_error(400, "since must be an integer cursor")
+                return
+            changes, cursor = self.file_index.changed_since(root, since)
+            payload = {
+                "cursor": cursor,
+                # None: the cursor is too old, treat everything as changed
+                "changes": None if changes is None else [
+                    {"path": change.path, "status": change.status} for change in changes
+                ],
             }
-        }).catch(() => {
-            // Ignore errors, server might be restarting
-        });
-    }
-    
-    // Check for updates every 1 second
-    setInterval(checkForUpdates, 1000);
+        else:
+            payload = {
+                "cursor": self.file_index.cursor(root),
+                "fingerprint": self.file_index.fingerprint(root),
+                "files": self.file_index.list_files(root),
+            }
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
     
-    // Also listen for focus events (when user switches back to tab)
-    window.addEventListener('focus', checkForUpdates);
+    def send_reload_stream(self):
+        """Serve /__reload: a Server-Sent Events stream of reload events."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        client = self.reload_broadcaster.subscribe()
+        try:
+            # Reconnect quickly after a server restart
+            self.wfile.write(b"retry: 1000\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    message = client.get(timeout=self.reload_broadcaster.heartbeat)
+                except queue.Empty:
+                    # Comment line: keeps proxies from timing out and detects closed tabs
+                    message = b": ping\n\n"
+                if message is None:
+                    break
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.reload_broadcaster.unsubscribe(client)
+            self.close_connection = True
     
-    console.log('🚀 Auto-reload enabled - page will refresh when files change');
-})();
-</script>
-'''
-                
-                # Insert script before closing body tag, or before closing html tag if no body
-                if '</body>' in content:
-                    content = content.replace('</body>', reload_script + '\n</body>')
-                elif '</html>' in content:
-                    content = content.replace('</html>', reload_script + '\n</html>')
-                else:
-                    content += reload_script
-                
-                # Send response
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/html; charset=utf-8')
-                self.send_header('Content-Length', str(len(content.encode('utf-8'))))
-                self.send_header('Last-Modified', self.date_time_string(os.path.getmtime(path)))
-                self.end_headers()
-                self.wfile.write(content.encode('utf-8'))
+    def do_GET(self):
+        """Override GET to inject reload script into HTML files."""
+        request_path = urlparse(self.path).path
+        if self.file_index is not None and request_path == '/__files':
+            self.send_file_index()
+            return
+        if self.reload_broadcaster is not None and request_path == '/__reload':
+            self.send_reload_stream()
+            return
+        
+        path = self.html_path()
+        if path is not None:
+            try:
+                self.send_html(path)
                 return
-            except Exception as e:
+            except (OSError, UnicodeDecodeError) as e:
                 print(f"Error processing HTML file: {e}")
         
-        # For all other files, use default behavior
+        # For all other files, use default behavior (sent with sendfile, see copyfile)
         super().do_GET()
+    
+    def do_HEAD(self):
+        """HEAD for injected HTML pages reports the injected length and validators."""
+        path = self.html_path()
+        if path is not None:
+            try:
+                self.send_html(path, head=True)
+                return
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error processing HTML file: {e}")
+        super().do_HEAD()
+    
+    def html_path(self):
+        """Filesystem path of the HTML page a request is for, if it is one."""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and urlparse(self.path).path.endswith('/'):
+            # Directory URLs serve their index page, which needs the script too
+            for index in ('index.html', 'index.htm'):
+                candidate = os.path.join(path, index)
+                if os.path.isfile(candidate):
+                    return candidate
+            return None
+        if os.path.isfile(path) and path.endswith(('.html', '.htm')):
+            return path
+        return None
+    
+    def not_modified(self, page):
+        """Whether the request's validators still match the cached page."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, page.etag)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError, OverflowError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=datetime.timezone.utc)
+            return int(page.mtime) <= since.timestamp()
+        return False
+    
+    def send_html(self, path, head=False):
+        """Send an HTML page with the reload script, or 304 when the browser's copy is current."""
+        page = self.page_cache.get(path)
+        modified = not self.not_modified(page)
+        if not modified:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page.body)))
+        self.send_header('ETag', page.etag)
+        self.send_header('Last-Modified', self.date_time_string(page.mtime))
+        # Always revalidate, so an edit shows up on the next load
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if modified and not head:
+            self.wfile.write(page.body)
+    
+    def copyfile(self, source, outputfile):
+        """Copy file bodies with zero-copy sendfile where the platform supports it."""
+        if outputfile is self.wfile:
+            try:
+                self.connection.sendfile(source)
+                return
+            except io.UnsupportedOperation:
+                pass
+        super().copyfile(source, outputfile)
 
 class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
     """Threaded HTTP server for better performance."""
     daemon_threads = True
 
-def start_file_watcher(directory, websocket_clients):
+def start_file_watcher(directory, broadcaster):
     """Start watching files for changes."""
-    event_handler = AutoReloadHandler(websocket_clients)
+    event_handler = AutoReloadHandler(broadcaster, directory)
     observer = Observer()
     observer.schedule(event_handler, directory, recursive=True)
     observer.start()
@@ -161,11 +394,18 @@ def main():
     print("🔄 Auto-reload enabled - pages will refresh when files change")
     print("⏹️  Press Ctrl+C to stop the server")
     
-    # WebSocket clients (for future enhancement)
-    websocket_clients = set()
+    # Open pages listening on /__reload
+    broadcaster = ReloadBroadcaster()
+    ReloadableHTTPRequestHandler.reload_broadcaster = broadcaster
     
     # Start file watcher
-    observer = start_file_watcher(current_dir, websocket_clients)
+    observer = start_file_watcher(current_dir, broadcaster)
+    
+    # File index kept current by the same observer, served at /__files
+    file_index = FileIndexService(observer=observer)
+    indexed = len(file_index.list_files(current_dir))
+    ReloadableHTTPRequestHandler.file_index = file_index
+    print(f"📚 Indexed {indexed} files (GET /__files)")
     
     try:
         # Start HTTP server
@@ -180,6 +420,8 @@ def main():
         
     except KeyboardInterrupt:
         print("\n🛑 Shutting down server...")
+        broadcaster.close()
+        file_index.close()
         observer.stop()
         observer.join()
         httpd.shutdown()
@@ -0,0 +1,246 @@
+"""
+Coalescing pipeline for filesystem events.
+
+Editors and AI runs save in bursts: a temp file is written and renamed over the
+original, several files change at once, the same file is saved twice. The
+ChangeBatcher collects created, modified, moved and deleted events, merges
+them per path and, once no new event has arrived for the settle window,
+hands one consolidated ChangeSet to its callback. A burst that never goes
+quiet is still flushed after max_delay. The batcher tracks which files exist,
+so a rename over an existing file is reported as a modification.
+
+Paths are filtered with a PathFilter: ignore patterns are matched against
+every path component (so ".git" drops everything below it), include patterns
+against the file name. Both are compiled into one regular expression each.
+"""
+
+import fnmatch
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # pragma: no cover - the batcher itself does not need watchdog
+    FileSystemEventHandler = object
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# Tool directories plus editor swap, backup and probe files (vim writes "4913" to test a directory)
+DEFAULT_IGNORE = (".git", "node_modules", ".venv", "venv", "__pycache__",
+                  "*.swp", "*.swx", "*~", ".#*", "#*#", ".DS_Store", "4913")
+
+
+def _compile(patterns: Iterable[str]) -> Optional["re.Pattern"]:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns))
+
+
+class PathFilter:
+    """Compiled include/ignore patterns for relative paths"""
+
+    def __init__(self, include: Iterable[str] = ("*",), ignore: Iterable[str] = DEFAULT_IGNORE):
+        self._include = _compile(include)
+        self._ignore = _compile(ignore)
+
+    def ignores(self, relative_path: str) -> bool:
+        """Whether any component of the path matches an ignore pattern"""
+        return self._ignore is not None and any(self._ignore.match(part) for part in relative_path.split("/"))
+
+    def matches(self, relative_path: str) -> bool:
+        if self.ignores(relative_path):
+            return False
+        return self._include is None or self._include.match(relative_path.rsplit("/", 1)[-1]) is not None
+
+
+class ChangeSet:
+    """Everything that changed during one batch, at most one entry per path"""
+
+    __slots__ = ("created", "modified", "deleted", "moved")
+
+    def __init__(self, created: List[str], modified: List[str], deleted: List[str],
+                 moved: List[Tuple[str, str]]):
+        self.created = created
+        self.modified = modified
+        self.deleted = deleted
+        # (old path, new path) pairs; the new path is also listed in created, the old one in deleted
+        self.moved = moved
+
+    @property
+    def paths(self) -> List[str]:
+        return sorted(self.created + self.modified + self.deleted)
+
+    def __bool__(self) -> bool:
+        return bool(self.created or self.modified or self.deleted)
+
+    def to_dict(self) -> dict:
+        return {"created": self.created, "modified": self.modified, "deleted": self.deleted,
+                "moved": [list(pair) for pair in self.moved]}
+
+
+def _merge(previous: Optional[str], kind: str) -> Optional[str]:
+    """State of a path after another event; None means it nets out to no change"""
+    if previous is None:
+        return kind
+    if previous == CREATED:
+        return None if kind == DELETED else CREATED
+    if previous == DELETED:
+        # Deleted and written again, e.g. an atomic save
+        return MODIFIED if kind != DELETED else DELETED
+    return DELETED if kind == DELETED else MODIFIED
+
+
+class ChangeBatcher:
+    """Merges events per path and emits one ChangeSet per quiet period"""
+
+    def __init__(self, callback: Callable[[ChangeSet], None], root: str = ".",
+                 path_filter: Optional[PathFilter] = None, settle: float = 0.2, max_delay: float = 2.0):
+        self.callback = callback
+        self.root = os.path.realpath(root)
+        self.path_filter = path_filter or PathFilter()
+        self.settle = settle
+        self.max_delay = max_delay
+        self.batches = 0
+        self.events = 0
+        self._pending: Dict[str, str] = {}
+        self._moves: Dict[str, str] = {}
+        self._first_event = 0.0
+        self._last_event = 0.0
+        # Matching files known to exist, so a rename over one of them (an atomic
+        # save) is reported as modified rather than created
+        self._known = self._scan()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="change-batcher", daemon=True)
+        self._thread.start()
+
+    def _relative(self, path: str) -> Optional[str]:
+        relative = os.path.relpath(os.path.realpath(path), self.root).replace(os.sep, "/")
+        if relative.startswith("../") or relative in (".", ".."):
+            return None
+        return relative if self.path_filter.matches(relative) else None
+
+    def _scan(self) -> Set[str]:
+        known = set()
+        for directory, dirnames, filenames in os.walk(self.root):
+            prefix = os.path.relpath(directory, self.root).replace(os.sep, "/")
+            prefix = "" if prefix == "." else prefix + "/"
+            dirnames[:] = [name for name in dirnames if not self.path_filter.ignores(prefix + name)]
+            known.update(prefix + name for name in filenames if self.path_filter.matches(prefix + name))
+        return known
+
+    def add(self, kind: str, path: str, dest_path: Optional[str] = None):
+        """Record one event (absolute paths); moves pass the destination as dest_path"""
+        if kind == "moved":
+            source, dest = self._relative(path), self._relative(dest_path)
+            changes = []
+            if source is not None:
+                changes.append((source, DELETED))
+            if dest is not None:
+                changes.append((dest, CREATED))
+        else:
+            relative = self._relative(path)
+            changes = [] if relative is None else [(relative, kind)]
+        if not changes:
+            return
+
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending and not self._moves:
+                self._first_event = now
+            self._last_event = now
+            self.events += 1
+            if kind == "moved" and dest is not None and dest in self._known:
+                # Renamed over an existing file, the usual atomic save: its contents changed
+                changes[-1] = (dest, MODIFIED)
+            for relative, change in changes:
+                if change == DELETED:
+                    self._known.discard(relative)
+                else:
+                    self._known.add(relative)
+                state = _merge(self._pending.get(relative), change)
+                if state is None:
+                    self._pending.pop(relative, None)
+                else:
+                    self._pending[relative] = state
+            if kind == "moved" and source is not None and dest is not None:
+                # A file moved twice within a batch keeps its original source
+                self._moves[dest] = self._moves.pop(source, source)
+            self._condition.notify()
+
+    def _take(self) -> ChangeSet:
+        pending, moves = self._pending, self._moves
+        self._pending, self._moves = {}, {}
+        grouped = {CREATED: [], MODIFIED: [], DELETED: []}
+        for relative, state in pending.items():
+            grouped[state].append(relative)
+        moved = sorted((source, dest) for dest, source in moves.items()
+                       if pending.get(dest) == CREATED and pending.get(source) == DELETED)
+        return ChangeSet(sorted(grouped[CREATED]), sorted(grouped[MODIFIED]), sorted(grouped[DELETED]), moved)
+
+    def _emit(self, change_set: ChangeSet):
+        if change_set:
+            self.batches += 1
+            self.callback(change_set)
+
+    def flush(self):
+        """Emit whatever is pending right away"""
+        with self._condition:
+            change_set = self._take()
+        self._emit(change_set)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._pending and not self._moves:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # Wait for the burst to go quiet, or for max_delay to pass since it started
+                while not self._closed:
+                    now = time.monotonic()
+                    due = min(self._last_event + self.settle, self._first_event + self.max_delay)
+                    if now >= due:
+                        break
+                    self._condition.wait(due - now)
+                change_set = self._take()
+            self._emit(change_set)
+
+    def close(self):
+        """Stop the worker, emitting anything still pending"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=2)
+        self.flush()
+
+
+class CoalescingEventHandler(FileSystemEventHandler):
+    """Feeds watchdog file events into a ChangeBatcher; directory events are skipped"""
+
+    def __init__(self, batcher: ChangeBatcher):
+        super().__init__()
+        self.batcher = batcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.batcher.add(CREATED, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.batcher.add(MODIFIED, event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.batcher.add(DELETED, event.src_path)
+
+    def on_moved(self, event):
+        # Moving a directory also reports a moved event for every file inside it
+        if not event.is_directory:
+            self.batcher.add("moved", event.src_path, event.dest_path)
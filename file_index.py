@@ -0,0 +1,282 @@
+"""
+Shared, watchdog-backed index of workspace files.
+
+FileIndexService keeps a WorkspaceIndex per workspace up to date from
+filesystem events instead of walking the disk on every request. Watchdog
+callbacks only record which paths were touched; the next query applies them
+with WorkspaceIndex.refresh(paths), so a query costs one stat per touched path
+(plus one read, for small files, once the workspace keeps contents for diffs).
+Directory creates, moves and deletes fall back to one incremental rescan.
+
+Queries:
+    list_files(root)              sorted relative paths
+    fingerprint(root)             size/mtime fingerprint, recomputed only after a change
+    cursor(root, diffs=False)     position in the change log; diffs=True makes
+                                  later changes come with unified diffs
+    changed_since(root, cursor)   FileChange records after cursor
+
+Without watchdog, or with CODEX_FILE_INDEX_WATCH=0, every query rescans the
+tree (stat only, until contents are kept). main uses the service for response
+cache keys and edit-run diffs; dev_server shares its watchdog Observer with it.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, List, Optional, Set, Tuple
+
+from structured_logging import get_logger, log_event
+from workspace_index import DEFAULT_MAX_DIFF_BYTES, IGNORED_DIRS, FileChange, WorkspaceIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - falls back to rescanning
+    FileSystemEventHandler = object
+    Observer = None
+
+log = get_logger("file_index")
+
+# Watchdog event types that do not change file contents or the set of files
+_IGNORED_EVENT_TYPES = {"opened", "closed_no_write"}
+
+
+class _WorkspaceEvents(FileSystemEventHandler):
+    """Records touched paths for one workspace; runs on the watchdog thread"""
+
+    def __init__(self, workspace: "WatchedWorkspace"):
+        super().__init__()
+        self.workspace = workspace
+
+    def on_any_event(self, event):
+        if event.event_type in _IGNORED_EVENT_TYPES:
+            return
+        if event.is_directory and event.event_type == "modified":
+            # Entry changes inside it arrive as their own events
+            return
+        paths = [event.src_path]
+        if getattr(event, "dest_path", ""):
+            paths.append(event.dest_path)
+        self.workspace.touch(paths, rescan=event.is_directory)
+
+
+class WatchedWorkspace:
+    """A WorkspaceIndex plus the events not yet applied to it and its change log"""
+
+    def __init__(self, root: str, ignored_dirs: Iterable[str], max_diff_bytes: int, log_size: int):
+        self.index = WorkspaceIndex(root, ignored_dirs, max_diff_bytes)
+        self.root = self.index.root
+        self.watch = None
+        self.handler = _WorkspaceEvents(self)
+        self.generation = 0
+        self.last_event = 0.0
+        self.changes: Deque[Tuple[int, FileChange]] = deque(maxlen=log_size)
+        self._pending: Set[str] = set()
+        self._rescan = True
+        self._fingerprint: Optional[Tuple[int, str]] = None
+        self._events_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @property
+    def watched(self) -> bool:
+        return self.watch is not None
+
+    def touch(self, paths: List[str], rescan: bool = False):
+        """Note paths reported by watchdog (absolute)"""
+        relevant = []
+        for path in paths:
+            relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+            if relative == "." or relative.startswith("../"):
+                continue
+            if any(part in self.index.ignored_dirs for part in relative.split("/")):
+                continue
+            relevant.append(relative)
+        if not relevant:
+            return
+        with self._events_lock:
+            if rescan:
+                self._rescan = True
+            else:
+                self._pending.update(relevant)
+            self.last_event = time.monotonic()
+
+    def sync(self) -> int:
+        """Apply recorded events (or rescan when unwatched); returns the current generation"""
+        with self._sync_lock:
+            with self._events_lock:
+                rescan = self._rescan or not self.watched
+                pending, self._pending = self._pending, set()
+                self._rescan = False
+            if rescan:
+                changes = self.index.refresh()
+            elif pending:
+                changes = self.index.refresh(pending)
+            else:
+                changes = []
+            for change in changes:
+                self.generation += 1
+                self.changes.append((self.generation, change))
+            return self.generation
+
+    def settle(self, quiet: float, timeout: float):
+        """Wait until no event arrived for `quiet` seconds (at most `timeout`).
+
+        The quiet period starts no earlier than the call, so events still in
+        flight from writes that just finished get a chance to arrive.
+        """
+        if not self.watched:
+            return
+        called = time.monotonic()
+        deadline = called + timeout
+        while True:
+            now = time.monotonic()
+            wait = max(self.last_event, called) + quiet - now
+            if wait <= 0 or now >= deadline:
+                return
+            time.sleep(min(wait, deadline - now))
+
+
+class FileIndexService:
+    """Up-to-date file maps for any number of workspaces, least recently used evicted first"""
+
+    def __init__(self, ignored_dirs: Iterable[str] = IGNORED_DIRS, max_workspaces: int = 8,
+                 max_diff_bytes: int = DEFAULT_MAX_DIFF_BYTES, log_size: int = 1024,
+                 watch: bool = True, settle: float = 0.05, observer=None):
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self.max_workspaces = max_workspaces
+        self.max_diff_bytes = max_diff_bytes
+        self.log_size = log_size
+        self.watch_enabled = watch and (observer is not None or Observer is not None)
+        # Quiet period waited for after a Codex run before its changes are read
+        self.settle_seconds = settle
+        self._observer = observer
+        self._owns_observer = observer is None
+        self._workspaces: "OrderedDict[str, WatchedWorkspace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FileIndexService":
+        return cls(
+            max_workspaces=int(os.getenv("CODEX_WORKSPACE_INDEXES", "8")),
+            max_diff_bytes=int(os.getenv("CODEX_DIFF_MAX_BYTES", str(DEFAULT_MAX_DIFF_BYTES))),
+            watch=os.getenv("CODEX_FILE_INDEX_WATCH", "1") != "0",
+            settle=float(os.getenv("CODEX_FILE_INDEX_SETTLE", "0.05")),
+        )
+
+    def _start_watch(self, workspace: WatchedWorkspace):
+        if not self.watch_enabled:
+            return
+        try:
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            workspace.watch = self._observer.schedule(workspace.handler, workspace.root, recursive=True)
+        except OSError as e:
+            # e.g. out of inotify watches: keep serving by rescanning
+            log_event(log, logging.WARNING, "file_index.watch_failed", root=workspace.root, error=str(e))
+
+    def _stop_watch(self, workspace: WatchedWorkspace):
+        if workspace.watch is not None and self._observer is not None:
+            try:
+                if self._owns_observer:
+                    self._observer.unschedule(workspace.watch)
+                else:
+                    # A shared observer may have other handlers on the same watch
+                    self._observer.remove_handler_for_watch(workspace.handler, workspace.watch)
+            except (KeyError, ValueError):
+                pass
+            workspace.watch = None
+
+    def workspace(self, root: str) -> WatchedWorkspace:
+        """The watched workspace for root, started (and scanned once) on first use"""
+        key = os.path.realpath(root)
+        evicted = []
+        with self._lock:
+            workspace = self._workspaces.get(key)
+            if workspace is not None:
+                self._workspaces.move_to_end(key)
+                return workspace
+            workspace = self._workspaces[key] = WatchedWorkspace(
+                key, self.ignored_dirs, self.max_diff_bytes, self.log_size)
+            while len(self._workspaces) > self.max_workspaces:
+                evicted.append(self._workspaces.popitem(last=False)[1])
+        for old in evicted:
+            self._stop_watch(old)
+        # Watch before the baseline scan so nothing written in between is missed
+        self._start_watch(workspace)
+        workspace.sync()
+        return workspace
+
+    def list_files(self, root: str) -> List[str]:
+        workspace = self.workspace(root)
+        workspace.sync()
+        return sorted(workspace.index.files)
+
+    def fingerprint(self, root: str) -> str:
+        """Hash of every file's path, size and mtime, cached until something changes"""
+        workspace = self.workspace(root)
+        generation = workspace.sync()
+        cached = workspace._fingerprint
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        digest = hashlib.sha256()
+        for relative, state in sorted(workspace.index.files.items()):
+            digest.update(f"{relative}\0{state.size}\0{state.mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        value = digest.hexdigest()
+        workspace._fingerprint = (generation, value)
+        return value
+
+    def cursor(self, root: str, diffs: bool = False) -> int:
+        """Current position in root's change log.
+
+        With diffs, the workspace starts keeping file contents (reading its
+        small files once), so the changes after this cursor carry diffs.
+        """
+        workspace = self.workspace(root)
+        generation = workspace.sync()
+        if diffs:
+            workspace.index.keep_contents()
+        return generation
+
+    def changed_since(self, root: str, cursor: int, settle: bool = False) -> Tuple[Optional[List[FileChange]], int]:
+        """Changes after cursor and the new cursor.
+
+        Returns None instead of a list when cursor is older than the kept log,
+        meaning the caller has to treat everything as changed. With settle, it
+        first waits for the filesystem to go quiet, for callers that just
+        finished writing (a Codex run).
+        """
+        workspace = self.workspace(root)
+        if settle:
+            workspace.settle(self.settle_seconds, timeout=max(1.0, self.settle_seconds * 20))
+        generation = workspace.sync()
+        changes = workspace.changes
+        if cursor < generation and (not changes or changes[0][0] > cursor + 1):
+            return None, generation
+        return [change for number, change in changes if number > cursor], generation
+
+    def close(self):
+        with self._lock:
+            workspaces = list(self._workspaces.values())
+            self._workspaces.clear()
+        for workspace in workspaces:
+            self._stop_watch(workspace)
+        if self._owns_observer and self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+            self._observer = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            workspaces = list(self._workspaces.values())
+        return {
+            "workspaces": len(workspaces),
+            "watched": sum(1 for workspace in workspaces if workspace.watched),
+            "files": sum(len(workspace.index.files) for workspace in workspaces),
+            "files_read": sum(workspace.index.files_read for workspace in workspaces),
+            "keeping_contents": sum(1 for workspace in workspaces if workspace.index.keeping_contents),
+        }
@@ -0,0 +1,344 @@
+"""
+Conversation history backends for CodexManager.
+
+CodexManager keeps the working set of conversations in memory; a history store
+decides what happens to them beyond that. MemoryHistoryStore keeps nothing, so
+history is lost on restart (the original behaviour). SQLiteHistoryStore
+persists every message with write-behind batching: the request path only
+enqueues an operation and a background thread commits batches to a WAL-mode
+database. Reads never wait for the writer; operations still in the queue are
+kept in a per-session overlay and applied on top of what the database holds.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from conversation import Message
+from structured_logging import get_logger, log_event
+
+log = get_logger("history")
+
+# Messages kept per session, matching CodexManager's in-memory window
+DEFAULT_MAX_MESSAGES = 20
+
+
+class HistoryStore:
+    """Interface for conversation persistence backends"""
+
+    # True when history outlives the process and can be shared between workers
+    persistent = False
+
+    def has_session(self, session_id: str) -> bool:
+        """Whether the store knows about a session"""
+        return False
+
+    def load(self, session_id: str) -> List[Message]:
+        """Return the persisted messages of a session, oldest first"""
+        raise NotImplementedError
+
+    def append(self, session_id: str, message: Message):
+        """Record a new message for a session"""
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        """Forget all messages of a session"""
+        raise NotImplementedError
+
+    def prune(self, older_than: float):
+        """Delete sessions with no activity in the last older_than seconds"""
+
+    def flush(self):
+        """Commit every queued write now, without waiting for a batch to fill, and block until done"""
+
+    def close(self):
+        """Flush and release resources"""
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": type(self).__name__}
+
+
+class MemoryHistoryStore(HistoryStore):
+    """History lives only in CodexManager's memory and dies with the process"""
+
+    def load(self, session_id: str) -> List[Message]:
+        return []
+
+    def append(self, session_id: str, message: Message):
+        pass
+
+    def clear(self, session_id: str):
+        pass
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """SQLite-backed history with batched write-behind flushing"""
+
+    persistent = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+        CREATE TABLE IF NOT EXISTS writer_progress (
+            writer_id TEXT PRIMARY KEY,
+            sequence INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, max_messages: int = DEFAULT_MAX_MESSAGES,
+                 batch_size: int = 256, flush_interval: float = 0.5):
+        self.path = path
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches_written = 0
+        self.operations_written = 0
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._closed = False
+        # Operations queued but not yet committed, as (sequence, op): appends and clears
+        # per session, prunes in their own list. Each batch also commits the last
+        # sequence it wrote to writer_progress, so a reader sees in one snapshot which
+        # overlay entries the database already holds. _pending_lock only guards the
+        # overlay itself; no SQLite call is made while holding it.
+        self._pending: Dict[str, Deque[tuple]] = {}
+        self._pending_prunes: Deque[tuple] = deque()
+        self._sequence = itertools.count()
+        self._pending_lock = threading.Lock()
+        self._writer_id = uuid.uuid4().hex
+
+        # Readers use their own connection; WAL lets them run alongside the writer
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(self.SCHEMA)
+
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="history-writer", daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _snapshot(self, session_id: str, with_messages: bool) -> Tuple[Optional[str], List[tuple]]:
+        """(updated_at, message rows) as they will be once the queue is committed.
+
+        Replays the session's queued operations, and any queued prune, in
+        queue order on top of what the database holds; None means no session row.
+        """
+        # Copied before reading, so anything dropped from it since is already committed
+        with self._pending_lock:
+            ops = list(self._pending.get(session_id, ())) + list(self._pending_prunes)
+        with self._read_lock:
+            # One read transaction: the progress row and the rows come from the same snapshot
+            self._reader.execute("BEGIN")
+            try:
+                progress = self._reader.execute(
+                    "SELECT sequence FROM writer_progress WHERE writer_id = ?", (self._writer_id,)).fetchone()
+                row = self._reader.execute(
+                    "SELECT updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                rows = self._reader.execute(
+                    "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id",
+                    (session_id,),
+                ).fetchall() if with_messages else []
+            finally:
+                self._reader.execute("COMMIT")
+        committed = progress[0] if progress else -1
+        updated_at = row[0] if row else None
+        for _, op in sorted(entry for entry in ops if entry[0] > committed):
+            if op[0] == "append":
+                rows.append(op[2:])
+                updated_at = op[4]
+            elif op[0] == "clear":
+                rows = []
+            elif updated_at is not None and updated_at < op[1]:
+                rows, updated_at = [], None
+        return updated_at, rows[-self.max_messages:]
+
+    def load(self, session_id: str) -> List[Message]:
+        _, rows = self._snapshot(session_id, with_messages=True)
+        return [Message.from_dict({"role": role, "content": content, "timestamp": timestamp})
+                for role, content, timestamp in rows]
+
+    def has_session(self, session_id: str) -> bool:
+        return self._snapshot(session_id, with_messages=False)[0] is not None
+
+    def append(self, session_id: str, message: Message):
+        self._enqueue(("append", session_id, message.role, message.content, message.timestamp))
+
+    def clear(self, session_id: str):
+        self._enqueue(("clear", session_id))
+
+    def prune(self, older_than: float):
+        cutoff = (datetime.now() - timedelta(seconds=older_than)).isoformat()
+        self._enqueue(("prune", cutoff))
+
+    def _enqueue(self, op: tuple):
+        with self._pending_lock:
+            entry = (next(self._sequence), op)
+            if op[0] == "prune":
+                self._pending_prunes.append(entry)
+            else:
+                self._pending.setdefault(op[1], deque()).append(entry)
+            # Queued under the lock so queue order is sequence order
+            self._queue.put(entry)
+
+    def _discard_pending(self, batch: List[tuple]):
+        """Drop a committed (or failed) batch of entries from the overlay"""
+        with self._pending_lock:
+            for _, op in batch:
+                if op[0] == "prune":
+                    self._pending_prunes.popleft()
+                elif op[0] in ("append", "clear"):
+                    ops = self._pending[op[1]]
+                    ops.popleft()
+                    if not ops:
+                        del self._pending[op[1]]
+
+    def flush(self):
+        if self._closed:
+            return
+        # The marker ends the batch being gathered, so this does not wait out flush_interval
+        self._queue.put((None, ("flush",)))
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, ("stop",)))
+        self._writer_thread.join()
+        with self._read_lock:
+            self._reader.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": type(self).__name__,
+            "path": self.path,
+            "pending_writes": self._queue.qsize(),
+            "pending_sessions": len(self._pending),
+            "batches_written": self.batches_written,
+            "operations_written": self.operations_written,
+        }
+
+    def _writer_loop(self):
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # Gather whatever else arrives within the flush interval
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and batch[-1][1][0] not in ("stop", "flush"):
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                                     else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                try:
+                    if len(batch) > 1 or batch[0][1][0] != "flush":
+                        self._write_batch(conn, batch)
+                except sqlite3.Error as e:
+                    log_event(log, logging.ERROR, "history.write_failed", dropped=len(batch), error=str(e))
+                finally:
+                    # Committed ones are now read from the database, failed ones are dropped
+                    self._discard_pending(batch)
+                    for _ in batch:
+                        self._queue.task_done()
+
+                if batch[-1][1][0] == "stop":
+                    # Everything is committed, so readers no longer need this writer's progress
+                    conn.execute("DELETE FROM writer_progress WHERE writer_id = ?", (self._writer_id,))
+                    conn.commit()
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[tuple]):
+        touched = {}
+        last_sequence = None
+        try:
+            for sequence, op in batch:
+                if sequence is not None:
+                    last_sequence = sequence
+                kind = op[0]
+                if kind == "append":
+                    _, session_id, role, content, timestamp = op
+                    conn.execute(
+                        "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                        (session_id, role, content, timestamp),
+                    )
+                    touched[session_id] = timestamp
+                elif kind == "clear":
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (op[1],))
+                elif kind == "prune":
+                    # Pruning must see the sessions touched earlier in this batch
+                    self._touch_sessions(conn, touched)
+                    touched = {}
+                    cutoff = op[1]
+                    conn.execute(
+                        "DELETE FROM messages WHERE session_id IN "
+                        "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                        (cutoff,),
+                    )
+                    conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._touch_sessions(conn, touched)
+            if last_sequence is not None:
+                conn.execute(
+                    "INSERT INTO writer_progress (writer_id, sequence) VALUES (?, ?) "
+                    "ON CONFLICT(writer_id) DO UPDATE SET sequence = excluded.sequence",
+                    (self._writer_id, last_sequence),
+                )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        self.batches_written += 1
+        self.operations_written += sum(op[0] != "flush" for _, op in batch)
+
+    def _touch_sessions(self, conn: sqlite3.Connection, touched: Dict[str, str]):
+        for session_id, timestamp in touched.items():
+            conn.execute(
+                "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (session_id, timestamp, timestamp),
+            )
+            # Trim once per session per batch rather than after every insert
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages),
+            )
+
+
+def create_history_store(backend: Optional[str] = None, path: Optional[str] = None) -> HistoryStore:
+    """Build the history store selected by CODEX_HISTORY_BACKEND / CODEX_HISTORY_DB"""
+    backend = (backend or os.getenv("CODEX_HISTORY_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return MemoryHistoryStore()
+    if backend == "sqlite":
+        return SQLiteHistoryStore(path or os.getenv("CODEX_HISTORY_DB", "conversations.db"))
+    raise ValueError(f"Unknown history backend: {backend}")
@@ -1,150 +1,502 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 import subprocess
 import asyncio
 import json
+import logging
 import os
+import signal
+import sys
+import time
 import uuid
-from typing import Dict, List
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext, suppress
+from typing import Awaitable, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
 
+from codex_parser import ASSISTANT_TEXT, ERROR, CodexStreamParser, iter_codex_events
+from scheduler import CodexScheduler, SchedulerFullError
+from response_cache import ResponseCache, make_cache_key
+from history_store import HistoryStore, MemoryHistoryStore, create_history_store
+from conversation import Conversation, Message, format_timestamp
+from static_page import CachedPage, encoded_response
+from structured_logging import configure_logging, dropped_records, get_logger, log_event, redact
+from codex_runner import CodexLauncher
+from readiness import CodexProbe, LoopLagMonitor, api_key_configured
+from tracing import Tracer, current_trace, use_trace
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from ai_backends import ChatBackend, ChunkCallback, create_readonly_backend
+from file_index import FileIndexService
+from asset_pipeline import ASSETS_URL, IMMUTABLE_CACHE_CONTROL, AssetPipeline, build_summary
+
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="AI Interactive CMS", description="AI-powered CMS using Codex CLI")
+# Logging goes through a background thread; see structured_logging for LOG_* settings
+configure_logging()
+codex_log = get_logger("codex")
+ws_log = get_logger("ws")
+server_log = get_logger("server")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background maintenance tasks"""
+    await build_static_assets()
+    for problem in codex_launcher.validate(CODEX_TIMEOUT, CODEX_KILL_GRACE):
+        log_event(codex_log, logging.WARNING, "codex.config_problem", problem=problem)
+    background = [
+        asyncio.create_task(session_sweeper()),
+        asyncio.create_task(codex_probe.run()),
+        asyncio.create_task(loop_monitor.run()),
+    ]
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        for task in background:
+            with suppress(asyncio.CancelledError):
+                await task
+        await codex_manager.readonly_backend.close()
+        codex_manager.file_index.close()
+        # Commit any history still waiting in the write-behind queue
+        await asyncio.to_thread(codex_manager.history_store.flush)
+
+app = FastAPI(title="AI Interactive CMS", description="AI-powered CMS using Codex CLI", lifespan=lifespan)
 
 # Mount static files for frontend
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Codex CLI execution limits
+CODEX_TIMEOUT = 120.0
+CODEX_READ_CHUNK_SIZE = 64 * 1024
+# Raw stdout kept for error reporting while streaming
+CODEX_STDOUT_TAIL_BYTES = 16 * 1024
+
+# Session retention: idle sessions expire after SESSION_TTL seconds and at most
+# MAX_SESSIONS are kept, least recently used first out
+SESSION_TTL = float(os.getenv("CODEX_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("CODEX_MAX_SESSIONS", "1000"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("CODEX_SESSION_SWEEP_INTERVAL", "60"))
+# Persisted conversations with no activity for this long are deleted
+HISTORY_RETENTION = float(os.getenv("CODEX_HISTORY_RETENTION", str(30 * 24 * 3600)))
+# Messages kept per conversation
+MAX_HISTORY_MESSAGES = 20
+# Prompt context is assembled to fit this many (estimated) tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CODEX_CONTEXT_TOKEN_BUDGET", "500"))
+# Longest snippet of a single message included in the context
+CONTEXT_SNIPPET_TOKENS = int(os.getenv("CODEX_CONTEXT_SNIPPET_TOKENS", "50"))
+
+# Seconds a cancelled Codex process group gets to exit after SIGTERM before SIGKILL
+CODEX_KILL_GRACE = float(os.getenv("CODEX_KILL_GRACE", "5"))
+
+# Readiness: /ready fails when the wait queue is this full or the event loop lags this much
+READY_QUEUE_RATIO = float(os.getenv("CODEX_READY_QUEUE_RATIO", "0.8"))
+READY_MAX_LOOP_LAG = float(os.getenv("CODEX_READY_MAX_LOOP_LAG", "0.25"))
+# Seconds between background checks of the codex binary
+CODEX_PROBE_INTERVAL = float(os.getenv("CODEX_PROBE_INTERVAL", "300"))
+
+# Recent per-request traces, exposed at /debug/traces
+tracer = Tracer.from_env()
+
+# Codex binary and environment resolved once
+codex_launcher = CodexLauncher()
+
+# Background probes behind /ready
+codex_probe = CodexProbe(interval=CODEX_PROBE_INTERVAL, launcher=codex_launcher)
+loop_monitor = LoopLagMonitor()
+
+# Metrics exposed at /metrics; gauges are read from live state at scrape time
+metrics = Registry()
+CODEX_RUN_SECONDS = metrics.histogram(
+    "codex_run_seconds", "Wall time of Codex CLI runs, from spawn to exit", ["exit_code"])
+CODEX_SPAWN_SECONDS = metrics.histogram(
+    "codex_spawn_seconds", "Time to start the Codex CLI process")
+CODEX_FIRST_OUTPUT_SECONDS = metrics.histogram(
+    "codex_first_output_seconds", "Time from spawning Codex to its first byte of stdout")
+CODEX_PARSE_SECONDS = metrics.histogram(
+    "codex_parse_seconds", "Time spent parsing Codex output per run",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+AI_BACKEND_SECONDS = metrics.histogram(
+    "ai_backend_seconds", "Wall time of chat requests by backend and outcome", ["backend", "outcome"])
+WEBSOCKET_BYTES_SENT = metrics.counter(
+    "websocket_bytes_sent_total", "Bytes of WebSocket text frames sent to clients")
+WEBSOCKET_MESSAGES_SENT = metrics.counter(
+    "websocket_messages_sent_total", "WebSocket frames sent to clients")
+metrics.gauge("codex_queue_depth", "Codex jobs waiting for a free slot", lambda: codex_scheduler.queued)
+metrics.gauge("codex_running_jobs", "Codex jobs currently running", lambda: codex_scheduler.running)
+metrics.gauge("websocket_connections", "Open WebSocket connections", lambda: len(manager.active_connections))
+metrics.gauge("sessions", "Sessions held in memory", lambda: len(codex_manager.sessions))
+metrics.gauge("event_loop_lag_seconds", "Most recent event-loop lag measured by the ticker",
+              lambda: loop_monitor.lag)
+metrics.gauge("log_records_dropped", "Log records dropped because the log queue was full", dropped_records)
+
+async def terminate_process_group(process, grace: float = CODEX_KILL_GRACE):
+    """Stop a Codex run together with every tool process it spawned.
+
+    Codex is started in its own session, so its process group contains the
+    shell commands run by --full-auto tool calls. The group gets SIGTERM, then
+    SIGKILL if anything is still alive after the grace period.
+    """
+    if process.returncode is not None:
+        return
+
+    def signal_group(sig):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, sig)
+            elif sig == signal.SIGTERM:
+                process.terminate()
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    signal_group(signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=grace)
+    except asyncio.TimeoutError:
+        pass
+    # Tool processes may outlive the CLI itself, so always sweep the group
+    signal_group(getattr(signal, "SIGKILL", signal.SIGTERM))
+    await process.wait()
+
+class SessionRecord:
+    """Per-session bookkeeping; monotonic timestamps, formatted only on demand"""
+    
+    __slots__ = ("created", "last_seen")
+    
+    def __init__(self, now: float):
+        self.created = now
+        self.last_seen = now
+    
+    def to_dict(self) -> dict:
+        return {
+            "created_at": format_timestamp(self.created),
+            "last_activity": format_timestamp(self.last_seen)
+        }
+
 class CodexManager:
-    def __init__(self):
-        self.sessions: Dict[str, dict] = {}
-        self.conversation_history: Dict[str, List[dict]] = {}
+    def __init__(self, session_ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS,
+                 history_store: Optional[HistoryStore] = None, readonly_backend: Optional[ChatBackend] = None,
+                 file_index: Optional[FileIndexService] = None):
+        # Ordered least recently used first, so eviction scans from the front
+        self.sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self.conversation_history: Dict[str, Conversation] = {}
+        self.context_token_budget = CONTEXT_TOKEN_BUDGET
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        # session_id -> number of open WebSockets using it; attached sessions are never evicted
+        self.attached_sessions: Dict[str, int] = {}
+        self.evicted_sessions = 0
+        # Where conversations go beyond this process's memory
+        self.history_store = history_store or MemoryHistoryStore()
+        # Answers to read-only (auto_save off) requests, keyed on context + workspace state
+        self.response_cache = ResponseCache.from_env()
+        # Edits always run through the Codex CLI; read-only chat may use another backend
+        self.cli_backend = CodexCLIBackend(self)
+        self.readonly_backend: ChatBackend = readonly_backend or self.cli_backend
+        # Watched file maps: cache-key fingerprints and the files each edit run changed
+        self.file_index = file_index or FileIndexService.from_env()
+        # Workspace path -> [lock, users]; one edit run per workspace at a time
+        self.edit_locks: Dict[str, list] = {}
 
-    def get_or_create_session(self, session_id: str) -> dict:
+    def get_or_create_session(self, session_id: str) -> SessionRecord:
         """Get or create a session for conversation management"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "created_at": datetime.now().isoformat(),
-                "last_activity": datetime.now().isoformat()
-            }
+        now = time.monotonic()
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = SessionRecord(now)
+            if len(self.sessions) > self.max_sessions:
+                self.evict_sessions()
         if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = []
+            # Restore history persisted before a restart or eviction
+            self.conversation_history[session_id] = self.new_conversation(self.history_store.load(session_id))
         
         # Update last activity
-        self.sessions[session_id]["last_activity"] = datetime.now().isoformat()
-        return self.sessions[session_id]
+        session.last_seen = now
+        self.sessions.move_to_end(session_id)
+        return session
+    
+    async def load_session(self, session_id: str) -> SessionRecord:
+        """get_or_create_session for async callers: persisted history is read off the event loop"""
+        if self.history_store.persistent and session_id not in self.conversation_history:
+            messages = await asyncio.to_thread(self.history_store.load, session_id)
+            # Another task may have loaded it while this one waited
+            if session_id not in self.conversation_history:
+                self.conversation_history[session_id] = self.new_conversation(messages)
+        return self.get_or_create_session(session_id)
+    
+    def new_conversation(self, messages: Iterable[Message] = ()) -> Conversation:
+        return Conversation(messages, max_messages=MAX_HISTORY_MESSAGES, snippet_tokens=CONTEXT_SNIPPET_TOKENS)
+    
+    def get_history(self, session_id: str) -> List[dict]:
+        """Conversation history of a session as JSON-serialisable messages"""
+        self.get_or_create_session(session_id)
+        return self.conversation_history[session_id].to_list()
+    
+    async def resume_session(self, session_token: Optional[str]) -> Tuple[str, bool]:
+        """Map a client-presented session token to a session id.
+
+        Returns (session_id, resumed). Unknown or malformed tokens get a fresh
+        session. With a persistent history store the in-memory copy is
+        reloaded, since another worker may have extended the conversation;
+        the store is queried in a worker thread.
+        """
+        if session_token:
+            try:
+                session_id = str(uuid.UUID(session_token))
+            except ValueError:
+                session_id = None
+            if session_id is not None:
+                if self.history_store.persistent and \
+                        await asyncio.to_thread(self.history_store.has_session, session_id):
+                    self.conversation_history.pop(session_id, None)
+                    return session_id, True
+                if session_id in self.sessions:
+                    return session_id, True
+        return str(uuid.uuid4()), False
+    
+    def attach_session(self, session_id: str):
+        """Pin a session while a WebSocket is using it"""
+        self.attached_sessions[session_id] = self.attached_sessions.get(session_id, 0) + 1
+        self.get_or_create_session(session_id)
+    
+    def detach_session(self, session_id: str):
+        """Release a pin; the session then ages out normally"""
+        remaining = self.attached_sessions.get(session_id, 0) - 1
+        if remaining > 0:
+            self.attached_sessions[session_id] = remaining
+        else:
+            self.attached_sessions.pop(session_id, None)
+    
+    def drop_session(self, session_id: str):
+        """Forget a session and its conversation history"""
+        self.sessions.pop(session_id, None)
+        self.conversation_history.pop(session_id, None)
+    
+    def evict_sessions(self, now: Optional[float] = None) -> int:
+        """Drop idle sessions past the TTL, then the least recently used over the cap"""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_seen <= self.session_ttl:
+                break  # Everything after this was used more recently
+            if session_id in self.attached_sessions:
+                continue
+            self.drop_session(session_id)
+            evicted += 1
+        
+        excess = len(self.sessions) - self.max_sessions
+        if excess > 0:
+            for session_id in list(self.sessions):
+                if excess <= 0:
+                    break
+                if session_id in self.attached_sessions:
+                    continue
+                self.drop_session(session_id)
+                evicted += 1
+                excess -= 1
+        
+        self.evicted_sessions += evicted
+        return evicted
+    
+    def session_stats(self) -> dict:
+        """Session counts and an approximation of the memory they hold"""
+        approx_bytes = sys.getsizeof(self.sessions) + sys.getsizeof(self.conversation_history)
+        approx_bytes += len(self.sessions) * (sys.getsizeof(SessionRecord(0.0)) + 2 * sys.getsizeof(0.0))
+        messages = 0
+        for history in self.conversation_history.values():
+            messages += len(history)
+            approx_bytes += sys.getsizeof(history) + sys.getsizeof(history.messages) + history.approx_size()
+            for message in history:
+                approx_bytes += sys.getsizeof(message) + sys.getsizeof(message.content) \
+                    + sys.getsizeof(message.created) + sys.getsizeof(message.tokens)
+        return {
+            "sessions": len(self.sessions),
+            "attached": len(self.attached_sessions),
+            "messages": messages,
+            "approx_bytes": approx_bytes,
+            "evicted": self.evicted_sessions,
+            "session_ttl": self.session_ttl,
+            "max_sessions": self.max_sessions,
+        }
     
     def add_to_conversation(self, session_id: str, role: str, content: str):
         """Add a message to the conversation history"""
         self.get_or_create_session(session_id)
-        self.conversation_history[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Keep only the last 20 messages to prevent excessive context
-        if len(self.conversation_history[session_id]) > 20:
-            self.conversation_history[session_id] = self.conversation_history[session_id][-20:]
+        message = Message(role, content)
+        # The bounded window drops the oldest message and updates snippets in place
+        self.conversation_history[session_id].append(message)
+        # Persisting is write-behind, this only enqueues the message
+        self.history_store.append(session_id, message)
     
     def build_conversation_context(self, session_id: str, new_prompt: str) -> str:
         """Build a context-aware prompt including conversation history"""
         self.get_or_create_session(session_id)
-        history = self.conversation_history[session_id]
-        
-        if not history:
-            # First message, no context needed
-            return new_prompt
-        
-        # Build context from recent conversation
-        context_parts = ["Previous conversation context:"]
-        for message in history[-10:]:  # Last 10 messages for context
-            role = message["role"]
-            content = message["content"][:200]  # Truncate long messages
-            if len(message["content"]) > 200:
-                content += "..."
-            context_parts.append(f"{role.capitalize()}: {content}")
-        
-        context_parts.append("\nCurrent request:")
-        context_parts.append(new_prompt)
-        
-        return "\n".join(context_parts)
+        return self.conversation_history[session_id].build_prompt(new_prompt, self.context_token_budget)
     
     def clear_conversation(self, session_id: str):
         """Clear conversation history for a session"""
         if session_id in self.conversation_history:
-            self.conversation_history[session_id] = []
+            self.conversation_history[session_id].clear()
+        self.history_store.clear(session_id)
 
     def parse_codex_response(self, codex_output: str) -> str:
         """Parse Codex CLI JSON output to extract the actual AI response"""
-        try:
-            # Split by lines and try to parse each JSON line
-            lines = codex_output.strip().split('\n')
-            responses = []
-            
-            for line in lines:
-                if not line.strip():
+        started = time.perf_counter()
+        responses = [
+            event.text
+            for event in iter_codex_events([codex_output.encode('utf-8')])
+            if event.kind != ERROR
+        ]
+        CODEX_PARSE_SECONDS.observe(time.perf_counter() - started)
+        current_trace().add_span("parse", started)
+        return self.finalize_response(responses)
+
+    def finalize_response(self, responses: List[str]) -> str:
+        """Join streamed response parts into the final AI response text"""
+        final_response = '\n'.join(text for text in responses if text).strip()
+        if not final_response:
+            return "AI response received successfully"
+        # Clean up any escape characters
+        return final_response.replace('\\n', '\n').replace('\\"', '"')
+
+    async def stream_codex_output(self, process, on_chunk: Optional[ChunkCallback] = None,
+                                  started: Optional[float] = None) -> Tuple[List[str], List[str], bytes]:
+        """Read Codex CLI stdout in chunks, forwarding response parts as they appear.
+
+        Returns the collected response texts, any error messages reported by
+        Codex and a bounded tail of the raw stdout (used for error reporting).
+        `started` is the perf_counter() reading taken before the process was
+        spawned, used to time the first byte of output.
+        """
+        parser = CodexStreamParser()
+        responses = []
+        errors = []
+        stdout_tail = bytearray()
+        parse_seconds = 0.0
+
+        async def dispatch(events):
+            for event in events:
+                if event.kind == ERROR:
+                    errors.append(event.text)
+                elif event.text:
+                    responses.append(event.text)
+                else:
                     continue
-                    
-                try:
-                    data = json.loads(line)
-                    
-                    # Look for assistant messages
-                    if data.get('type') == 'message' and data.get('role') == 'assistant':
-                        content = data.get('content', [])
-                        if isinstance(content, list):
-                            for item in content:
-                                if item.get('type') == 'output_text':
-                                    responses.append(item.get('text', ''))
-                        elif isinstance(content, str):
-                            responses.append(content)
-                    
-                    # Look for function call outputs that might contain responses
-                    elif data.get('type') == 'function_call_output':
-                        output_data = data.get('output', {})
-                        if isinstance(output_data, str):
-                            try:
-                                parsed_output = json.loads(output_data)
-                                if 'output' in parsed_output:
-                                    responses.append(parsed_output['output'].strip())
-                            except json.JSONDecodeError:
-                                responses.append(output_data.strip())
-                        elif isinstance(output_data, dict) and 'output' in output_data:
-                            responses.append(output_data['output'].strip())
-                    
-                except json.JSONDecodeError:
-                    # If it's not JSON, it might be plain text response
-                    if line.strip() and not line.startswith('{'):
-                        responses.append(line.strip())
-            
-            # Join all responses
-            if responses:
-                final_response = '\n'.join(responses).strip()
-                # Clean up any escape characters
-                final_response = final_response.replace('\\n', '\n').replace('\\"', '"')
-                return final_response or "Response processed successfully"
-            else:
-                # Fallback: return the first non-empty line that looks like text
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('{') and len(line) > 10:
-                        return line
-                
-                return "AI response received successfully"
-                
-        except Exception as e:
-            print(f"Error parsing Codex response: {e}")
-            # Return a cleaned version of the original output as fallback
-            cleaned = codex_output.replace('\\n', '\n').replace('\\"', '"')
-            return cleaned[:500] + "..." if len(cleaned) > 500 else cleaned
-
-    async def execute_ai_chat(self, command: str, session_id: str, workspace_path: str = None, auto_save: bool = True) -> dict:
-        """Execute an AI chat command using Codex CLI with conversation context"""
+                if on_chunk is not None:
+                    await on_chunk(event.kind, event.text.replace('\\n', '\n').replace('\\"', '"'))
+
+        while True:
+            chunk = await process.stdout.read(CODEX_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if started is not None:
+                CODEX_FIRST_OUTPUT_SECONDS.observe(time.perf_counter() - started)
+                current_trace().add_span("first_output", started)
+                started = None
+            stdout_tail += chunk
+            if len(stdout_tail) > CODEX_STDOUT_TAIL_BYTES:
+                del stdout_tail[:-CODEX_STDOUT_TAIL_BYTES]
+            # Parse before dispatching so the time spent sending is not counted
+            parse_started = time.perf_counter()
+            events = list(parser.feed(chunk))
+            parse_seconds += time.perf_counter() - parse_started
+            await dispatch(events)
+
+        parse_started = time.perf_counter()
+        events = list(parser.close())
+        parse_finished = time.perf_counter()
+        parse_seconds += parse_finished - parse_started
+        CODEX_PARSE_SECONDS.observe(parse_seconds)
+        # Parsing is interleaved with reading; report it as one span of the summed time
+        current_trace().add_span("parse", parse_finished - parse_seconds, parse_finished)
+        await dispatch(events)
+        return responses, errors, bytes(stdout_tail)
+
+    async def response_cache_key(self, command: str, session_id: str, workspace_path: str = None) -> Optional[str]:
+        """Cache key for a read-only request, or None when caching is disabled"""
+        if not self.response_cache.enabled:
+            return None
+        cwd = workspace_path or os.getcwd()
+        context = self.build_conversation_context(session_id, command)
+        # Usually answered from the watched index; the first call for a workspace scans it
+        fingerprint = await asyncio.to_thread(self.file_index.fingerprint, cwd)
+        return make_cache_key(context, cwd, fingerprint)
+
+    async def get_cached_response(self, command: str, session_id: str, cache_key: Optional[str],
+                                  on_chunk: Optional[ChunkCallback] = None) -> Optional[dict]:
+        """Answer a read-only request from the response cache, if possible"""
+        if cache_key is None:
+            return None
+        ai_response = self.response_cache.get(cache_key)
+        if ai_response is None:
+            return None
+
+        self.add_to_conversation(session_id, "user", command)
+        self.add_to_conversation(session_id, "assistant", ai_response)
+        if on_chunk is not None:
+            await on_chunk(ASSISTANT_TEXT, ai_response)
+
+        return {
+            "success": True,
+            "stdout": ai_response,
+            "stderr": "",
+            "exit_code": 0,
+            "cached": True,
+            "streamed": on_chunk is not None,
+            "chunks": 1,
+            # Same shape as a backend result; the answer came from no backend at all
+            "backend": "cache",
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def backend_for(self, auto_save: bool) -> ChatBackend:
+        """Backend for a request; edits always go through the Codex CLI"""
+        if auto_save and not self.readonly_backend.can_edit_files:
+            return self.cli_backend
+        return self.readonly_backend
+
+    @asynccontextmanager
+    async def workspace_edit(self, cwd: str):
+        """Hold the edit slot for a workspace, waiting for any edit run already in it"""
+        key = os.path.realpath(cwd)
+        entry = self.edit_locks.get(key)
+        if entry is None:
+            entry = self.edit_locks[key] = [asyncio.Lock(), 0]
+        # Users (holder plus waiters), so the lock is dropped once nobody needs it
+        entry[1] += 1
+        try:
+            with current_trace().span("workspace_wait"):
+                await entry[0].acquire()
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.edit_locks[key]
+
+    async def execute_ai_chat(self, command: str, session_id: str, workspace_path: str = None, auto_save: bool = True,
+                              on_chunk: Optional[ChunkCallback] = None, cache_key: Optional[str] = None) -> dict:
+        """Execute an AI chat command with conversation context.
+
+        Requests go to the Codex CLI, or for read-only ones to the configured
+        read-only backend. Output is consumed incrementally; when on_chunk is
+        given it is awaited with (kind, text) for each response part as soon
+        as it arrives. Successful answers are stored in the response cache
+        under cache_key.
+        """
+        trace = current_trace()
+        backend = self.backend_for(auto_save)
         # Build context-aware prompt
-        context_command = self.build_conversation_context(session_id, command)
+        with trace.span("context"):
+            context_command = self.build_conversation_context(session_id, command)
         
         # Add auto-save instruction if enabled
         if auto_save:
@@ -153,222 +505,595 @@ class CodexManager:
         # Add user message to history
         self.add_to_conversation(session_id, "user", command)
         
-        try:
-            # Prepare Codex CLI command
-            codex_cmd = ["codex", "-q"]  # -q for quiet/non-interactive mode
-            
-            # Add auto-approval flag if auto_save is enabled
+        # Set working directory
+        cwd = workspace_path or os.getcwd()
+        # Edit runs in one workspace take turns, so the files changed between the
+        # cursor and the diff are this run's (edits made outside Codex still count)
+        async with (self.workspace_edit(cwd) if auto_save else nullcontext()):
+            cursor = None
             if auto_save:
-                codex_cmd.append("--full-auto")
-            
-            # Add the prompt
-            codex_cmd.append(context_command)
-            
-            # Set working directory
-            cwd = workspace_path or os.getcwd()
-            
-            print(f"Executing Codex CLI in {cwd}: {' '.join(codex_cmd)}")
-            
-            # Execute Codex CLI command
-            process = await asyncio.create_subprocess_exec(
-                *codex_cmd,
-                cwd=cwd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=dict(os.environ, OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', ''))
-            )
-            
-            # Wait for completion with timeout
+                # Changes before this point are not the run's
+                with trace.span("snapshot"):
+                    cursor = await asyncio.to_thread(self.file_index.cursor, cwd, True)
+        
+            started = time.perf_counter()
             try:
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=120.0)
-            except asyncio.TimeoutError:
-                process.kill()
-                raise Exception("Codex CLI execution timed out after 120 seconds")
-            
-            # Decode output
-            stdout_text = stdout.decode('utf-8', errors='replace').strip()
-            stderr_text = stderr.decode('utf-8', errors='replace').strip()
-            
-            print(f"Codex CLI exit code: {process.returncode}")
-            print(f"Codex CLI stdout: {stdout_text[:500]}...")
-            print(f"Codex CLI stderr: {stderr_text[:200]}...")
-            
-            if process.returncode == 0:
-                # Parse Codex CLI response to extract the actual AI message
-                ai_response = self.parse_codex_response(stdout_text)
-                self.add_to_conversation(session_id, "assistant", ai_response)
-                
-                return {
-                    "success": True,
-                    "stdout": ai_response,
-                    "stderr": stderr_text,
-                    "exit_code": process.returncode,
-                    "timestamp": datetime.now().isoformat()
+                result = await backend.complete(context_command, session_id, cwd, auto_save, on_chunk)
+            except FileNotFoundError:
+                result = {
+                    "success": False,
+                    "error": "⚠️ Codex CLI not found. Please install with: npm install -g @openai/codex"
                 }
-            else:
-                # Error occurred
-                error_msg = stderr_text or stdout_text or f"Codex CLI failed with exit code {process.returncode}"
-                
-                # Check for common error patterns
-                if "API key" in error_msg or "authentication" in error_msg.lower():
-                    error_msg = "⚠️ OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
-                elif "not found" in error_msg.lower() and "codex" in error_msg.lower():
-                    error_msg = "⚠️ Codex CLI not found. Please install with: npm install -g @openai/codex"
-                
-                return {
+            except Exception as e:
+                log_event(codex_log, logging.ERROR, "codex.error", session_id=session_id, backend=backend.name, error=str(e))
+                result = {
                     "success": False,
-                    "error": error_msg,
-                    "stderr": stderr_text,
-                    "stdout": stdout_text,
-                    "exit_code": process.returncode,
-                    "timestamp": datetime.now().isoformat()
+                    "error": f"Error executing {backend.description}: {str(e)}"
                 }
-                
-        except FileNotFoundError:
-            error_msg = "⚠️ Codex CLI not found. Please install with: npm install -g @openai/codex"
-            return {
-                "success": False,
-                "error": error_msg,
-                "timestamp": datetime.now().isoformat()
-            }
-        except Exception as e:
-            error_msg = f"Error executing Codex CLI: {str(e)}"
-            print(f"Exception in execute_ai_chat: {e}")
+            AI_BACKEND_SECONDS.observe(time.perf_counter() - started, backend=backend.name,
+                                       outcome="ok" if result["success"] else "error")
+        
+            if result["success"]:
+                self.add_to_conversation(session_id, "assistant", result["stdout"])
+                if cache_key is not None:
+                    self.response_cache.put(cache_key, result["stdout"])
+                result["streamed"] = on_chunk is not None
+            if cursor is not None:
+                # Failed runs may have edited files too
+                with trace.span("diff"):
+                    changes, _ = await asyncio.to_thread(self.file_index.changed_since, cwd, cursor, True)
+                if changes is not None:
+                    result["files_changed"] = [change.to_dict() for change in changes]
+        result["backend"] = backend.name
+        result["timestamp"] = datetime.now().isoformat()
+        return result
+
+class CodexCLIBackend(ChatBackend):
+    """Runs each request as a `codex -q` process, the only backend that can edit files"""
+
+    name = "cli"
+    description = "Codex CLI"
+    can_edit_files = True
+
+    def __init__(self, manager: CodexManager):
+        self.manager = manager
+
+    async def complete(self, prompt: str, session_id: str, cwd: str, auto_save: bool,
+                       on_chunk: Optional[ChunkCallback] = None) -> dict:
+        trace = current_trace()
+        # Execute Codex CLI command
+        started = time.perf_counter()
+        process = await codex_launcher.spawn(codex_launcher.command(prompt, auto_save), cwd)
+        spawned = time.perf_counter()
+        CODEX_SPAWN_SECONDS.observe(spawned - started)
+        trace.add_span("spawn", started, spawned)
+        log_event(codex_log, logging.INFO, "codex.spawn", session_id=session_id, cwd=cwd,
+                  pid=process.pid, auto_save=auto_save, prompt=redact(prompt))
+        
+        # Drain stderr concurrently so a chatty CLI cannot block on a full pipe
+        stderr_task = asyncio.create_task(process.stderr.read())
+        
+        # Stream stdout until the process exits, with timeout
+        async def run_to_completion():
+            result = await self.manager.stream_codex_output(process, on_chunk, started)
+            await process.wait()
+            return result
+        
+        try:
+            responses, codex_errors, stdout_tail = await asyncio.wait_for(run_to_completion(), timeout=CODEX_TIMEOUT)
+        except asyncio.TimeoutError:
+            stderr_task.cancel()
+            await terminate_process_group(process)
+            CODEX_RUN_SECONDS.observe(time.perf_counter() - started, exit_code="timeout")
+            raise Exception(f"Codex CLI execution timed out after {int(CODEX_TIMEOUT)} seconds")
+        except asyncio.CancelledError:
+            log_event(codex_log, logging.INFO, "codex.cancel", session_id=session_id, pid=process.pid)
+            stderr_task.cancel()
+            # Shielded so a second cancellation cannot leave the group running
+            await asyncio.shield(terminate_process_group(process))
+            CODEX_RUN_SECONDS.observe(time.perf_counter() - started, exit_code="cancelled")
+            raise
+        CODEX_RUN_SECONDS.observe(time.perf_counter() - started, exit_code=process.returncode)
+        trace.add_span("exit", spawned)
+        
+        stderr_text = (await stderr_task).decode('utf-8', errors='replace').strip()
+        stdout_text = stdout_tail.decode('utf-8', errors='replace').strip()
+        
+        log_event(codex_log, logging.INFO if process.returncode == 0 else logging.WARNING, "codex.exit",
+                  session_id=session_id, exit_code=process.returncode,
+                  seconds=round(time.perf_counter() - started, 3),
+                  stdout=redact(stdout_text), stderr=redact(stderr_text))
+        
+        if process.returncode == 0:
+            # Join the streamed response parts into the final AI message
             return {
-                "success": False,
-                "error": error_msg,
-                "timestamp": datetime.now().isoformat()
+                "success": True,
+                "stdout": self.manager.finalize_response(responses),
+                "stderr": stderr_text,
+                "exit_code": process.returncode,
+                "chunks": len(responses)
             }
+        
+        # Error occurred
+        error_msg = stderr_text or '\n'.join(codex_errors) or stdout_text or f"Codex CLI failed with exit code {process.returncode}"
+        
+        # Check for common error patterns
+        if "API key" in error_msg or "authentication" in error_msg.lower():
+            error_msg = "⚠️ OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
+        elif "not found" in error_msg.lower() and "codex" in error_msg.lower():
+            error_msg = "⚠️ Codex CLI not found. Please install with: npm install -g @openai/codex"
+        
+        return {
+            "success": False,
+            "error": error_msg,
+            "stderr": stderr_text,
+            "stdout": stdout_text,
+            "exit_code": process.returncode
+        }
+
+codex_manager = CodexManager(history_store=create_history_store(), readonly_backend=create_readonly_backend())
+codex_scheduler = CodexScheduler.from_env()
 
-codex_manager = CodexManager()
+async def session_sweeper(interval: float = SESSION_SWEEP_INTERVAL):
+    """Periodically evict idle and excess sessions so memory stays bounded"""
+    while True:
+        await asyncio.sleep(interval)
+        evicted = codex_manager.evict_sessions()
+        if evicted:
+            log_event(server_log, logging.INFO, "sessions.evicted", evicted=evicted,
+                      remaining=len(codex_manager.sessions))
+        codex_manager.history_store.prune(HISTORY_RETENTION)
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # Serialises sends from concurrent command tasks on the same socket
+        self.send_locks: Dict[WebSocket, asyncio.Lock] = {}
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.send_locks[websocket] = asyncio.Lock()
     
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
+        self.send_locks.pop(websocket, None)
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        WEBSOCKET_MESSAGES_SENT.inc()
+        # ASCII frames (the common case) need no encoding just to be measured
+        WEBSOCKET_BYTES_SENT.inc(len(message) if message.isascii() else len(message.encode('utf-8')))
+        lock = self.send_locks.get(websocket)
+        if lock is None:
+            await websocket.send_text(message)
+            return
+        async with lock:
+            await websocket.send_text(message)
 
 manager = ConnectionManager()
 
-@app.get("/")
-async def get_homepage():
+class ClientConnection:
+    """Per-WebSocket state: the session id and the command tasks in flight"""
+    
+    def __init__(self, websocket: WebSocket, session_id: str):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.closed = False
+        # task -> client-supplied request id
+        self.tasks: Dict[asyncio.Task, Optional[str]] = {}
+    
+    async def send(self, payload: dict, request_id: Optional[str] = None):
+        """Send a JSON frame, tagged with the request id it answers"""
+        if request_id is not None:
+            payload["request_id"] = request_id
+        await manager.send_personal_message(json.dumps(payload), self.websocket)
+    
+    def spawn(self, coro: Awaitable[None], request_id: Optional[str]) -> asyncio.Task:
+        """Run a long command in the background so the receive loop stays free"""
+        task = asyncio.create_task(coro)
+        self.tasks[task] = request_id
+        task.add_done_callback(self._task_done)
+        return task
+    
+    @property
+    def busy(self) -> bool:
+        """Whether a background command is still running on this socket"""
+        return any(not task.done() for task in self.tasks)
+    
+    def cancel(self, request_id: Optional[str] = None) -> List[Optional[str]]:
+        """Cancel the in-flight task for request_id, or all of them if None"""
+        cancelled = []
+        for task, task_request_id in list(self.tasks.items()):
+            if request_id is None or task_request_id == request_id:
+                task.cancel()
+                cancelled.append(task_request_id)
+        return cancelled
+    
+    def close(self):
+        """Mark the socket gone and abandon everything it started"""
+        self.closed = True
+        cancelled = self.cancel()
+        if cancelled:
+            log_event(ws_log, logging.INFO, "ws.requests_cancelled", session_id=self.session_id,
+                      count=len(cancelled))
+    
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            log_event(ws_log, logging.ERROR, "ws.command_failed", session_id=self.session_id,
+                      error=str(task.exception()))
+
+async def handle_ai_chat(client: ClientConnection, message_data: dict, request_id: Optional[str]):
+    """Handle AI chat requests (using Codex for code generation/modification)"""
+    session_id = client.session_id
+    ai_prompt = message_data.get("prompt", "")
+    workspace = message_data.get("workspace", os.getcwd())
+    auto_save = message_data.get("auto_save", True)  # Default to True for backward compatibility
+    log_event(ws_log, logging.INFO, "ai_chat.request", session_id=session_id, request_id=request_id,
+              auto_save=auto_save, prompt=redact(ai_prompt))
+    trace = current_trace()
+    
+    if not ai_prompt:
+        tracer.finish(trace, "invalid")
+        await client.send({
+            "type": "ai_response",
+            "session_id": session_id,
+            "prompt": "",
+            "result": {
+                "success": False,
+                "error": "Empty prompt provided",
+                "timestamp": datetime.now().isoformat()
+            }
+        }, request_id)
+        return
+    
+    # Stream response parts as they arrive when the client asks for it
+    on_chunk = None
+    if message_data.get("stream", False):
+        async def on_chunk(kind: str, text: str):
+            await client.send({
+                "type": "ai_response_chunk",
+                "session_id": session_id,
+                "prompt": ai_prompt,
+                "kind": kind,
+                "text": text
+            }, request_id)
+    
+    async def on_status(status: str, position: int):
+        await client.send({
+            "type": "ai_status",
+            "session_id": session_id,
+            "prompt": ai_prompt,
+            "status": status,
+            "position": position,
+            "queue_depth": codex_scheduler.queued,
+            "timestamp": datetime.now().isoformat()
+        }, request_id)
+    
+    async def run_codex():
+        trace.add_span("queue_wait", submitted)
+        return await codex_manager.execute_ai_chat(ai_prompt, session_id, workspace, auto_save, on_chunk, cache_key)
+    
+    try:
+        # Read-only questions can be answered from the response cache without a Codex run
+        cache_key = None
+        result = None
+        if not auto_save:
+            with trace.span("cache_lookup"):
+                cache_key = await codex_manager.response_cache_key(ai_prompt, session_id, workspace)
+                result = await codex_manager.get_cached_response(ai_prompt, session_id, cache_key, on_chunk)
+        
+        # Use context-aware command execution, gated by the scheduler
+        if result is None:
+            submitted = time.perf_counter()
+            result = await codex_scheduler.run(session_id, run_codex, on_status)
+    except SchedulerFullError as e:
+        result = {
+            "success": False,
+            "error": f"⚠️ {e}",
+            "rejected": True,
+            "timestamp": datetime.now().isoformat()
+        }
+    except asyncio.CancelledError:
+        tracer.finish(trace, "cancelled")
+        # Let the client know the request ended, unless it is the one that left
+        if not client.closed:
+            await client.send({
+                "type": "ai_response",
+                "session_id": session_id,
+                "prompt": ai_prompt,
+                "result": {
+                    "success": False,
+                    "error": "Request cancelled",
+                    "cancelled": True,
+                    "timestamp": datetime.now().isoformat()
+                }
+            }, request_id)
+        raise
+    # Changed files (with diffs) go in their own frame, the answer only lists their paths
+    files_changed = result.get("files_changed")
+    if files_changed:
+        await client.send({
+            "type": "files_changed",
+            "session_id": session_id,
+            "prompt": ai_prompt,
+            "files": files_changed,
+            "timestamp": datetime.now().isoformat()
+        }, request_id)
+    if files_changed is not None:
+        result["files_changed"] = [change["path"] for change in files_changed]
+    with trace.span("send"):
+        await client.send({
+            "type": "ai_response",
+            "session_id": session_id,
+            "prompt": ai_prompt,
+            "result": result
+        }, request_id)
+    if result.get("cached"):
+        status = "cached"
+    elif result.get("rejected"):
+        status = "rejected"
+    else:
+        status = "ok" if result.get("success") else "error"
+    tracer.finish(trace, status)
+
+async def handle_clear_conversation(client: ClientConnection, message_data: dict, request_id: Optional[str]):
+    """Clear conversation history for this session"""
+    codex_manager.clear_conversation(client.session_id)
+    await client.send({
+        "type": "conversation_cleared",
+        "session_id": client.session_id,
+        "message": "Conversation history cleared",
+        "timestamp": datetime.now().isoformat()
+    }, request_id)
+
+async def handle_get_conversation_history(client: ClientConnection, message_data: dict, request_id: Optional[str]):
+    """Get conversation history for this session"""
+    history = codex_manager.get_history(client.session_id)
+    await client.send({
+        "type": "conversation_history",
+        "session_id": client.session_id,
+        "history": history,
+        "active_requests": len(client.tasks),
+        "timestamp": datetime.now().isoformat()
+    }, request_id)
+
+async def handle_cancel(client: ClientConnection, message_data: dict, request_id: Optional[str]):
+    """Cancel a running AI request (target_request_id), or every one on this socket"""
+    target = message_data.get("target_request_id")
+    cancelled = client.cancel(target)
+    await client.send({
+        "type": "cancelled",
+        "session_id": client.session_id,
+        "cancelled": cancelled,
+        "timestamp": datetime.now().isoformat()
+    }, request_id)
+
+# Long-running commands run as background tasks so the socket keeps serving
+# the quick commands, which are answered inline as soon as they arrive. Only
+# one background command runs per socket; others are rejected while it does.
+BACKGROUND_COMMANDS = {
+    "ai_chat": handle_ai_chat,
+}
+QUICK_COMMANDS = {
+    "clear_conversation": handle_clear_conversation,
+    "get_conversation_history": handle_get_conversation_history,
+    "cancel": handle_cancel,
+}
+
+# Minified, content-hashed copies of the frontend assets, built at startup and
+# rebuilt when their sources change
+asset_pipeline = AssetPipeline()
+# The homepage is served from memory, re-read only when the file or a built asset changes;
+# each revalidation also rebuilds assets whose sources were edited
+homepage = CachedPage("static/index.html", transform=asset_pipeline.rewrite_html, version=asset_pipeline.refresh)
+
+async def build_static_assets():
+    """Build hashed assets; the page keeps plain /static URLs if this fails"""
+    try:
+        seconds = await asyncio.to_thread(asset_pipeline.build)
+    except OSError as e:
+        log_event(server_log, logging.WARNING, "assets.build_failed", error=str(e))
+        return
+    homepage.invalidate()
+    for name, source_size, minified_size, compressed_size in build_summary(asset_pipeline):
+        log_event(server_log, logging.INFO, "assets.built", asset=name, source_bytes=source_size,
+                  minified_bytes=minified_size, compressed_bytes=compressed_size)
+    log_event(server_log, logging.INFO, "assets.build_time", ms=round(seconds * 1000, 1))
+
+@app.api_route("/", methods=["GET", "HEAD"])
+async def get_homepage(request: Request):
     """Serve the main HTML page"""
     try:
-        with open("static/index.html", "r") as f:
-            return HTMLResponse(content=f.read(), status_code=200)
+        return await homepage.respond(request.headers, head=request.method == "HEAD")
     except FileNotFoundError:
         return HTMLResponse(content="<h1>Frontend not found</h1><p>Please ensure static/index.html exists</p>", status_code=404)
 
+@app.api_route(f"{ASSETS_URL}/{{name}}", methods=["GET", "HEAD"])
+async def get_asset(name: str, request: Request):
+    """Serve a built asset; its hashed name makes it safe to cache forever"""
+    asset = asset_pipeline.get(name)
+    if asset is None:
+        return Response(status_code=404)
+    return encoded_response(asset.bodies, request.headers, asset.media_type,
+                            {"Cache-Control": IMMUTABLE_CACHE_CONTROL}, head=request.method == "HEAD")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication"""
     await manager.connect(websocket)
-    session_id = str(uuid.uuid4())
-    print(f"New WebSocket connection: {session_id}")
+    # Clients reconnecting (possibly to another worker) present their session token
+    session_id, resumed = await codex_manager.resume_session(websocket.query_params.get("session_token"))
+    log_event(ws_log, logging.INFO, "ws.connect", session_id=session_id, resumed=resumed)
+    
+    client = ClientConnection(websocket, session_id)
+    # Persisted history is read in a worker thread; attaching then finds it in memory
+    await codex_manager.load_session(session_id)
+    codex_manager.attach_session(session_id)
     
     try:
+        await client.send({
+            "type": "session",
+            "session_id": session_id,
+            "session_token": session_id,
+            "resumed": resumed,
+            "history_length": len(codex_manager.get_history(session_id)),
+            "timestamp": datetime.now().isoformat()
+        })
+        
         while True:
             data = await websocket.receive_text()
-            print(f"Received message from {session_id}: {data}")
+            received = time.perf_counter()
+            # Per-frame events are sampled and never include the payload itself
+            log_event(ws_log, logging.DEBUG, "ws.message", sample=True, session_id=session_id, bytes=len(data))
             
             try:
                 message_data = json.loads(data)
             except json.JSONDecodeError as e:
-                print(f"Invalid JSON received: {e}")
-                await manager.send_personal_message(json.dumps({
+                log_event(ws_log, logging.WARNING, "ws.invalid_json", session_id=session_id, error=str(e))
+                await client.send({
                     "type": "error",
                     "message": "Invalid JSON format"
-                }), websocket)
+                })
                 continue
             
+            decoded = time.perf_counter()
             command_type = message_data.get("type")
-            workspace = message_data.get("workspace", os.getcwd())
-            auto_save = message_data.get("auto_save", True)  # Default to True for backward compatibility
-            
-            print(f"Processing command type: {command_type}")
+            request_id = message_data.get("request_id")
+            log_event(ws_log, logging.DEBUG, "ws.command", sample=True, session_id=session_id,
+                      command=command_type, request_id=request_id)
             
-            if command_type == "ai_chat":
-                # Handle AI chat requests (using Codex for code generation/modification)
-                ai_prompt = message_data.get("prompt", "")
-                auto_save = message_data.get("auto_save", True)  # Default to True for backward compatibility
-                print(f"AI chat prompt: {ai_prompt}")
-                
-                if not ai_prompt:
-                    await manager.send_personal_message(json.dumps({
-                        "type": "ai_response",
-                        "session_id": session_id,
-                        "prompt": "",
-                        "result": {
-                            "success": False,
-                            "error": "Empty prompt provided",
-                            "timestamp": datetime.now().isoformat()
-                        }
-                    }), websocket)
-                    continue
-                
-                # Use context-aware command execution
-                result = await codex_manager.execute_ai_chat(ai_prompt, session_id, workspace, auto_save)
-                await manager.send_personal_message(json.dumps({
-                    "type": "ai_response",
-                    "session_id": session_id,
-                    "prompt": ai_prompt,
-                    "result": result
-                }), websocket)
-            
-            elif command_type == "clear_conversation":
-                # Clear conversation history for this session
-                codex_manager.clear_conversation(session_id)
-                await manager.send_personal_message(json.dumps({
-                    "type": "conversation_cleared",
-                    "session_id": session_id,
-                    "message": "Conversation history cleared",
-                    "timestamp": datetime.now().isoformat()
-                }), websocket)
-            
-            elif command_type == "get_conversation_history":
-                # Get conversation history for this session
-                codex_manager.get_or_create_session(session_id)
-                history = codex_manager.conversation_history.get(session_id, [])
-                await manager.send_personal_message(json.dumps({
-                    "type": "conversation_history",
-                    "session_id": session_id,
-                    "history": history,
-                    "timestamp": datetime.now().isoformat()
-                }), websocket)
+            if command_type in BACKGROUND_COMMANDS and client.busy:
+                # One AI job per socket: a second edit run would race the first in the same
+                # workspace, and its prompt would lack the answer still being produced
+                log_event(ws_log, logging.WARNING, "ws.busy", session_id=session_id,
+                          command=command_type, request_id=request_id)
+                await client.send({
+                    "type": "error",
+                    "message": "⚠️ An AI request is already running; wait for it or cancel it first",
+                    "busy": True,
+                    "active_request_ids": list(client.tasks.values())
+                }, request_id)
+            elif command_type in BACKGROUND_COMMANDS:
+                # The trace starts once the frame is in; the task inherits it as current
+                trace = tracer.start(command_type, started=received, session_id=session_id,
+                                     request_id=request_id, frame_bytes=len(data))
+                trace.add_span("decode", received, decoded)
+                with use_trace(trace):
+                    client.spawn(BACKGROUND_COMMANDS[command_type](client, message_data, request_id), request_id)
+            elif command_type in QUICK_COMMANDS:
+                await QUICK_COMMANDS[command_type](client, message_data, request_id)
             else:
-                print(f"Unknown command type: {command_type}")
-                await manager.send_personal_message(json.dumps({
+                log_event(ws_log, logging.WARNING, "ws.unknown_command", session_id=session_id, command=command_type)
+                await client.send({
                     "type": "error",
                     "message": f"Unknown command type: {command_type}"
-                }), websocket)
+                }, request_id)
                 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
-        print(f"Session {session_id} disconnected")
+        log_event(ws_log, logging.INFO, "ws.disconnect", session_id=session_id)
+    finally:
+        # Abandoned runs would otherwise keep burning CPU and API quota
+        client.close()
+        codex_manager.detach_session(session_id)
+        # Make the conversation visible to other workers before the client reconnects
+        if codex_manager.history_store.persistent:
+            await asyncio.to_thread(codex_manager.history_store.flush)
+
+@app.get("/stats")
+async def get_stats():
+    """Runtime counters for the scheduler and response cache"""
+    return {
+        "scheduler": codex_scheduler.stats(),
+        "sessions": codex_manager.session_stats(),
+        "response_cache": codex_manager.response_cache.stats(),
+        "history_store": codex_manager.history_store.stats(),
+        "static_assets": asset_pipeline.stats(),
+        "readonly_backend": codex_manager.readonly_backend.stats(),
+        "file_index": codex_manager.file_index.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/debug/traces")
+async def get_traces(limit: int = 20):
+    """Recent request traces and per-span latency percentiles"""
+    return {
+        "enabled": tracer.enabled,
+        "capacity": tracer.capacity,
+        "recorded": tracer.recorded,
+        "summary": tracer.summary(),
+        "traces": tracer.recent(limit),
+    }
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    """Whether this instance should receive new work; 503 tells the balancer to route away"""
+    scheduler = codex_scheduler.stats()
+    if scheduler["max_queue"] > 0:
+        saturation = scheduler["queued"] / scheduler["max_queue"]
+        saturated = saturation >= READY_QUEUE_RATIO
+    else:
+        saturation = scheduler["running"] / scheduler["max_concurrency"]
+        saturated = saturation >= 1
+    scheduler["saturation"] = round(saturation, 3)
+
+    has_api_key = api_key_configured()
+    reasons = []
+    if not codex_probe.available:
+        reasons.append(f"codex unavailable: {codex_probe.error}")
+    if not has_api_key:
+        reasons.append("no API key configured")
+    if saturated:
+        reasons.append(f"scheduler saturated ({scheduler['queued']} queued, {scheduler['running']} running)")
+    if loop_monitor.max_recent > READY_MAX_LOOP_LAG:
+        reasons.append(f"event loop lagging ({loop_monitor.max_recent * 1000:.0f} ms)")
+
+    ready = not reasons
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "reasons": reasons,
+            "codex": codex_probe.status(),
+            "api_key_configured": has_api_key,
+            "scheduler": scheduler,
+            "event_loop": loop_monitor.status(),
+            "timestamp": datetime.now().isoformat(),
+        },
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
     # Create static directory if it doesn't exist
     os.makedirs("static", exist_ok=True)
     
+    workers = int(os.getenv("CODEX_WORKERS", "1"))
+    if workers > 1 and os.getenv("CODEX_HISTORY_BACKEND", "memory").lower() == "memory":
+        # Workers only share sessions through a persistent store
+        os.environ["CODEX_HISTORY_BACKEND"] = "sqlite"
+        print("ℹ️  CODEX_WORKERS > 1: using the sqlite history backend so workers share sessions")
+    
     print("🚀 Starting AI Interactive CMS...")
     print("📝 Make sure you have Codex CLI installed and configured")
     print("⚠️  Running with --dangerously-auto-approve-everything (auto-executes commands)")
     print("🌐 Server will be available at http://localhost:8000")
     print(f"🔑 Azure OpenAI API Key: {'SET' if os.getenv('AZURE_OPENAI_API_KEY') else 'NOT SET'}")
     
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, reload_excludes=["test_*.py"])
+    if workers > 1:
+        # Auto-reload only supports a single process
+        print(f"👥 Starting {workers} worker processes")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, reload_excludes=["test_*.py"])
@@ -0,0 +1,121 @@
+"""
+Readiness checks for load balancers.
+
+CodexProbe resolves the codex binary and its version in the background and
+caches the answer, so a readiness probe never spawns a process. LoopLagMonitor
+runs a ticker that measures how late the event loop wakes it up, which is how
+saturation of the loop itself shows up.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Environment variables holding a key Codex can authenticate with
+API_KEY_VARS = ("OPENAI_API_KEY", "AZURE_OPENAI_API_KEY", "OPENROUTER_API_KEY")
+
+
+def api_key_configured() -> bool:
+    """Whether any provider key is set to something other than the .env.example placeholder"""
+    for name in API_KEY_VARS:
+        value = os.getenv(name, "")
+        if value and not value.startswith("your-"):
+            return True
+    return False
+
+
+class CodexProbe:
+    """Cached check that the codex CLI is installed and runs"""
+
+    def __init__(self, binary: str = "codex", interval: float = 300.0, timeout: float = 10.0, launcher=None):
+        # With a CodexLauncher the probe checks exactly the binary runs are started with
+        self.launcher = launcher
+        self.binary = launcher.binary if launcher is not None else binary
+        self.interval = interval
+        self.timeout = timeout
+        self.path: Optional[str] = None
+        self.version: Optional[str] = None
+        self.error: Optional[str] = "not checked yet"
+        self.checked_at: Optional[float] = None
+
+    @property
+    def available(self) -> bool:
+        return self.path is not None and self.error is None
+
+    async def check(self):
+        """Resolve the binary and ask it for its version"""
+        path = self.launcher.resolved if self.launcher is not None else shutil.which(self.binary)
+        version, error = None, None
+        if path is None:
+            error = f"{self.binary} not found on PATH"
+        else:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    path, "--version",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    stdin=asyncio.subprocess.DEVNULL,
+                )
+                try:
+                    output, _ = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    raise
+                version = output.decode("utf-8", errors="replace").strip() or None
+                if process.returncode != 0:
+                    error = f"{self.binary} --version exited with {process.returncode}"
+            except asyncio.TimeoutError:
+                error = f"{self.binary} --version timed out after {self.timeout:g}s"
+            except OSError as e:
+                error = f"{self.binary} could not be started: {e}"
+
+        self.path, self.version, self.error = path, version, error
+        self.checked_at = time.time()
+
+    async def run(self):
+        """Re-check every interval seconds until cancelled"""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "available": self.available,
+            "path": self.path,
+            "version": self.version,
+            "error": self.error,
+            "checked_at": self.checked_at,
+        }
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the extra delay of a periodic sleep"""
+
+    def __init__(self, interval: float = 0.5, window: int = 20):
+        self.interval = interval
+        self.lag = 0.0
+        self._recent: deque = deque(maxlen=window)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+            self._recent.append(self.lag)
+
+    @property
+    def max_recent(self) -> float:
+        """Worst lag over the last `window` ticks"""
+        return max(self._recent, default=0.0)
+
+    def status(self) -> Dict[str, float]:
+        return {
+            "lag_ms": round(self.lag * 1000, 2),
+            "max_recent_lag_ms": round(self.max_recent * 1000, 2),
+            "interval_ms": round(self.interval * 1000, 2),
+        }
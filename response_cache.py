@@ -0,0 +1,99 @@
+"""
+LRU + TTL cache for read-only Codex answers.
+
+Entries are keyed on the normalized prompt context and a fingerprint of the
+workspace contents (FileIndexService.fingerprint), so editing any file in the
+workspace invalidates every answer that was computed against the old state.
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def normalize_context(context: str) -> str:
+    """Collapse whitespace so trivially different prompts share a cache entry"""
+    return " ".join(context.split())
+
+
+def make_cache_key(context: str, workspace_path: str, fingerprint: str) -> str:
+    """Combine prompt context and workspace state into a cache key"""
+    digest = hashlib.sha256()
+    digest.update(normalize_context(context).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(os.path.realpath(workspace_path).encode("utf-8", "surrogateescape"))
+    digest.update(b"\0")
+    digest.update(fingerprint.encode("ascii"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Build a cache from CODEX_CACHE_MAX_ENTRIES / CODEX_CACHE_TTL"""
+        return cls(
+            max_entries=int(os.getenv("CODEX_CACHE_MAX_ENTRIES", "256")),
+            ttl=float(os.getenv("CODEX_CACHE_TTL", "600")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, counting the hit or miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting the least recently used entries"""
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic(), response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,166 @@
+"""
+Bounded job scheduler for Codex CLI runs.
+
+At most `max_concurrency` jobs run at once. Jobs that cannot start immediately
+wait in per-session queues which are served round-robin, so one busy editor
+cannot starve the others, and the total number of waiting jobs is capped so
+overload is rejected up front instead of piling up.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Callback invoked with (status, queue position) as a job moves through the scheduler
+StatusCallback = Callable[[str, int], Awaitable[None]]
+
+QUEUED = "queued"
+STARTED = "started"
+
+
+class SchedulerFullError(Exception):
+    """Raised when a job is submitted while the wait queue is full"""
+
+
+class _Job:
+    __slots__ = ("session_id", "granted", "wakeup")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.granted = False
+        self.wakeup = asyncio.Event()
+
+
+class CodexScheduler:
+    """Admission control with per-session round-robin queueing"""
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        # session_id -> waiting jobs; dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "CodexScheduler":
+        """Build a scheduler from CODEX_MAX_CONCURRENCY / CODEX_MAX_QUEUE"""
+        return cls(
+            max_concurrency=int(os.getenv("CODEX_MAX_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("CODEX_MAX_QUEUE", "32")),
+        )
+
+    async def run(self, session_id: str, func: Callable[[], Awaitable[T]],
+                  on_status: Optional[StatusCallback] = None) -> T:
+        """Run func once a slot is free, reporting queue progress to on_status.
+
+        Raises SchedulerFullError without queueing if the wait queue is full.
+        """
+        if self.running < self.max_concurrency and not self.queued:
+            self.running += 1
+        else:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerFullError(
+                    f"Server busy: {self.queued} requests already waiting, please retry shortly"
+                )
+            await self._wait_for_slot(session_id, on_status)
+
+        try:
+            if on_status is not None:
+                await on_status(STARTED, 0)
+            return await func()
+        finally:
+            self._release()
+
+    async def _wait_for_slot(self, session_id: str, on_status: Optional[StatusCallback]):
+        job = _Job(session_id)
+        self._queues.setdefault(session_id, deque()).append(job)
+        self.queued += 1
+
+        last_position = None
+        try:
+            while not job.granted:
+                position = self.position(job)
+                if on_status is not None and position != last_position:
+                    last_position = position
+                    await on_status(QUEUED, position)
+                if job.granted:
+                    break
+                job.wakeup.clear()
+                await job.wakeup.wait()
+        except BaseException:
+            if job.granted:
+                # The slot was handed over but the waiter went away; pass it on
+                self._release()
+            else:
+                self._remove(job)
+            raise
+
+    def _release(self):
+        """Free a slot and hand it to the next session in round-robin order"""
+        self.running -= 1
+        if not self._queues:
+            return
+
+        session_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(session_id)
+        else:
+            del self._queues[session_id]
+        self.queued -= 1
+        self.running += 1
+        job.granted = True
+
+        # Every waiter moved up one place; let them report their new position
+        for waiting in self._queues.values():
+            for other in waiting:
+                other.wakeup.set()
+        job.wakeup.set()
+
+    def _remove(self, job: _Job):
+        queue = self._queues.get(job.session_id)
+        if queue is None or job not in queue:
+            return
+        queue.remove(job)
+        if not queue:
+            del self._queues[job.session_id]
+        self.queued -= 1
+        for waiting in self._queues.values():
+            for other in waiting:
+                other.wakeup.set()
+
+    def dispatch_order(self) -> List[_Job]:
+        """Waiting jobs in the order they will be started"""
+        order = []
+        queues = [list(queue) for queue in self._queues.values()]
+        depth = max((len(queue) for queue in queues), default=0)
+        for round_index in range(depth):
+            for queue in queues:
+                if round_index < len(queue):
+                    order.append(queue[round_index])
+        return order
+
+    def position(self, job: _Job) -> int:
+        """1-based position of a waiting job, 0 once it has started"""
+        if job.granted:
+            return 0
+        return self.dispatch_order().index(job) + 1
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of scheduler load"""
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "waiting_sessions": len(self._queues),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
@@ -437,12 +437,16 @@ class AICMSClient {
         this.maxReconnectAttempts = 5;
         this.isAIProcessing = false;
         this.loadingMessageElement = null;
+        this.nextRequestId = 1;
         this.connect();
     }
 
     connect() {
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/ws`;
+        // Present the stored session token so the server resumes our conversation
+        const sessionToken = localStorage.getItem('cms-session-token');
+        const query = sessionToken ? `?session_token=${encodeURIComponent(sessionToken)}` : '';
+        const wsUrl = `${protocol}//${window.location.host}/ws${query}`;
         
         this.ws = new WebSocket(wsUrl);
         
@@ -490,11 +494,15 @@ class AICMSClient {
 
     sendMessage(type, data) {
         if (this.isConnected && this.ws.readyState === WebSocket.OPEN) {
+            // Replies echo request_id, so several requests can be in flight at once
+            const requestId = `req-${this.nextRequestId++}`;
             this.ws.send(JSON.stringify({
                 type: type,
+                request_id: requestId,
                 workspace: this.currentWorkspace,
                 ...data
             }));
+            return requestId;
         } else {
             this.addSystemMessage('Not connected to server', 'error');
         }
@@ -505,6 +513,21 @@ class AICMSClient {
             case 'ai_response':
                 this.handleAIResponse(data);
                 break;
+            case 'ai_response_chunk':
+                this.handleAIResponseChunk(data);
+                break;
+            case 'ai_status':
+                this.handleAIStatus(data);
+                break;
+            case 'files_changed':
+                this.handleFilesChanged(data);
+                break;
+            case 'session':
+                this.handleSession(data);
+                break;
+            case 'cancelled':
+                this.handleCancelled(data);
+                break;
             case 'conversation_cleared':
                 this.handleConversationCleared(data);
                 break;
@@ -512,8 +535,10 @@ class AICMSClient {
                 this.handleConversationHistory(data);
                 break;
             case 'error':
-                // Remove loading message on error
-                this.removeLoadingMessage();
+                // Remove loading message on error, unless the request still running is not the one refused
+                if (!data.busy) {
+                    this.removeLoadingMessage();
+                }
                 this.addSystemMessage(data.message || 'Unknown error occurred', 'error');
                 break;
             default:
@@ -564,6 +589,45 @@ class AICMSClient {
         }
     }
 
+    handleAIStatus(data) {
+        // Reflect scheduler progress in the loading message
+        if (!this.loadingMessageElement) return;
+        
+        let label = this.loadingMessageElement.querySelector('.loading-label');
+        if (!label) {
+            label = document.createElement('span');
+            label.className = 'loading-label';
+            this.loadingMessageElement.insertBefore(label, this.loadingMessageElement.firstChild);
+            // Drop the default text node so the label replaces it
+            const defaultText = label.nextSibling;
+            if (defaultText && defaultText.nodeType === Node.TEXT_NODE) {
+                defaultText.remove();
+            }
+        }
+        
+        if (data.status === 'queued') {
+            label.textContent = `⏳ Waiting in queue (position ${data.position})`;
+        } else {
+            label.textContent = '🤖 AI is working';
+        }
+    }
+
+    handleAIResponseChunk(data) {
+        // Show streamed output inside the loading message until the final response arrives
+        if (!this.loadingMessageElement || !data.text) return;
+        
+        let preview = this.loadingMessageElement.querySelector('.streaming-preview');
+        if (!preview) {
+            preview = document.createElement('div');
+            preview.className = 'streaming-preview';
+            this.loadingMessageElement.appendChild(preview);
+        }
+        preview.textContent += (preview.textContent ? '\n' : '') + data.text;
+        
+        const messagesContainer = document.getElementById('chatMessages');
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+
     parseAIResponse(rawResponse) {
         // Clean up any remaining escape characters and formatting
         let cleaned = rawResponse
@@ -824,6 +888,29 @@ class AICMSClient {
 
 
 
+    handleSession(data) {
+        localStorage.setItem('cms-session-token', data.session_token);
+        if (data.resumed && data.history_length > 0) {
+            this.addSystemMessage(`Resumed previous conversation (${data.history_length} messages)`);
+        }
+    }
+
+    handleFilesChanged(data) {
+        // The run's edits, with unified diffs; only these files need reloading
+        const files = data.files || [];
+        if (files.length === 0) return;
+        const icons = { added: '➕', modified: '✏️', deleted: '🗑️' };
+        const summary = files.map(file => `${icons[file.status] || '•'} ${file.path}`).join('\n');
+        this.addSystemMessage(`📝 ${files.length} file${files.length === 1 ? '' : 's'} changed:\n${summary}`, 'info');
+        console.log('Files changed:', files);
+    }
+
+    handleCancelled(data) {
+        if (!data.cancelled || data.cancelled.length === 0) {
+            this.addSystemMessage('Nothing to cancel', 'info');
+        }
+    }
+
     handleConversationCleared(data) {
         this.addSystemMessage('✓ Conversation history cleared on server', 'info');
     }
@@ -943,6 +1030,11 @@ class AICMSClient {
     }
 
     updateSendButtonState(isProcessing) {
+        const cancelButton = document.getElementById('cancelAIButton');
+        if (cancelButton) {
+            cancelButton.style.display = isProcessing ? '' : 'none';
+        }
+        
         const sendButton = document.getElementById('sendAIButton');
         if (sendButton) {
             if (isProcessing) {
@@ -1054,14 +1146,21 @@ function sendAIMessage() {
     
     aiCMS.addUserMessage(input.value); // Show original message to user
     aiCMS.addLoadingMessage();
-    aiCMS.sendMessage('ai_chat', { 
+    aiCMS.currentAIRequestId = aiCMS.sendMessage('ai_chat', { 
         prompt: message,
-        auto_save: autoSaveCheckbox ? autoSaveCheckbox.checked : true
+        auto_save: autoSaveCheckbox ? autoSaveCheckbox.checked : true,
+        stream: true
     });
     
     input.value = '';
 }
 
+function cancelAIMessage() {
+    // Stop the running AI request; the server answers with a cancelled ai_response
+    if (!aiCMS.isAIProcessing) return;
+    aiCMS.sendMessage('cancel', { target_request_id: aiCMS.currentAIRequestId });
+}
+
 
 
 function clearChat() {
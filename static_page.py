@@ -0,0 +1,199 @@
+"""
+In-memory, precompressed copies of static pages.
+
+CachedPage keeps a file's bytes in memory together with gzip (and, when the
+optional brotli package is installed, brotli) encoded variants. The file is
+re-read only when its mtime or size (or an optional version callback) changes, and that check runs at most once
+per check_interval in a worker thread, so serving a page never blocks the event
+loop on disk I/O. Responses carry ETag and Last-Modified headers and
+conditional requests are answered with 304 Not Modified.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Encodings in order of preference when the client accepts several
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Browsers must revalidate, which the ETag turns into a cheap 304
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Encode data with the given content-coding at maximum compression"""
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and therefore its ETag) deterministic
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """Pick the preferred encoding from `available` that the client accepts"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def encoded_response(bodies: Mapping[Optional[str], bytes], request_headers: Mapping[str, str],
+                     media_type: str, headers: Dict[str, str], head: bool = False) -> Response:
+    """200 response with the best variant in `bodies` (keyed by encoding, None for identity)"""
+    encoding = choose_encoding(request_headers.get("accept-encoding"), [e for e in ENCODINGS if e in bodies])
+    body = bodies[encoding]
+    headers = dict(headers, Vary="Accept-Encoding")
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if head:
+        headers["Content-Length"] = str(len(body))
+        body = b""
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+
+class _Snapshot:
+    """One loaded version of a page and its encoded variants"""
+
+    __slots__ = ("stat_key", "mtime", "etag", "last_modified", "bodies")
+
+    def __init__(self, stat_key: tuple, mtime: float, data: bytes, encodings):
+        self.stat_key = stat_key
+        self.mtime = int(mtime)
+        self.last_modified = formatdate(mtime, usegmt=True)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        self.bodies: Dict[Optional[str], bytes] = {None: data}
+        for encoding in encodings:
+            encoded = compress(data, encoding)
+            # Tiny files can grow when compressed; only keep variants that help
+            if len(encoded) < len(data):
+                self.bodies[encoding] = encoded
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # Each representation gets its own validator, as RFC 9110 requires
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+class CachedPage:
+    """A static file served from memory with mtime-based invalidation"""
+
+    def __init__(self, path: str, media_type: str = "text/html; charset=utf-8",
+                 check_interval: float = 1.0, cache_control: str = DEFAULT_CACHE_CONTROL,
+                 encodings=ENCODINGS, transform: Optional[Callable[[bytes], bytes]] = None,
+                 version: Optional[Callable[[], object]] = None):
+        self.path = path
+        self.media_type = media_type
+        self.check_interval = check_interval
+        self.cache_control = cache_control
+        self.encodings = encodings
+        # Applied to the file contents on every (re)load, e.g. to rewrite asset URLs
+        self.transform = transform
+        # Called (in a worker thread) on every check; when its value changes the page is
+        # reloaded too, e.g. because the assets the transform points at were rebuilt
+        self.version = version
+        self.loads = 0
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _stat_key(self) -> Tuple[tuple, float]:
+        stat = os.stat(self.path)
+        version = self.version() if self.version is not None else None
+        return (stat.st_mtime_ns, stat.st_size, version), stat.st_mtime
+
+    def _refresh(self, current: Optional[_Snapshot]) -> _Snapshot:
+        """Blocking: re-read the file if it changed since `current` was loaded"""
+        stat_key, mtime = self._stat_key()
+        if current is not None and current.stat_key == stat_key:
+            return current
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if self.transform is not None:
+            data = self.transform(data)
+        self.loads += 1
+        return _Snapshot(stat_key, mtime, data, self.encodings)
+
+    def invalidate(self):
+        """Drop the cached copy so the next request reloads the file"""
+        self._snapshot = None
+
+    async def snapshot(self) -> _Snapshot:
+        """Current version of the page; raises FileNotFoundError if it is gone"""
+        if self._snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._snapshot is None or time.monotonic() - self._checked_at >= self.check_interval:
+                try:
+                    self._snapshot = await asyncio.to_thread(self._refresh, self._snapshot)
+                except FileNotFoundError:
+                    self._snapshot = None
+                    raise
+                self._checked_at = time.monotonic()
+        return self._snapshot
+
+    async def respond(self, headers: Mapping[str, str], head: bool = False) -> Response:
+        """Build a 200 or 304 response for a request with the given headers"""
+        snapshot = await self.snapshot()
+        encoding = choose_encoding(headers.get("accept-encoding"), [e for e in ENCODINGS if e in snapshot.bodies])
+        response_headers = {
+            "ETag": snapshot.etag_for(encoding),
+            "Last-Modified": snapshot.last_modified,
+            "Cache-Control": self.cache_control,
+        }
+
+        if self._not_modified(headers, snapshot, response_headers["ETag"]):
+            response_headers["Vary"] = "Accept-Encoding"
+            return Response(status_code=304, headers=response_headers)
+        return encoded_response(snapshot.bodies, headers, self.media_type, response_headers, head=head)
+
+    @staticmethod
+    def _not_modified(headers: Mapping[str, str], snapshot: _Snapshot, etag: str) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            return etag_matches(if_none_match, etag) or etag_matches(if_none_match, snapshot.etag)
+
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return snapshot.mtime <= since
+        return False
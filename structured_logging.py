@@ -0,0 +1,181 @@
+"""
+Non-blocking structured logging.
+
+Records are handed to a bounded in-memory queue and written to stderr by a
+background thread, so a slow consumer (a backed-up journald pipe, a full
+terminal) never stalls the event loop; when the queue is full, records are
+dropped and counted instead of waiting. Each record carries an event name and
+key/value fields, rendered as JSON lines or as readable text.
+
+High-volume events can be sampled, and prompts and Codex output are redacted
+to a length and short hash unless LOG_PROMPTS is enabled.
+
+Environment:
+    LOG_LEVEL        DEBUG / INFO / WARNING / ERROR (default INFO)
+    LOG_FORMAT       text or json (default text)
+    LOG_SAMPLE_RATE  fraction of sampled events that are kept (default 0.1)
+    LOG_PROMPTS      1 to log prompts and output verbatim (default 0)
+    LOG_QUEUE_SIZE   records buffered before dropping (default 10000)
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Dict, Optional
+
+LOGGER_NAME = "cms"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread; only make the record
+        # safe to hand over (resolve %-args, drop the traceback object)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every 1/rate records that are marked with `sample=True`"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False):
+            return True
+        if self._every == 0:
+            return False
+        # Deterministic per-event counter: cheaper than random() and keeps the first occurrence
+        event = record.msg
+        seen = self._seen.get(event, 0)
+        self._seen[event] = seen + 1
+        return seen % self._every == 0
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as JSON lines or `time level logger event key=value` text"""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        if self.json:
+            entry = {"ts": timestamp, "level": record.levelname, "logger": record.name, "event": record.msg}
+            entry.update(fields)
+            if record.exc_text:
+                entry["exc"] = record.exc_text
+            return json.dumps(entry, default=str, ensure_ascii=False)
+
+        parts = [timestamp, f"{record.levelname:<7}", record.name, str(record.msg)]
+        parts.extend(f"{key}={_text_value(value)}" for key, value in fields.items())
+        line = " ".join(parts)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _text_value(value) -> str:
+    text = str(value)
+    if not text or any(char.isspace() for char in text) or '"' in text:
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_log_prompts = False
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      sample_rate: Optional[float] = None, queue_size: Optional[int] = None,
+                      stream=None) -> DroppingQueueHandler:
+    """Install the queue handler on the `cms` logger (idempotent; later calls reconfigure)"""
+    global _handler, _listener, _log_prompts
+    shutdown_logging()
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.1")) if sample_rate is None else sample_rate
+    queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000")) if queue_size is None else queue_size
+    _log_prompts = os.getenv("LOG_PROMPTS", "0").lower() in ("1", "true", "yes")
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(StructuredFormatter(fmt))
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(SamplingFilter(sample_rate))
+    _listener = logging.handlers.QueueListener(_handler.queue, output)
+    _listener.start()
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    return _handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger(LOGGER_NAME).removeHandler(_handler)
+        _handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Child of the `cms` logger, e.g. get_logger("codex") -> cms.codex"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def log_event(logger: logging.Logger, level: int, event: str, sample: bool = False, **fields):
+    """Log a named event with structured fields; sampled events may be skipped"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields, "sample": sample})
+
+
+def redact(text: Optional[str]) -> str:
+    """Describe text by length and hash unless LOG_PROMPTS is enabled"""
+    if text is None:
+        return ""
+    if _log_prompts:
+        return text
+    digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()[:12]
+    return f"<redacted {len(text)} chars sha256:{digest}>"
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for the chat backends, using a local mock chat completions server
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ai_backends import BackendConfigError, HTTPBackendConfig, create_readonly_backend
+from main import CodexManager
+from test_codex_streaming import install_fake_codex
+
+
+class MockCompletions(BaseHTTPRequestHandler):
+    """OpenAI-style streaming chat completions over keep-alive HTTP/1.1"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({"path": self.path, "headers": dict(self.headers), "body": body})
+        if self.server.status != 200:
+            payload = json.dumps({"error": {"message": "Incorrect API key provided"}}).encode()
+            self.send_response(self.server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [{"choices": [{"delta": {"role": "assistant"}}]}]
+        events += [{"choices": [{"delta": {"content": part}}]} for part in self.server.parts]
+        for event in events:
+            self.write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockCompletions)
+    server.daemon_threads = True
+    server.connections = 0
+    server.requests = []
+    server.parts = ["Hello", ", ", "world"]
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_env(mock_server, monkeypatch):
+    monkeypatch.setenv("AI_BACKEND", "http")
+    monkeypatch.setenv("AI_HTTP_PROVIDER", "openai")
+    monkeypatch.setenv("AI_HTTP_BASE_URL", f"http://127.0.0.1:{mock_server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    return mock_server
+
+
+def test_http_backend_streams_and_reuses_connection(http_env):
+    backend = create_readonly_backend()
+    chunks = []
+
+    async def on_chunk(kind, text):
+        chunks.append((kind, text))
+
+    async def run():
+        first = await backend.complete("hi", "session", ".", False, on_chunk)
+        second = await backend.complete("again", "session", ".", False)
+        await backend.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["success"] is True
+    assert first["stdout"] == "Hello, world"
+    assert chunks == [("assistant", "Hello"), ("assistant", ", "), ("assistant", "world")]
+    assert second["stdout"] == "Hello, world"
+    # Both requests went over one keep-alive connection
+    assert http_env.connections == 1
+    request = http_env.requests[0]
+    assert request["path"] == "/v1/chat/completions"
+    assert request["headers"]["Authorization"] == "Bearer sk-test"
+    assert request["body"]["stream"] is True
+    assert request["body"]["messages"][-1] == {"role": "user", "content": "hi"}
+
+
+def test_http_backend_reports_api_errors(http_env):
+    http_env.status = 401
+    backend = create_readonly_backend()
+
+    result = asyncio.run(backend.complete("hi", "session", ".", False))
+
+    assert result["success"] is False
+    assert result["status_code"] == 401
+    assert "Incorrect API key provided" in result["error"]
+    assert backend.stats()["failures"] == 1
+
+
+def test_readonly_chat_skips_codex_but_edits_use_it(http_env, tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho 'edited by codex'\n")
+    manager = CodexManager(readonly_backend=create_readonly_backend())
+
+    read_only = asyncio.run(manager.execute_ai_chat("what is on the page?", "session", str(tmp_path), False))
+    edit = asyncio.run(manager.execute_ai_chat("change the title", "session", str(tmp_path), True))
+
+    assert read_only["backend"] == "http" and read_only["stdout"] == "Hello, world"
+    assert edit["backend"] == "cli" and edit["stdout"] == "edited by codex"
+    assert len(http_env.requests) == 1
+    # The HTTP answer is part of the context for the next request
+    history = [message["content"] for message in manager.get_history("session")]
+    assert history[:2] == ["what is on the page?", "Hello, world"]
+
+
+def test_provider_config_from_env(monkeypatch):
+    monkeypatch.delenv("AI_HTTP_PROVIDER", raising=False)
+    monkeypatch.delenv("AI_HTTP_BASE_URL", raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "your-openai-api-key-here")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "azure-key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/")
+    monkeypatch.setenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT", "cms")
+
+    config = HTTPBackendConfig.from_env()
+
+    # The placeholder OpenAI key is skipped in favour of the configured Azure one
+    assert config.provider == "azure"
+    assert config.url == ("https://example.openai.azure.com/openai/deployments/cms/chat/completions"
+                          "?api-version=2024-02-15-preview")
+    assert config.headers == {"api-key": "azure-key"}
+
+    monkeypatch.setenv("AI_BACKEND", "grpc")
+    with pytest.raises(BackendConfigError):
+        create_readonly_backend()
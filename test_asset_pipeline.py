@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the hashed static asset pipeline
+"""
+import os
+import shutil
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from asset_pipeline import AssetPipeline, minify_css, minify_js
+from static_page import CachedPage
+
+
+def test_minify_css_keeps_selectors_and_strings():
+    css = '/* theme */\na :hover ,\nb > c {\n  content: "a  /* b */";\n  color: red;\n}\n'
+    assert minify_css(css) == 'a :hover,b>c{content: "a  /* b */";color: red}'
+
+
+def test_minify_js_strips_comments_but_keeps_literals():
+    js = (
+        "// header\n"
+        "function f(a) {\n"
+        "    /* block */\n"
+        "    const re = /`[^`]+`/g; // trailing\n"
+        "    return `line one\n    line two` + 'it''s' + \"//not a comment\";\n"
+        "}\n"
+    )
+    assert minify_js(js) == (
+        "function f(a) {\n"
+        "const re = /`[^`]+`/g;\n"
+        "return `line one\n    line two` + 'it''s' + \"//not a comment\";\n"
+        "}\n"
+    )
+
+
+def test_minify_js_regex_after_keyword_is_not_division():
+    js = (
+        "function f(s) { return /'/.test(s); }\n"
+        "const kind = typeof /x/;\n"
+        "const half = total / 2 / count;\n"
+        "const msg = 'a  //  b';\n"
+    )
+    assert minify_js(js) == js
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_minify_js_regex_after_keyword_stays_valid(tmp_path):
+    script = tmp_path / "keywords.js"
+    script.write_text(minify_js(
+        "function f(s) {\n    return /'/.test(s); // quote\n}\n"
+        "switch (f('x')) {\n    case /a/.test('a'):\n        break;\n}\n"
+        "const msg = 'a  //  b';\n"
+        "const obj = { return: 4 }; const n = obj.return / 2;\n"
+    ))
+    subprocess.run(["node", "--check", str(script)], check=True)
+    assert "const msg = 'a  //  b';" in script.read_text()
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_minified_frontend_script_is_valid_javascript(tmp_path):
+    pipeline = AssetPipeline(output_dir=str(tmp_path))
+    pipeline.build()
+    built = tmp_path / pipeline.built["script.js"].name
+    subprocess.run(["node", "--check", str(built)], check=True)
+
+
+def test_homepage_references_hashed_assets(tmp_path, monkeypatch):
+    (tmp_path / "styles.css").write_text("body {\n  color: red;\n}\n")
+    (tmp_path / "script.js").write_text("console.log('hi');\n")
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="/static/styles.css"><script src="/static/script.js"></script>'
+    )
+    pipeline = AssetPipeline(source_dir=str(tmp_path), output_dir=str(tmp_path / "build"))
+    pipeline.build()
+    monkeypatch.setattr(main, "asset_pipeline", pipeline)
+    monkeypatch.setattr(main, "homepage", CachedPage(str(tmp_path / "index.html"), transform=pipeline.rewrite_html))
+    client = TestClient(main.app)
+
+    html = client.get("/").text
+    css_url, js_url = pipeline.built["styles.css"].url, pipeline.built["script.js"].url
+    assert f'href="{css_url}"' in html and f'src="{js_url}"' in html
+    assert "/static/" not in html
+    assert (tmp_path / "build" / pipeline.built["styles.css"].name).read_text() == "body{color: red}"
+
+    asset = client.get(css_url, headers={"Accept-Encoding": "gzip"})
+    assert asset.status_code == 200
+    assert asset.text == "body{color: red}"
+    assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert asset.headers["content-type"].startswith("text/css")
+
+    assert client.get("/assets/styles.0000000000.css").status_code == 404
+
+
+def test_content_change_changes_hash(tmp_path):
+    (tmp_path / "styles.css").write_text("a{color:red}")
+    pipeline = AssetPipeline(source_dir=str(tmp_path), output_dir=None, assets=("styles.css",))
+    pipeline.build()
+    first = pipeline.built["styles.css"].name
+
+    (tmp_path / "styles.css").write_text("a{color:blue}")
+    pipeline.build()
+    assert pipeline.built["styles.css"].name != first
+    assert pipeline.get(first) is None
+
+
+def test_edited_source_is_rebuilt_and_homepage_follows(tmp_path, monkeypatch):
+    (tmp_path / "styles.css").write_text("a{color:red}")
+    (tmp_path / "script.js").write_text("let a = 1;\n")
+    (tmp_path / "index.html").write_text('<script src="/static/script.js"></script>')
+    pipeline = AssetPipeline(source_dir=str(tmp_path), output_dir=None)
+    pipeline.build()
+    page = CachedPage(str(tmp_path / "index.html"), check_interval=0, transform=pipeline.rewrite_html,
+                      version=pipeline.refresh)
+    monkeypatch.setattr(main, "asset_pipeline", pipeline)
+    monkeypatch.setattr(main, "homepage", page)
+    client = TestClient(main.app)
+    first = pipeline.built["script.js"].url
+    assert first in client.get("/").text
+    assert pipeline.refresh() == pipeline.generation  # Nothing changed: no rebuild
+
+    script = tmp_path / "script.js"
+    script.write_text("let a = 2;\n")
+    stat = os.stat(script)
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    html = client.get("/").text
+    second = pipeline.built["script.js"].url
+    assert second != first and second in html
+    assert client.get(second).text == "let a = 2;\n"
@@ -25,9 +25,13 @@ async def test_codex_integration():
             print(f"📤 Sending message: {test_message}")
             await websocket.send(json.dumps(test_message))
             
-            # Wait for response
-            response = await websocket.recv()
-            response_data = json.loads(response)
+            # Wait for response, skipping scheduler status frames
+            while True:
+                response = await websocket.recv()
+                response_data = json.loads(response)
+                if response_data.get("type") not in ("ai_status", "session"):
+                    break
+                print(f"⏳ Status: {response_data.get('status')} (position {response_data.get('position')})")
             
             print(f"📥 Received response: {response_data}")
             
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental Codex JSONL transcript parser
+"""
+import json
+
+from codex_parser import (ASSISTANT_TEXT, ERROR, PLAIN_TEXT, TOOL_OUTPUT,
+                          CodexEvent, CodexStreamParser, iter_codex_events)
+from main import CodexManager
+
+TRANSCRIPT = "\n".join([
+    json.dumps({"type": "reasoning", "summary": ["thinking about the assistant"]}),
+    json.dumps({"type": "message", "role": "assistant",
+                "content": [{"type": "output_text", "text": "Here is the page"}]}),
+    json.dumps({"type": "function_call", "name": "shell", "arguments": "{}"}),
+    json.dumps({"type": "function_call_output", "output": json.dumps({"output": " saved index.html \n"})}),
+    json.dumps({"type": "function_call_output", "output": "raw tool text"}),
+    json.dumps({"type": "error", "message": "rate limited"}),
+    "plain text line",
+    "{not json",
+]).encode("utf-8")
+
+EXPECTED = [
+    CodexEvent(ASSISTANT_TEXT, "Here is the page"),
+    CodexEvent(TOOL_OUTPUT, "saved index.html"),
+    CodexEvent(TOOL_OUTPUT, "raw tool text"),
+    CodexEvent(ERROR, "rate limited"),
+    CodexEvent(PLAIN_TEXT, "plain text line"),
+]
+
+
+def test_parses_whole_transcript():
+    """Every interesting line yields exactly one typed event"""
+    assert list(iter_codex_events([TRANSCRIPT])) == EXPECTED
+
+
+def test_partial_lines_across_chunk_boundaries():
+    """Splitting the input at every possible size gives the same events"""
+    for size in (1, 2, 7, 64, 1000):
+        chunks = [TRANSCRIPT[i:i + size] for i in range(0, len(TRANSCRIPT), size)]
+        assert list(iter_codex_events(chunks)) == EXPECTED
+
+
+def test_multibyte_characters_split_between_chunks():
+    """UTF-8 sequences cut in half by a chunk boundary decode correctly"""
+    line = json.dumps({"type": "message", "role": "assistant",
+                       "content": "Café 🤖"}, ensure_ascii=False).encode("utf-8")
+    parser = CodexStreamParser()
+    events = list(parser.feed(line[:-3])) + list(parser.feed(line[-3:] + b"\n")) + list(parser.close())
+    assert events == [CodexEvent(ASSISTANT_TEXT, "Café 🤖")]
+
+
+def test_parse_codex_response_uses_parser():
+    """The buffered API still returns the joined response text"""
+    manager = CodexManager()
+    assert manager.parse_codex_response(TRANSCRIPT.decode("utf-8")) == (
+        "Here is the page\nsaved index.html\nraw tool text\nplain text line"
+    )
+    assert manager.parse_codex_response("") == "AI response received successfully"
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for Codex launch setup
+"""
+import asyncio
+
+import main
+from codex_runner import CodexLauncher
+from main import CodexManager
+from test_codex_streaming import install_fake_codex
+
+ECHO_CODEX = """#!/bin/sh
+echo "{\\"type\\":\\"message\\",\\"role\\":\\"assistant\\",\\"content\\":\\"cwd=$(pwd) args=$*\\"}"
+"""
+
+
+def test_launcher_resolves_once_per_path(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, ECHO_CODEX)
+    launcher = CodexLauncher()
+    assert launcher.executable == str(tmp_path / "codex")
+    env = launcher.env
+    assert launcher.env is env  # reused, not rebuilt per call
+    assert launcher.command("hi", True) == [str(tmp_path / "codex"), "-q", "--full-auto", "hi"]
+
+    monkeypatch.setenv("PATH", "/nonexistent")
+    assert launcher.executable == "codex"
+    assert "codex not found on PATH" in launcher.validate(timeout=120, kill_grace=5)
+
+
+def test_execute_ai_chat_uses_resolved_launcher(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, ECHO_CODEX)
+    workspace = tmp_path / "site"
+    workspace.mkdir()
+    launcher = CodexLauncher()
+    monkeypatch.setattr(main, "codex_launcher", launcher)
+    before = main.CODEX_SPAWN_SECONDS.count()
+
+    result = asyncio.run(CodexManager().execute_ai_chat("hi", "session", str(workspace), False))
+    assert result["success"] is True
+    assert f"cwd={workspace}" in result["stdout"]
+    assert "args=-q hi" in result["stdout"]
+    assert main.CODEX_SPAWN_SECONDS.count() == before + 1
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming Codex CLI output through CodexManager.execute_ai_chat
+Uses a fake `codex` executable on PATH, so no API key or network is needed
+"""
+import asyncio
+import os
+import stat
+import time
+
+from main import CodexManager
+
+FAKE_CODEX = """#!/bin/sh
+echo '{"type":"message","role":"assistant","content":[{"type":"output_text","text":"First part"}]}'
+sleep 0.1
+echo '{"type":"function_call_output","output":{"output":"tool says hi"}}'
+echo 'plain text line'
+"""
+
+
+def install_fake_codex(tmp_path, monkeypatch, script=FAKE_CODEX):
+    """Put a fake codex executable first on PATH"""
+    codex = tmp_path / "codex"
+    codex.write_text(script)
+    codex.chmod(codex.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+
+
+def test_execute_ai_chat_streams_chunks(tmp_path, monkeypatch):
+    """Chunks are delivered in order before the final result is returned"""
+    install_fake_codex(tmp_path, monkeypatch)
+    manager = CodexManager()
+    chunks = []
+
+    async def on_chunk(kind, text):
+        chunks.append((kind, text))
+
+    result = asyncio.run(manager.execute_ai_chat("hi", "session", str(tmp_path), False, on_chunk))
+
+    assert result["success"] is True
+    assert chunks == [
+        ("assistant", "First part"),
+        ("tool_output", "tool says hi"),
+        ("text", "plain text line"),
+    ]
+    assert result["stdout"] == "First part\ntool says hi\nplain text line"
+    assert result["chunks"] == 3
+
+
+def test_execute_ai_chat_reports_failure(tmp_path, monkeypatch):
+    """A non-zero exit surfaces stderr as the error message"""
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho 'boom' >&2\nexit 3\n")
+    manager = CodexManager()
+
+    result = asyncio.run(manager.execute_ai_chat("hi", "session", str(tmp_path), False))
+
+    assert result["success"] is False
+    assert result["exit_code"] == 3
+    assert result["error"] == "boom"
+
+
+def test_cancel_kills_whole_process_group(tmp_path, monkeypatch):
+    """Cancelling a run also stops grandchildren spawned by tool calls"""
+    pid_file = tmp_path / "child.pid"
+    install_fake_codex(tmp_path, monkeypatch, f"""#!/bin/sh
+sleep 30 &
+echo $! > {pid_file}
+wait
+""")
+    manager = CodexManager()
+
+    async def scenario():
+        task = asyncio.create_task(manager.execute_ai_chat("hi", "session", str(tmp_path), False))
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(scenario()) is True
+    child_pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while process_alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not process_alive(child_pid)
+
+
+def process_alive(pid):
+    """True if pid exists and is not a zombie waiting to be reaped"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
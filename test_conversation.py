@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for token-budgeted conversation context
+"""
+from conversation import Conversation, Message, estimate_tokens
+from main import CONTEXT_SNIPPET_TOKENS, CONTEXT_TOKEN_BUDGET, MAX_HISTORY_MESSAGES
+
+
+def message(role, content):
+    return Message(role, content)
+
+
+def test_first_message_needs_no_context():
+    assert Conversation().build_prompt("hello", 1000) == "hello"
+
+
+def test_prompt_keeps_newest_messages_within_budget():
+    conversation = Conversation()
+    for i in range(10):
+        conversation.append(message("user", f"message {i} " + "x" * 100))
+
+    prompt = conversation.build_prompt("next", token_budget=120)
+
+    assert estimate_tokens(prompt) <= 120
+    assert "message 9" in prompt and "message 8" in prompt
+    assert "message 0" not in prompt
+    assert prompt.startswith("Previous conversation context:")
+    assert prompt.endswith("\nCurrent request:\nnext")
+
+
+def test_long_messages_use_snippet_cap_not_fixed_characters():
+    conversation = Conversation(snippet_tokens=100)
+    conversation.append(message("assistant", "y" * 1000))
+    prompt = conversation.build_prompt("next", token_budget=1000)
+    assert "y" * 400 + "..." in prompt
+    assert "y" * 401 not in prompt
+
+
+def test_window_is_bounded_and_rolls_into_summary():
+    conversation = Conversation(max_messages=3)
+    for i in range(5):
+        conversation.append(message("user", f"step {i}"))
+
+    assert [m.content for m in conversation] == ["step 2", "step 3", "step 4"]
+    assert conversation.summary() == "Earlier: user: step 0 | user: step 1"
+    prompt = conversation.build_prompt("next", token_budget=1000)
+    assert prompt.splitlines()[1] == "Earlier: user: step 0 | user: step 1"
+
+    conversation.clear()
+    assert len(conversation) == 0 and conversation.summary() is None
+
+
+def legacy_prompt(messages, new_prompt):
+    """The context builder this module replaced: last 10 messages, 200 characters each"""
+    context_parts = ["Previous conversation context:"]
+    for message in messages[-10:]:
+        content = message.content[:200]
+        if len(message.content) > 200:
+            content += "..."
+        context_parts.append(f"{message.role.capitalize()}: {content}")
+    context_parts.append("\nCurrent request:")
+    context_parts.append(new_prompt)
+    return "\n".join(context_parts)
+
+
+def test_default_budget_is_no_larger_than_legacy_context():
+    messages = [message("user" if i % 2 == 0 else "assistant", f"message {i} " + "z" * 2000) for i in range(20)]
+    conversation = Conversation(messages, max_messages=MAX_HISTORY_MESSAGES, snippet_tokens=CONTEXT_SNIPPET_TOKENS)
+
+    prompt = conversation.build_prompt("make the header blue", CONTEXT_TOKEN_BUDGET)
+    legacy = legacy_prompt(messages, "make the header blue")
+    assert len(prompt) <= len(legacy)
+    assert "message 19" in prompt
+
+    # Short messages fit in larger numbers, but never past the legacy worst case
+    short = [message("user", f"note {i} " + "z" * 100) for i in range(20)]
+    conversation = Conversation(short, max_messages=MAX_HISTORY_MESSAGES, snippet_tokens=CONTEXT_SNIPPET_TOKENS)
+    assert len(conversation.build_prompt("make the header blue", CONTEXT_TOKEN_BUDGET)) <= len(legacy)
+
+
+def test_summary_uses_budget_left_by_recent_messages():
+    conversation = Conversation(max_messages=3, snippet_tokens=50)
+    for i in range(6):
+        conversation.append(message("user", f"step {i} " + "w" * 300))
+
+    prompt = conversation.build_prompt("next", token_budget=150)
+    lines = prompt.splitlines()
+    # Not every window message fits, yet the leftover still carries the newest gists
+    assert "step 3" not in prompt
+    assert lines[1].startswith("Earlier: ") and "user: step 2" in lines[1]
+    assert estimate_tokens(prompt) <= 150
+
+
+def test_messages_serialise_with_wall_clock_timestamps():
+    original = {"role": "user", "content": "hi", "timestamp": "2026-03-04T05:06:07.123456"}
+    record = Message.from_dict(original)
+    assert not hasattr(record, "__dict__")
+    assert record.to_dict() == original
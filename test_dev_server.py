@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for dev_server's cached HTML injection, conditional responses and sendfile
+"""
+import http.client
+import os
+
+import pytest
+
+import dev_server
+
+
+@pytest.fixture
+def server(tmp_path, start_dev_server):
+    (tmp_path / "index.html").write_text("<html><body><h1>Home</h1></body></html>")
+    (tmp_path / "logo.svg").write_text("<svg></svg>" * 1000)
+    return start_dev_server(tmp_path), tmp_path
+
+
+def request(httpd, path, method="GET", headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+    connection.request(method, path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_injected_page_is_cached_and_revalidated(server):
+    httpd, root = server
+    cache = dev_server.ReloadableHTTPRequestHandler.page_cache
+
+    first, body = request(httpd, "/index.html")
+    assert first.status == 200
+    assert b"EventSource" in body
+    assert int(first.getheader("Content-Length")) == len(body)
+    etag = first.getheader("ETag")
+
+    second, body_again = request(httpd, "/")
+    assert body_again == body
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    not_modified, empty = request(httpd, "/index.html", headers={"If-None-Match": etag})
+    assert not_modified.status == 304 and empty == b""
+    assert not_modified.getheader("ETag") == etag
+
+    since = first.getheader("Last-Modified")
+    assert request(httpd, "/index.html", headers={"If-Modified-Since": since})[0].status == 304
+
+    # An edit changes (mtime, size), so the page is injected again with a new ETag
+    page = root / "index.html"
+    page.write_text("<html><body><h1>Home, edited</h1></body></html>")
+    stat = os.stat(page)
+    os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    edited, new_body = request(httpd, "/index.html", headers={"If-None-Match": etag})
+    assert edited.status == 200 and b"Home, edited" in new_body
+    assert edited.getheader("ETag") != etag
+
+
+def test_head_reports_injected_length(server):
+    httpd, _ = server
+    _, body = request(httpd, "/index.html")
+    head, empty = request(httpd, "/index.html", method="HEAD")
+    assert head.status == 200 and empty == b""
+    assert int(head.getheader("Content-Length")) == len(body)
+
+
+def test_other_files_are_sent_with_sendfile(server, monkeypatch):
+    httpd, root = server
+    calls = []
+    real_sendfile = os.sendfile
+    monkeypatch.setattr(os, "sendfile", lambda *args: calls.append(args) or real_sendfile(*args))
+
+    response, body = request(httpd, "/logo.svg")
+    assert response.status == 200
+    assert body == (root / "logo.svg").read_bytes()
+    assert calls
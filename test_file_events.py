@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for the coalescing file-event pipeline used by the dev server watcher
+"""
+import threading
+import time
+
+from watchdog.observers import Observer
+
+from file_events import CREATED, DELETED, MODIFIED, ChangeBatcher, CoalescingEventHandler, PathFilter
+
+
+def collecting_batcher(tmp_path, **kwargs):
+    batches = []
+    batcher = ChangeBatcher(batches.append, str(tmp_path), **kwargs)
+    return batcher, batches
+
+
+def test_events_merge_per_path(tmp_path):
+    batcher, batches = collecting_batcher(tmp_path, settle=60)
+    batcher.add(CREATED, str(tmp_path / "new.html"))
+    batcher.add(MODIFIED, str(tmp_path / "new.html"))
+    batcher.add(CREATED, str(tmp_path / "scratch.html"))
+    batcher.add(DELETED, str(tmp_path / "scratch.html"))
+    batcher.add(MODIFIED, str(tmp_path / "index.html"))
+    batcher.add(DELETED, str(tmp_path / "old.html"))
+    # Atomic save: the original is replaced by a renamed temp file
+    batcher.add(CREATED, str(tmp_path / "site.css.tmp"))
+    batcher.add("moved", str(tmp_path / "site.css.tmp"), str(tmp_path / "site.css"))
+    batcher.add(DELETED, str(tmp_path / "about.html"))
+    batcher.add(CREATED, str(tmp_path / "about.html"))
+    batcher.add("moved", str(tmp_path / "a.js"), str(tmp_path / "b.js"))
+    batcher.close()
+
+    assert len(batches) == 1
+    changes = batches[0]
+    assert changes.created == ["b.js", "new.html", "site.css"]
+    assert changes.modified == ["about.html", "index.html"]
+    assert changes.deleted == ["a.js", "old.html"]
+    assert changes.moved == [("a.js", "b.js")]
+
+
+def test_rename_over_existing_file_is_a_modification(tmp_path):
+    (tmp_path / "site.css").write_text("body {}")
+    batcher, batches = collecting_batcher(tmp_path, settle=60)
+    # How most editors save atomically: write a temp file, rename it over the original
+    batcher.add(CREATED, str(tmp_path / ".site.css.tmp"))
+    batcher.add(MODIFIED, str(tmp_path / ".site.css.tmp"))
+    batcher.add("moved", str(tmp_path / ".site.css.tmp"), str(tmp_path / "site.css"))
+    batcher.flush()
+    # The original is gone now; the next rename onto the name creates it again
+    batcher.add(DELETED, str(tmp_path / "site.css"))
+    batcher.flush()
+    batcher.add("moved", str(tmp_path / "draft.css"), str(tmp_path / "site.css"))
+    batcher.close()
+
+    assert [changes.to_dict() for changes in batches] == [
+        {"created": [], "modified": ["site.css"], "deleted": [], "moved": []},
+        {"created": [], "modified": [], "deleted": ["site.css"], "moved": []},
+        {"created": ["site.css"], "modified": [], "deleted": ["draft.css"], "moved": [["draft.css", "site.css"]]},
+    ]
+
+
+def test_path_filter_uses_compiled_patterns():
+    path_filter = PathFilter(include=("*.html", "*.css"))
+    assert path_filter.matches("pages/index.html")
+    assert not path_filter.matches("app.py")
+    assert not path_filter.matches("node_modules/pkg/readme.html")
+    assert not path_filter.matches(".git/hooks/x.html")
+    assert not path_filter.matches("index.html~")
+    assert not path_filter.matches(".#index.html")
+
+
+def test_one_batch_per_burst_after_settle(tmp_path):
+    batcher, batches = collecting_batcher(tmp_path, settle=0.1)
+    for index in range(20):
+        batcher.add(MODIFIED, str(tmp_path / f"page{index % 5}.html"))
+        time.sleep(0.01)
+    # The last save of the burst is part of the batch, not dropped
+    batcher.add(MODIFIED, str(tmp_path / "last.html"))
+    deadline = time.monotonic() + 2
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    batcher.close()
+
+    assert len(batches) == 1
+    assert batches[0].modified == ["last.html"] + [f"page{index}.html" for index in range(5)]
+
+
+def test_endless_burst_flushed_after_max_delay(tmp_path):
+    batcher, batches = collecting_batcher(tmp_path, settle=0.2, max_delay=0.3)
+    started = time.monotonic()
+    while not batches and time.monotonic() - started < 2:
+        batcher.add(MODIFIED, str(tmp_path / "busy.html"))
+        time.sleep(0.05)
+    batcher.close()
+    assert batches and time.monotonic() - started < 1
+
+
+def test_watchdog_burst_becomes_one_change_set(tmp_path):
+    site = tmp_path / "site"
+    (site / "css").mkdir(parents=True)
+    (site / "old.html").write_text("old")
+    batches = []
+    done = threading.Event()
+    batcher = ChangeBatcher(lambda changes: (batches.append(changes), done.set()), str(site),
+                            PathFilter(include=("*.html", "*.css")), settle=0.2)
+    observer = Observer()
+    observer.schedule(CoalescingEventHandler(batcher), str(site), recursive=True)
+    observer.start()
+    try:
+        (site / "index.html").write_text("<h1>1</h1>")
+        (site / "index.html").write_text("<h1>2</h1>")
+        (site / "css" / "site.css").write_text("body {}")
+        (site / "old.html").unlink()
+        (site / "notes.txt").write_text("ignored")
+        assert done.wait(3)
+        time.sleep(0.3)
+    finally:
+        observer.stop()
+        observer.join()
+        batcher.close()
+
+    assert len(batches) == 1
+    changes = batches[0]
+    assert changes.created == ["css/site.css", "index.html"]
+    assert changes.deleted == ["old.html"]
+    assert changes.modified == []
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the watchdog-backed file index service and its /__files view in dev_server
+"""
+import json
+import time
+import urllib.request
+
+import pytest
+
+import dev_server
+from file_index import FileIndexService
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def service():
+    service = FileIndexService(settle=0.05)
+    yield service
+    service.close()
+
+
+def make_site(root):
+    root.mkdir()
+    (root / "index.html").write_text("<h1>Home</h1>\n")
+    (root / "css").mkdir()
+    (root / "css" / "site.css").write_text("body {}\n")
+    (root / ".git").mkdir()
+    (root / ".git" / "HEAD").write_text("ref: main\n")
+    return root
+
+
+def test_events_update_the_index_without_rescanning(tmp_path, service):
+    site = make_site(tmp_path / "site")
+    assert service.list_files(str(site)) == ["css/site.css", "index.html"]
+    workspace = service.workspace(str(site))
+    assert workspace.watched
+    cursor = service.cursor(str(site))
+
+    (site / "about.html").write_text("<h1>About</h1>\n")
+    (site / ".git" / "index").write_text("ignored\n")
+    assert wait_for(lambda: "about.html" in service.list_files(str(site)))
+
+    changes, cursor = service.changed_since(str(site), cursor)
+    assert [(change.path, change.status) for change in changes] == [("about.html", "added")]
+    assert ".git/index" not in service.list_files(str(site))
+    # Applied from the event alone, and nothing needs diffs, so nothing was read
+    assert workspace.index.files_read == 0
+
+
+def test_fingerprint_cached_until_a_file_changes(tmp_path, service):
+    site = make_site(tmp_path / "site")
+    before = service.fingerprint(str(site))
+    assert service.fingerprint(str(site)) == before
+
+    (site / "index.html").write_text("<h1>Home, updated</h1>\n")
+    assert wait_for(lambda: service.fingerprint(str(site)) != before)
+
+
+def test_directory_moves_and_deletes_rescan(tmp_path, service):
+    site = make_site(tmp_path / "site")
+    cursor = service.cursor(str(site))
+
+    (site / "css").rename(site / "styles")
+    assert wait_for(lambda: service.list_files(str(site)) == ["index.html", "styles/site.css"])
+    changes, _ = service.changed_since(str(site), cursor)
+    assert sorted((change.path, change.status) for change in changes) == [
+        ("css/site.css", "deleted"), ("styles/site.css", "added")]
+
+
+def test_cursor_older_than_log_means_everything_changed(tmp_path):
+    site = make_site(tmp_path / "site")
+    service = FileIndexService(log_size=2, watch=False)
+    cursor = service.cursor(str(site))
+    for name in ("a", "b", "c"):
+        (site / f"{name}.html").write_text(name)
+
+    changes, latest = service.changed_since(str(site), cursor)
+    assert changes is None and latest == cursor + 3
+    assert service.changed_since(str(site), latest) == ([], latest)
+
+
+def test_dev_server_serves_file_index(tmp_path, start_dev_server):
+    site = make_site(tmp_path / "site")
+    observer = dev_server.start_file_watcher(str(site), dev_server.ReloadBroadcaster())
+    index = FileIndexService(observer=observer)
+    httpd = start_dev_server(site, file_index=index)
+    base = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    try:
+        with urllib.request.urlopen(f"{base}/__files") as response:
+            listing = json.load(response)
+        assert listing["files"] == ["css/site.css", "index.html"]
+
+        (site / "index.html").write_text("<h1>Changed</h1>\n")
+
+        def changed():
+            with urllib.request.urlopen(f"{base}/__files?since={listing['cursor']}") as response:
+                return json.load(response)["changes"]
+        assert wait_for(lambda: changed() == [{"path": "index.html", "status": "modified"}])
+    finally:
+        index.close()
+        observer.stop()
+        observer.join()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for the conversation history backends
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+
+from conversation import Message
+from history_store import MemoryHistoryStore, SQLiteHistoryStore, create_history_store
+from main import CodexManager
+
+
+def test_history_survives_a_restart(tmp_path):
+    """A new manager on the same database resumes the conversation"""
+    db_path = str(tmp_path / "history.db")
+    store = SQLiteHistoryStore(db_path)
+    manager = CodexManager(history_store=store)
+    manager.add_to_conversation("s1", "user", "make the header blue")
+    manager.add_to_conversation("s1", "assistant", "done")
+    store.close()
+
+    restarted = SQLiteHistoryStore(db_path)
+    manager = CodexManager(history_store=restarted)
+    manager.get_or_create_session("s1")
+    history = manager.conversation_history["s1"]
+    restarted.close()
+
+    assert [(m.role, m.content) for m in history] == [("user", "make the header blue"), ("assistant", "done")]
+
+
+def test_writes_are_batched_and_trimmed(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.db"), max_messages=5, flush_interval=0.2)
+    for i in range(50):
+        store.append("s1", Message.from_dict({"role": "user", "content": f"m{i}", "timestamp": f"2026-01-01T00:00:{i:02d}"}))
+    store.flush()
+
+    assert [m.content for m in store.load("s1")] == [f"m{i}" for i in range(45, 50)]
+    assert store.stats()["batches_written"] < 50
+
+    store.clear("s1")
+    assert store.load("s1") == []
+    store.close()
+
+
+def test_reads_see_queued_writes_without_waiting_for_the_writer(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.db"), max_messages=3, flush_interval=5)
+    store.append("s1", Message.from_dict({"role": "user", "content": "committed", "timestamp": "2026-01-01T00:00:00"}))
+    store.flush()
+    for i in range(3):
+        store.append("s1", Message.from_dict({"role": "user", "content": f"m{i}", "timestamp": "2026-01-01T00:00:01"}))
+
+    started = time.perf_counter()
+    assert store.has_session("s1") and not store.has_session("s2")
+    assert [m.content for m in store.load("s1")] == ["m0", "m1", "m2"]
+    store.clear("s1")
+    store.append("s1", Message.from_dict({"role": "user", "content": "after", "timestamp": "2026-01-01T00:00:02"}))
+    assert [m.content for m in store.load("s1")] == ["after"]
+    # The writer is still filling its batch; reads answered from the overlay
+    assert time.perf_counter() - started < 0.5
+
+    store.close()
+    assert store.stats()["pending_sessions"] == 0
+
+
+def test_concurrent_reads_see_each_message_once(tmp_path):
+    """Readers never block the writer; the committed sequence deduplicates the overlay"""
+    store = SQLiteHistoryStore(str(tmp_path / "history.db"), max_messages=1000, batch_size=7, flush_interval=0.01)
+    inconsistent = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            contents = [m.content for m in store.load("s1")]
+            if contents != [str(i) for i in range(len(contents))]:
+                inconsistent.append(contents)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for i in range(300):
+        store.append("s1", Message("user", str(i)))
+        if i % 50 == 0:
+            time.sleep(0.005)
+    store.flush()
+    done.set()
+    reader.join()
+
+    assert inconsistent == []
+    assert [m.content for m in store.load("s1")] == [str(i) for i in range(300)]
+    assert store.stats()["batches_written"] > 1
+    store.close()
+
+
+def test_flush_commits_without_waiting_for_the_batch_window(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    store = SQLiteHistoryStore(db_path, flush_interval=5)
+    store.append("s1", Message.from_dict({"role": "user", "content": "hi", "timestamp": "2026-01-01T00:00:00"}))
+
+    started = time.perf_counter()
+    store.flush()
+    assert time.perf_counter() - started < 1
+    # Committed: a second store (another worker) sees it
+    other = SQLiteHistoryStore(db_path)
+    assert [m.content for m in other.load("s1")] == ["hi"]
+    assert store.stats()["operations_written"] == 1
+    other.close()
+    store.close()
+
+
+def test_database_uses_wal_and_session_index(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    SQLiteHistoryStore(db_path).close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(messages)")}
+    conn.close()
+    assert "idx_messages_session" in indexes
+
+
+def test_prune_deletes_inactive_sessions(tmp_path):
+    store = SQLiteHistoryStore(str(tmp_path / "history.db"))
+    store.append("old", Message.from_dict({"role": "user", "content": "hi", "timestamp": "2000-01-01T00:00:00"}))
+    store.prune(older_than=3600)
+    assert store.load("old") == []
+    store.close()
+
+
+def test_memory_backend_is_the_default():
+    assert isinstance(create_history_store("memory"), MemoryHistoryStore)
+    assert isinstance(CodexManager().history_store, MemoryHistoryStore)
+
+
+def test_second_worker_resumes_session_from_shared_store(tmp_path):
+    """Two managers on one database behave like two uvicorn workers"""
+    db_path = str(tmp_path / "history.db")
+    worker_a = CodexManager(history_store=SQLiteHistoryStore(db_path))
+    worker_b = CodexManager(history_store=SQLiteHistoryStore(db_path))
+
+    session_id, resumed = asyncio.run(worker_a.resume_session(None))
+    assert resumed is False
+    worker_a.add_to_conversation(session_id, "user", "first")
+    worker_a.history_store.flush()
+
+    assert asyncio.run(worker_b.resume_session(session_id)) == (session_id, True)
+    worker_b.add_to_conversation(session_id, "user", "second")
+    worker_b.history_store.flush()
+
+    # Back on the first worker, the stale in-memory copy is refreshed
+    assert asyncio.run(worker_a.resume_session(session_id)) == (session_id, True)
+    worker_a.get_or_create_session(session_id)
+    assert [m.content for m in worker_a.conversation_history[session_id]] == ["first", "second"]
+
+    worker_a.history_store.close()
+    worker_b.history_store.close()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for dev_server's push-based live reload over Server-Sent Events
+"""
+import http.client
+import json
+import urllib.request
+
+import pytest
+from watchdog.events import FileModifiedEvent
+
+import dev_server
+from file_events import ChangeSet
+
+
+@pytest.fixture
+def server(tmp_path, start_dev_server):
+    (tmp_path / "index.html").write_text("<html><body><h1>Home</h1></body></html>")
+    (tmp_path / "css").mkdir()
+    broadcaster = dev_server.ReloadBroadcaster(heartbeat=0.2)
+    httpd = start_dev_server(tmp_path, broadcaster=broadcaster)
+    yield httpd, broadcaster, tmp_path
+    broadcaster.close()
+
+
+def open_stream(httpd):
+    connection = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+    connection.request("GET", "/__reload")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "text/event-stream"
+    assert response.readline() == b"retry: 1000\n"
+    assert response.readline() == b"\n"
+    return connection, response
+
+
+def read_event(response):
+    """Next event as (name, data), skipping heartbeat comments"""
+    name = data = None
+    while True:
+        line = response.readline().decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            name = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+        elif line == "" and name is not None:
+            return name, data
+
+
+def test_html_pages_get_the_push_script(server):
+    httpd, _, _ = server
+    with urllib.request.urlopen(f"http://127.0.0.1:{httpd.server_address[1]}/index.html") as response:
+        page = response.read().decode("utf-8")
+    assert "new EventSource('/__reload')" in page
+    assert "method: 'HEAD'" not in page
+    assert page.index("EventSource") < page.index("</body>")
+
+
+def test_watcher_events_are_pushed_to_every_page(server):
+    httpd, broadcaster, root = server
+    streams = [open_stream(httpd) for _ in range(3)]
+    handler = dev_server.AutoReloadHandler(broadcaster, str(root))
+
+    # A batch that only edits stylesheets is hot-swapped
+    handler.handle_changes(ChangeSet([], ["css/site.css"], [], []))
+    for _, response in streams:
+        assert read_event(response) == ("css", {"paths": ["/css/site.css"]})
+
+    # Watcher events are batched: two saves of the page and a stylesheet edit make one reload
+    handler.on_modified(FileModifiedEvent(str(root / "index.html")))
+    handler.on_modified(FileModifiedEvent(str(root / "css" / "site.css")))
+    handler.on_modified(FileModifiedEvent(str(root / "index.html")))
+    for _, response in streams:
+        assert read_event(response) == ("reload", {"paths": ["/css/site.css", "/index.html"]})
+    handler.close()
+    assert handler.batcher.batches == 1
+
+    for connection, _ in streams:
+        connection.close()
+
+
+def test_idle_pages_cost_no_requests(server):
+    httpd, broadcaster, _ = server
+    connection, response = open_stream(httpd)
+    # Nothing changed: the open stream only carries heartbeat comments
+    assert response.readline() == b": ping\n"
+    assert len(broadcaster.clients) == 1
+    connection.close()
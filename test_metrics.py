@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry and the /metrics endpoint
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from main import CodexManager
+from metrics import Registry
+from test_codex_streaming import install_fake_codex
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ["code"], buckets=(0.1, 1))
+    histogram.observe(0.05, code=0)
+    histogram.observe(0.1, code=0)
+    histogram.observe(5, code=0)
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{code="0",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{code="0",le="1"} 2' in text
+    assert 'latency_seconds_bucket{code="0",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{code="0"} 3' in text
+    assert 'latency_seconds_sum{code="0"} 5.15' in text
+
+
+def test_counter_and_callback_gauge():
+    registry = Registry()
+    counter = registry.counter("sent_bytes_total", "Bytes")
+    counter.inc(10)
+    counter.inc(5)
+    depth = [3]
+    registry.gauge("queue_depth", "Depth", lambda: depth[0])
+
+    text = registry.render()
+    assert "sent_bytes_total 15" in text
+    assert "queue_depth 3" in text
+    depth[0] = 0
+    assert "queue_depth 0" in registry.render()
+
+
+def test_codex_runs_recorded_by_exit_code(tmp_path, monkeypatch):
+    manager = CodexManager()
+    runs = main.CODEX_RUN_SECONDS
+    before_ok, before_fail = runs.count(exit_code=0), runs.count(exit_code=3)
+    before_first_output = main.CODEX_FIRST_OUTPUT_SECONDS.count()
+
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho 'hello'\n")
+    asyncio.run(manager.execute_ai_chat("hi", "session", str(tmp_path), False))
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\nexit 3\n")
+    asyncio.run(manager.execute_ai_chat("hi", "session", str(tmp_path), False))
+
+    assert runs.count(exit_code=0) == before_ok + 1
+    assert runs.count(exit_code=3) == before_fail + 1
+    # Only the first run printed anything
+    assert main.CODEX_FIRST_OUTPUT_SECONDS.count() == before_first_output + 1
+
+
+def test_metrics_endpoint_reports_connections_and_bytes():
+    client = TestClient(main.app)
+    sent_before = main.WEBSOCKET_BYTES_SENT.value()
+
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()  # session frame
+        text = client.get("/metrics").text
+        assert "websocket_connections 1" in text
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "websocket_connections 0" in response.text
+    assert "# TYPE codex_queue_depth gauge" in response.text
+    assert main.WEBSOCKET_BYTES_SENT.value() > sent_before
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the /ready endpoint and its background probes
+"""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from codex_runner import CodexLauncher
+from readiness import CodexProbe, LoopLagMonitor, api_key_configured
+from scheduler import CodexScheduler
+from test_codex_streaming import install_fake_codex
+
+
+def test_probe_reports_version(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho 'codex-cli 0.1.2'\n")
+    probe = CodexProbe()
+    asyncio.run(probe.check())
+    assert probe.available
+    assert probe.version == "codex-cli 0.1.2"
+    assert probe.path == str(tmp_path / "codex")
+
+
+def test_probe_reports_missing_and_failing_binary(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    probe = CodexProbe()
+    asyncio.run(probe.check())
+    assert not probe.available
+    assert "not found" in probe.error
+
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\nexit 2\n")
+    asyncio.run(probe.check())
+    assert not probe.available
+    assert "exited with 2" in probe.error
+
+
+def test_probe_checks_the_launcher_binary(tmp_path, monkeypatch):
+    """CODEX_BINARY off PATH: /ready must probe the binary runs actually use"""
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    binary = tools / "codex-custom"
+    binary.write_text("#!/bin/sh\necho 'codex-cli 9.9'\n")
+    binary.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    probe = CodexProbe(launcher=CodexLauncher(str(binary)))
+    asyncio.run(probe.check())
+    assert probe.available
+    assert probe.path == str(binary) and probe.version == "codex-cli 9.9"
+
+
+def test_api_key_placeholder_is_not_configured(monkeypatch):
+    for name in ("OPENAI_API_KEY", "AZURE_OPENAI_API_KEY", "OPENROUTER_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "your-openai-api-key-here")
+    assert not api_key_configured()
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "real-key")
+    assert api_key_configured()
+
+
+def test_loop_lag_monitor_detects_blocking():
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.01)
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # block the loop
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.max_recent >= 0.15
+
+
+def make_ready_client(tmp_path, monkeypatch, scheduler=None):
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho 'codex 1.0'\n")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    probe = CodexProbe()
+    asyncio.run(probe.check())
+    monkeypatch.setattr(main, "codex_probe", probe)
+    monkeypatch.setattr(main, "loop_monitor", LoopLagMonitor())
+    monkeypatch.setattr(main, "codex_scheduler", scheduler or CodexScheduler(max_concurrency=1, max_queue=5))
+    return TestClient(main.app)
+
+
+def test_ready_when_all_checks_pass(tmp_path, monkeypatch):
+    client = make_ready_client(tmp_path, monkeypatch)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["codex"]["version"] == "codex 1.0"
+    assert body["scheduler"]["saturation"] == 0
+
+
+def test_not_ready_when_saturated_or_broken(tmp_path, monkeypatch):
+    scheduler = CodexScheduler(max_concurrency=1, max_queue=5)
+    client = make_ready_client(tmp_path, monkeypatch, scheduler)
+    scheduler.queued = 4
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert any("saturated" in reason for reason in response.json()["reasons"])
+
+    scheduler.queued = 0
+    main.codex_probe.error = "codex not found on PATH"
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["reasons"] == ["codex unavailable: codex not found on PATH"]
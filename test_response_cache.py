@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the read-only response cache
+"""
+import asyncio
+import os
+
+import response_cache
+from main import CodexManager
+from file_index import FileIndexService
+from response_cache import ResponseCache, make_cache_key
+from test_codex_streaming import install_fake_codex
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "C"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=10, ttl=5)
+    cache.put("key", "value")
+
+    now[0] += 4
+    assert cache.get("key") == "value"
+    now[0] += 2
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_key_changes_with_workspace_contents(tmp_path):
+    page = tmp_path / "index.html"
+    page.write_text("<h1>v1</h1>")
+    (tmp_path / ".git").mkdir()
+    # Unwatched, so every call rescans: the same fingerprint the watched index converges to
+    index = FileIndexService(watch=False)
+    before = make_cache_key("explain  this page", str(tmp_path), index.fingerprint(str(tmp_path)))
+
+    (tmp_path / ".git" / "HEAD").write_text("ignored")
+    assert make_cache_key("explain this page", str(tmp_path), index.fingerprint(str(tmp_path))) == before
+
+    page.write_text("<h1>version 2</h1>")
+    os.utime(page, ns=(0, 1))
+    assert make_cache_key("explain this page", str(tmp_path), index.fingerprint(str(tmp_path))) != before
+
+
+def test_repeated_read_only_question_skips_codex(tmp_path, monkeypatch):
+    """A second identical question in a fresh session is served from the cache"""
+    calls = tmp_path / "calls"
+    install_fake_codex(tmp_path, monkeypatch, f"""#!/bin/sh
+echo run >> {calls}
+echo '{{"type":"message","role":"assistant","content":"It is a landing page"}}'
+""")
+    workspace = tmp_path / "site"
+    workspace.mkdir()
+    manager = CodexManager()
+
+    async def ask(session_id):
+        key = await manager.response_cache_key("explain this page", session_id, str(workspace))
+        cached = await manager.get_cached_response("explain this page", session_id, key)
+        if cached is not None:
+            return cached
+        return await manager.execute_ai_chat("explain this page", session_id, str(workspace), False, cache_key=key)
+
+    first = asyncio.run(ask("s1"))
+    second = asyncio.run(ask("s2"))
+
+    assert first["stdout"] == second["stdout"] == "It is a landing page"
+    assert second["cached"] is True
+    assert (first["backend"], second["backend"]) == ("cli", "cache")
+    assert calls.read_text().count("run") == 1
+    assert manager.response_cache.stats()["hits"] == 1
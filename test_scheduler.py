@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded, round-robin Codex job scheduler
+"""
+import asyncio
+
+import pytest
+
+from scheduler import QUEUED, STARTED, CodexScheduler, SchedulerFullError
+
+
+def test_concurrency_is_bounded():
+    """No more than max_concurrency jobs ever run at once"""
+    async def scenario():
+        scheduler = CodexScheduler(max_concurrency=2, max_queue=10)
+        active = 0
+        peak = 0
+
+        async def job():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        await asyncio.gather(*(scheduler.run(f"s{i}", job) for i in range(8)))
+        return peak, scheduler.stats()
+
+    peak, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats["running"] == 0
+    assert stats["queued"] == 0
+
+
+def test_sessions_are_served_round_robin():
+    """A session with many queued jobs does not starve the others"""
+    async def scenario():
+        scheduler = CodexScheduler(max_concurrency=1, max_queue=10)
+        started = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def job(name):
+            started.append(name)
+
+        first = asyncio.create_task(scheduler.run("busy", blocker))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(scheduler.run("busy", lambda n=f"busy{i}": job(n))) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(scheduler.run("other", lambda: job("other0"))))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        return started
+
+    assert asyncio.run(scenario()) == ["busy0", "other0", "busy1", "busy2"]
+
+
+def test_full_queue_rejects_early_and_reports_positions():
+    """Queued jobs learn their position; overflow raises immediately"""
+    async def scenario():
+        scheduler = CodexScheduler(max_concurrency=1, max_queue=2)
+        gate = asyncio.Event()
+        statuses = []
+
+        async def record(status, position):
+            statuses.append((status, position))
+
+        async def blocker():
+            await gate.wait()
+
+        async def noop():
+            return "done"
+
+        running = asyncio.create_task(scheduler.run("a", blocker))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(scheduler.run(f"s{i}", noop, record if i == 1 else None)) for i in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SchedulerFullError):
+            await scheduler.run("late", noop)
+        assert scheduler.stats()["rejected"] == 1
+
+        gate.set()
+        results = await asyncio.gather(*waiting)
+        await running
+        return statuses, results
+
+    statuses, results = asyncio.run(scenario())
+    assert results == ["done", "done"]
+    assert statuses == [(QUEUED, 2), (QUEUED, 1), (STARTED, 0)]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    """Cancelling a queued job frees its queue slot"""
+    async def scenario():
+        scheduler = CodexScheduler(max_concurrency=1, max_queue=5)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        running = asyncio.create_task(scheduler.run("a", blocker))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.run("b", blocker))
+        await asyncio.sleep(0)
+        assert scheduler.queued == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        queued_after_cancel = scheduler.queued
+        gate.set()
+        await running
+        return queued_after_cancel, scheduler.stats()
+
+    queued_after_cancel, stats = asyncio.run(scenario())
+    assert queued_after_cancel == 0
+    assert stats["running"] == 0
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for CodexManager session expiry and memory bounds
+"""
+import time
+
+from main import CodexManager
+
+
+def test_idle_sessions_expire_unless_attached():
+    manager = CodexManager(session_ttl=10, max_sessions=100)
+    manager.add_to_conversation("idle", "user", "hello")
+    manager.add_to_conversation("connected", "user", "hello")
+    manager.attach_session("connected")
+
+    assert manager.evict_sessions(now=time.monotonic() + 5) == 0
+    assert manager.evict_sessions(now=time.monotonic() + 11) == 1
+    assert "idle" not in manager.sessions
+    assert "idle" not in manager.conversation_history
+    assert "connected" in manager.sessions
+
+    manager.detach_session("connected")
+    assert manager.evict_sessions(now=time.monotonic() + 11) == 1
+    assert manager.session_stats()["sessions"] == 0
+
+
+def test_session_cap_evicts_least_recently_used():
+    manager = CodexManager(session_ttl=3600, max_sessions=3)
+    for name in ("a", "b", "c"):
+        manager.get_or_create_session(name)
+    manager.get_or_create_session("a")  # "b" is now the least recently used
+    manager.get_or_create_session("d")
+
+    assert list(manager.sessions) == ["c", "a", "d"]
+    assert manager.session_stats()["evicted"] == 1
+
+
+def test_session_stats_reports_memory():
+    manager = CodexManager()
+    empty = manager.session_stats()["approx_bytes"]
+    for i in range(10):
+        manager.add_to_conversation("s", "user", "x" * 1000)
+
+    stats = manager.session_stats()
+    assert stats["sessions"] == 1
+    assert stats["messages"] == 10
+    assert stats["approx_bytes"] > empty + 10 * 1000
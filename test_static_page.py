@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached, precompressed homepage
+"""
+import gzip
+import os
+
+from fastapi.testclient import TestClient
+
+import main
+from static_page import CachedPage, choose_encoding
+
+
+def make_client(tmp_path, monkeypatch, html="<html><body>" + "hello " * 200 + "</body></html>"):
+    page = tmp_path / "index.html"
+    page.write_text(html)
+    cached = CachedPage(str(page), check_interval=0)
+    monkeypatch.setattr(main, "homepage", cached)
+    return TestClient(main.app), page, cached
+
+
+def test_choose_encoding_honours_preference_and_q_values():
+    assert choose_encoding("gzip, deflate, br", ("br", "gzip")) == "br"
+    assert choose_encoding("br;q=0, gzip", ("br", "gzip")) == "gzip"
+    assert choose_encoding("identity", ("gzip",)) is None
+    assert choose_encoding(None, ("gzip",)) is None
+
+
+def test_homepage_served_compressed_and_read_once(tmp_path, monkeypatch):
+    client, page, cached = make_client(tmp_path, monkeypatch)
+
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert "hello" in first.text  # httpx decodes the gzip body
+    assert second.headers["etag"] == first.headers["etag"]
+    assert cached.loads == 1
+
+    plain = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == page.read_bytes()
+    assert plain.headers["etag"] != first.headers["etag"]
+
+
+def test_conditional_requests_return_304(tmp_path, monkeypatch):
+    client, _, _ = make_client(tmp_path, monkeypatch)
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    by_etag = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert by_etag.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == etag
+
+    by_date = client.get("/", headers={"Accept-Encoding": "gzip", "If-Modified-Since": last_modified})
+    assert by_date.status_code == 304
+
+    stale = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": '"something-else"'})
+    assert stale.status_code == 200
+
+
+def test_file_change_invalidates_cache(tmp_path, monkeypatch):
+    client, page, cached = make_client(tmp_path, monkeypatch)
+    etag = client.get("/").headers["etag"]
+
+    page.write_text("<html>updated</html>")
+    stat = page.stat()
+    os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.text == "<html>updated</html>"
+    assert cached.loads == 2
+
+
+def test_head_and_missing_file(tmp_path, monkeypatch):
+    client, page, _ = make_client(tmp_path, monkeypatch)
+    head = client.head("/", headers={"Accept-Encoding": "gzip"})
+    assert head.status_code == 200
+    assert int(head.headers["content-length"]) == len(gzip.compress(page.read_bytes(), 9, mtime=0))
+
+    page.unlink()
+    assert client.get("/").status_code == 404
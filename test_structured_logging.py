@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for queue-based structured logging
+"""
+import io
+import json
+import logging
+import queue
+
+import structured_logging
+from structured_logging import (DroppingQueueHandler, SamplingFilter, StructuredFormatter,
+                                configure_logging, get_logger, log_event, redact)
+
+
+def make_record(event, sample=False, **fields):
+    record = logging.LogRecord("cms.test", logging.INFO, __file__, 1, event, None, None)
+    record.fields = fields
+    record.sample = sample
+    return record
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(make_record("event"))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_sampling_keeps_one_in_n_per_event():
+    sampler = SamplingFilter(0.25)
+    kept = [sampler.filter(make_record("ws.message", sample=True)) for _ in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+    # Unsampled events always pass, and other sampled events keep their own count
+    assert sampler.filter(make_record("ws.connect"))
+    assert sampler.filter(make_record("ws.command", sample=True))
+
+
+def test_formatters_render_fields():
+    record = make_record("codex.exit", exit_code=0, stderr="two words")
+    text = StructuredFormatter("text").format(record)
+    assert text.endswith('INFO    cms.test codex.exit exit_code=0 stderr="two words"')
+
+    entry = json.loads(StructuredFormatter("json").format(record))
+    assert entry["event"] == "codex.exit"
+    assert entry["exit_code"] == 0
+    assert entry["level"] == "INFO"
+
+
+def test_prompts_redacted_unless_enabled(monkeypatch):
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", stream=stream)
+    try:
+        log_event(get_logger("test"), logging.INFO, "ai_chat.request", prompt=redact("secret plans"))
+        log_event(get_logger("test"), logging.DEBUG, "ws.message", sample=True)
+    finally:
+        structured_logging.shutdown_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["logger"] == "cms.test"
+    assert "secret" not in entry["prompt"]
+    assert entry["prompt"].startswith("<redacted 12 chars sha256:")
+
+    monkeypatch.setenv("LOG_PROMPTS", "1")
+    configure_logging(stream=io.StringIO())
+    try:
+        assert redact("secret plans") == "secret plans"
+    finally:
+        monkeypatch.delenv("LOG_PROMPTS")
+        configure_logging()
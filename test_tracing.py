@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request tracing and /debug/traces
+"""
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from test_codex_streaming import install_fake_codex
+from test_websocket_commands import receive_until
+from tracing import NULL_TRACE, Tracer, current_trace, percentile, use_trace
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([7.0], 90) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_ring_buffer_keeps_latest_traces():
+    tracer = Tracer(capacity=2)
+    for index in range(3):
+        trace = tracer.start("ai_chat", index=index)
+        with trace.span("work"):
+            pass
+        tracer.finish(trace)
+
+    recent = tracer.recent()
+    assert [t["attrs"]["index"] for t in recent] == [2, 1]
+    assert tracer.recorded == 3
+    assert tracer.summary()["work"]["count"] == 2
+
+
+def test_use_trace_scopes_the_current_trace():
+    tracer = Tracer()
+    trace = tracer.start("ai_chat")
+    assert current_trace() is NULL_TRACE
+    with use_trace(trace):
+        current_trace().add_span("inner", time.perf_counter())
+    assert current_trace() is NULL_TRACE
+    assert [span[0] for span in trace.spans] == ["inner"]
+
+    # Spans recorded outside any trace are discarded
+    current_trace().add_span("orphan", time.perf_counter())
+    assert NULL_TRACE.spans == []
+
+
+def test_ai_chat_request_traced_end_to_end(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho '{\"type\":\"message\",\"role\":\"assistant\",\"content\":\"hi\"}'\n")
+    monkeypatch.setattr(main, "tracer", Tracer(capacity=10))
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        ws.receive_json()  # session frame
+        ws.send_json({"type": "ai_chat", "prompt": "hello", "workspace": str(tmp_path),
+                      "auto_save": True, "request_id": "r1"})
+        receive_until(ws, "ai_response")
+
+    # The trace is finished just after the response frame is sent
+    deadline = time.monotonic() + 2
+    body = client.get("/debug/traces").json()
+    while not body["traces"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+        body = client.get("/debug/traces").json()
+    trace = body["traces"][0]
+    assert trace["status"] == "ok"
+    assert trace["attrs"]["request_id"] == "r1"
+    names = [span["name"] for span in trace["spans"]]
+    for expected in ("decode", "queue_wait", "context", "spawn", "first_output", "parse", "exit", "send"):
+        assert expected in names
+    assert body["summary"]["total"]["count"] == 1
+    assert "p99_ms" in body["summary"]["spawn"]
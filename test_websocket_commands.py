@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for /ws command dispatch using FastAPI's TestClient and a fake codex CLI
+"""
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+from test_codex_streaming import install_fake_codex
+
+SLOW_CODEX = """#!/bin/sh
+sleep 0.5
+echo '{"type":"message","role":"assistant","content":"slow answer"}'
+"""
+
+
+def receive_until(ws, frame_type):
+    """Collect frames until one of the given type arrives"""
+    frames = []
+    while True:
+        frame = ws.receive_json()
+        frames.append(frame)
+        if frame["type"] == frame_type:
+            return frames
+
+
+def test_quick_commands_answered_while_ai_job_runs(tmp_path, monkeypatch):
+    """History requests are served immediately while a Codex run is in flight"""
+    install_fake_codex(tmp_path, monkeypatch, SLOW_CODEX)
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"type": "ai_chat", "prompt": "hello", "workspace": str(tmp_path),
+                                 "auto_save": False, "request_id": "chat-1"}))
+        ws.send_text(json.dumps({"type": "get_conversation_history", "request_id": "hist-1"}))
+
+        frames = receive_until(ws, "conversation_history")
+        history = frames[-1]
+        assert history["request_id"] == "hist-1"
+        assert history["active_requests"] == 1
+        assert all(frame["type"] != "ai_response" for frame in frames)
+
+        frames = receive_until(ws, "ai_response")
+        assert frames[-1]["request_id"] == "chat-1"
+        assert frames[-1]["result"]["stdout"] == "slow answer"
+        assert all(frame["request_id"] == "chat-1" for frame in frames)
+
+
+def test_second_ai_chat_rejected_while_one_runs(tmp_path, monkeypatch):
+    """A socket runs one AI job at a time; quick commands still go through"""
+    install_fake_codex(tmp_path, monkeypatch, SLOW_CODEX)
+    monkeypatch.setattr(main, "codex_manager", main.CodexManager())
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"type": "ai_chat", "prompt": "p0", "workspace": str(tmp_path),
+                                 "request_id": "chat-1"}))
+        ws.send_text(json.dumps({"type": "ai_chat", "prompt": "p1", "workspace": str(tmp_path),
+                                 "request_id": "chat-2"}))
+
+        frames = receive_until(ws, "error")
+        rejected = frames[-1]
+        assert rejected["request_id"] == "chat-2"
+        assert rejected["busy"] is True and rejected["active_request_ids"] == ["chat-1"]
+
+        frames = receive_until(ws, "ai_response")
+        assert frames[-1]["request_id"] == "chat-1"
+        ws.send_text(json.dumps({"type": "get_conversation_history", "request_id": "hist-1"}))
+        history = receive_until(ws, "conversation_history")[-1]["history"]
+    assert [(m["role"], m["content"]) for m in history] == [("user", "p0"), ("assistant", "slow answer")]
+
+
+def test_unknown_command_echoes_request_id():
+    """Errors are correlated with the request that caused them"""
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws") as ws:
+        assert ws.receive_json()["type"] == "session"
+        ws.send_text(json.dumps({"type": "nope", "request_id": 7}))
+        frame = ws.receive_json()
+    assert frame == {"type": "error", "message": "Unknown command type: nope", "request_id": 7}
+
+
+def test_cancel_command_stops_running_request(tmp_path, monkeypatch):
+    """A cancel frame ends the targeted request with a cancelled response"""
+    install_fake_codex(tmp_path, monkeypatch, "#!/bin/sh\necho started\nsleep 30\n")
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"type": "ai_chat", "prompt": "hello", "workspace": str(tmp_path),
+                                 "auto_save": False, "stream": True, "request_id": "chat-1"}))
+        receive_until(ws, "ai_response_chunk")
+        ws.send_text(json.dumps({"type": "cancel", "target_request_id": "chat-1", "request_id": "c-1"}))
+
+        frames = receive_until(ws, "ai_response")
+        cancelled = next(frame for frame in frames if frame["type"] == "cancelled")
+        assert cancelled["cancelled"] == ["chat-1"]
+        assert frames[-1]["request_id"] == "chat-1"
+        assert frames[-1]["result"]["cancelled"] is True
+
+
+def test_session_token_resumes_conversation(tmp_path, monkeypatch):
+    """Reconnecting with the issued token restores the same session"""
+    monkeypatch.setattr(main, "codex_manager", main.CodexManager())
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        session = ws.receive_json()
+        assert session["resumed"] is False
+        main.codex_manager.add_to_conversation(session["session_id"], "user", "remember me")
+
+    with client.websocket_connect(f"/ws?session_token={session['session_token']}") as ws:
+        resumed = ws.receive_json()
+        ws.send_text(json.dumps({"type": "get_conversation_history"}))
+        history = ws.receive_json()["history"]
+
+    assert resumed["resumed"] is True
+    assert resumed["session_id"] == session["session_id"]
+    assert [m["content"] for m in history] == ["remember me"]
+
+    with client.websocket_connect("/ws?session_token=not-a-uuid") as ws:
+        assert ws.receive_json()["resumed"] is False
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for workspace snapshots and the files_changed frame sent after edit runs
+"""
+import asyncio
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+import main
+from test_codex_streaming import install_fake_codex
+from test_websocket_commands import receive_until
+from workspace_index import WorkspaceIndex
+
+EDITING_CODEX = """#!/bin/sh
+printf '<h1>New title</h1>\\n<p>Body</p>\\n' > index.html
+rm old.css
+echo 'body { margin: 0 }' > site.css
+echo '{"type":"message","role":"assistant","content":"Updated the title"}'
+"""
+
+
+def make_site(root):
+    root.mkdir()
+    (root / "index.html").write_text("<h1>Old title</h1>\n<p>Body</p>\n")
+    (root / "old.css").write_text("p { color: red }\n")
+    (root / "node_modules").mkdir()
+    (root / "node_modules" / "lib.js").write_text("ignored\n")
+    return root
+
+
+def test_refresh_reports_added_modified_and_deleted(tmp_path):
+    site = make_site(tmp_path / "site")
+    index = WorkspaceIndex(str(site))
+
+    assert index.refresh() == []  # baseline
+    assert sorted(index.files) == ["index.html", "old.css"]
+    index.keep_contents()
+
+    (site / "index.html").write_text("<h1>New title</h1>\n<p>Body</p>\n")
+    (site / "old.css").unlink()
+    (site / "site.css").write_text("body { margin: 0 }\n")
+    changes = {change.path: change for change in index.refresh()}
+
+    assert {path: change.status for path, change in changes.items()} == {
+        "index.html": "modified", "old.css": "deleted", "site.css": "added"}
+    assert "-<h1>Old title</h1>\n+<h1>New title</h1>\n" in changes["index.html"].diff
+    assert changes["index.html"].diff.startswith("--- a/index.html\n+++ b/index.html\n")
+    assert changes["site.css"].diff.endswith("+body { margin: 0 }\n")
+
+
+def test_baseline_is_stat_only(tmp_path):
+    site = make_site(tmp_path / "site")
+    index = WorkspaceIndex(str(site))
+    index.refresh()
+    assert index.files_read == 0
+
+    # Without kept contents a change is reported from stat alone, without a diff
+    (site / "index.html").write_text("<h1>New title</h1>\n")
+    (site / "site.css").write_text("a {}\n")
+    changes = {change.path: change for change in index.refresh()}
+    assert {path: change.status for path, change in changes.items()} == {
+        "index.html": "modified", "site.css": "added"}
+    assert all(change.diff is None for change in changes.values())
+    assert index.files_read == 0
+
+
+def test_unchanged_files_are_not_read_again(tmp_path):
+    site = make_site(tmp_path / "site")
+    index = WorkspaceIndex(str(site))
+    index.refresh()
+    index.keep_contents()
+    index.keep_contents()  # only the first call reads
+    reads = index.files_read
+    assert reads == 2
+
+    (site / "site.css").write_text("a {}\n")
+    index.refresh()
+    assert index.files_read == reads + 1
+
+    # Touching a file without changing it is not reported
+    stat = os.stat(site / "index.html")
+    os.utime(site / "index.html", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert index.refresh(["index.html"]) == []
+
+
+def test_large_and_binary_files_listed_without_diff(tmp_path):
+    site = make_site(tmp_path / "site")
+    index = WorkspaceIndex(str(site), max_diff_bytes=64)
+    index.refresh()
+    index.keep_contents()
+
+    (site / "logo.png").write_bytes(b"\x89PNG\0\0")
+    (site / "index.html").write_text("x" * 200)
+    changes = {change.path: change for change in index.refresh()}
+
+    assert changes["logo.png"].status == "added" and changes["logo.png"].diff is None
+    assert changes["index.html"].status == "modified" and changes["index.html"].diff is None
+
+
+def test_edit_run_sends_files_changed_frame(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, EDITING_CODEX)
+    site = make_site(tmp_path / "site")
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"type": "ai_chat", "prompt": "new title", "workspace": str(site),
+                                 "auto_save": True, "request_id": "edit-1"}))
+        frames = receive_until(ws, "ai_response")
+
+    changed = next(frame for frame in frames if frame["type"] == "files_changed")
+    assert changed["request_id"] == "edit-1"
+    statuses = {file["path"]: file["status"] for file in changed["files"]}
+    assert statuses == {"index.html": "modified", "old.css": "deleted", "site.css": "added"}
+    diffs = {file["path"]: file["diff"] for file in changed["files"]}
+    assert "-<h1>Old title</h1>\n+<h1>New title</h1>\n" in diffs["index.html"]
+    result = frames[-1]["result"]
+    assert result["success"] is True
+    assert sorted(result["files_changed"]) == ["index.html", "old.css", "site.css"]
+
+
+SLOW_EDITING_CODEX = """#!/bin/sh
+case "$*" in
+  *first*) sleep 0.3; echo '<p>first</p>' > first.html ;;
+  *) echo '<p>second</p>' > second.html ;;
+esac
+echo '{"type":"message","role":"assistant","content":"done"}'
+"""
+
+
+def test_concurrent_edit_runs_in_one_workspace_take_turns(tmp_path, monkeypatch):
+    install_fake_codex(tmp_path, monkeypatch, SLOW_EDITING_CODEX)
+    site = make_site(tmp_path / "site")
+    manager = main.CodexManager()
+
+    async def scenario():
+        first = asyncio.create_task(manager.execute_ai_chat("first", "s1", str(site), True))
+        await asyncio.sleep(0.05)  # the first run is in the workspace before the second asks
+        second = asyncio.create_task(manager.execute_ai_chat("second", "s2", str(site), True))
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+    manager.file_index.close()
+    assert [change["path"] for change in first["files_changed"]] == ["first.html"]
+    assert [change["path"] for change in second["files_changed"]] == ["second.html"]
+    assert manager.edit_locks == {}
@@ -0,0 +1,165 @@
+"""
+Lightweight per-request tracing.
+
+A Trace is a list of named spans, each an (offset, duration) pair relative to
+the start of the request, recorded with time.perf_counter(). The active trace
+travels in a ContextVar, so code deep in the call chain (CodexManager) can add
+spans without extra parameters, and tasks created while a trace is active
+inherit it. Finished traces go into a bounded ring buffer; /debug/traces
+reports the recent traces and per-span percentiles.
+
+Recording a span costs two perf_counter() calls and a tuple append, which is
+cheap enough to leave on in production. When no trace is active, spans are
+recorded on a shared no-op trace and discarded.
+"""
+
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# (name, start offset, duration) in seconds
+Span = Tuple[str, float, float]
+
+PERCENTILES = (50, 90, 99)
+
+
+class Trace:
+    """Spans recorded for one request"""
+
+    __slots__ = ("trace_id", "name", "attrs", "started", "wall_started", "spans", "duration", "status")
+
+    def __init__(self, trace_id: int, name: str, started: Optional[float] = None, **attrs):
+        self.trace_id = trace_id
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter() if started is None else started
+        self.wall_started = time.time() - (time.perf_counter() - self.started)
+        self.spans: List[Span] = []
+        self.duration: Optional[float] = None
+        self.status: Optional[str] = None
+
+    def add_span(self, name: str, start: float, end: Optional[float] = None):
+        """Record a span from perf_counter() readings taken by the caller"""
+        if end is None:
+            end = time.perf_counter()
+        self.spans.append((name, start - self.started, end - start))
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.wall_started,
+            "duration_ms": _ms(self.duration) if self.duration is not None else None,
+            "status": self.status,
+            "attrs": self.attrs,
+            "spans": [
+                {"name": name, "offset_ms": _ms(offset), "duration_ms": _ms(duration)}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+class _NullTrace(Trace):
+    """Stand-in used when no trace is active; records nothing"""
+
+    def add_span(self, name: str, start: float, end: Optional[float] = None):
+        pass
+
+
+NULL_TRACE = _NullTrace(0, "null")
+_current: ContextVar[Trace] = ContextVar("current_trace", default=NULL_TRACE)
+
+
+def current_trace() -> Trace:
+    """The trace of the request being handled, or a no-op trace"""
+    return _current.get()
+
+
+@contextmanager
+def use_trace(trace: Trace) -> Iterator[Trace]:
+    """Make trace current inside the block, including for tasks created there"""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Tracer:
+    """Creates traces and keeps the most recent finished ones"""
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self._finished: deque = deque(maxlen=max(capacity, 1))
+        self._ids = itertools.count(1)
+        self.recorded = 0
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build a tracer from CODEX_TRACE_BUFFER (0 disables tracing)"""
+        return cls(capacity=int(os.getenv("CODEX_TRACE_BUFFER", "500")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def start(self, name: str, started: Optional[float] = None, **attrs) -> Trace:
+        """Begin a trace; activate it with use_trace()"""
+        if not self.enabled:
+            return NULL_TRACE
+        return Trace(next(self._ids), name, started, **attrs)
+
+    def finish(self, trace: Trace, status: str = "ok"):
+        if trace is NULL_TRACE:
+            return
+        trace.duration = time.perf_counter() - trace.started
+        trace.status = status
+        self._finished.append(trace)
+        self.recorded += 1
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        """Most recent finished traces, newest first"""
+        traces = list(self._finished)[-limit:] if limit > 0 else []
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def summary(self) -> Dict[str, dict]:
+        """Per-span count and latency percentiles (ms) over the buffered traces"""
+        durations: Dict[str, List[float]] = {}
+        for trace in self._finished:
+            durations.setdefault("total", []).append(trace.duration)
+            for name, _, duration in trace.spans:
+                durations.setdefault(name, []).append(duration)
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            stats = {"count": len(values)}
+            for pct in PERCENTILES:
+                stats[f"p{pct}_ms"] = _ms(percentile(values, pct))
+            stats["max_ms"] = _ms(values[-1])
+            summary[name] = stats
+        return summary
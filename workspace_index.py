@@ -0,0 +1,249 @@
+"""
+Workspace snapshots for reporting which files a Codex run changed.
+
+WorkspaceIndex keeps the size and mtime of every file below a workspace. That
+is all the baseline scan collects, so indexing a workspace never reads file
+contents. Diffs need the previous content of a file, so keep_contents() reads
+the small files once and from then on every changed file is read again: a
+content hash spots touches that changed nothing, and for small text files a
+compressed copy is kept for the next diff. Only callers that want diffs (edit
+runs) pay for the reads and the memory.
+
+refresh() updates the snapshot in place: files whose size and mtime are
+unchanged keep their entry untouched. refresh(paths) limits the update to the
+given paths when the caller already knows what moved.
+
+Each refresh returns the FileChange list between the previous snapshot and the
+current one; once contents are kept, text files come with a unified diff.
+file_index.FileIndexService drives refresh(paths) from watchdog events.
+"""
+
+import difflib
+import hashlib
+import os
+import threading
+import zlib
+from stat import S_ISREG
+from typing import Dict, Iterable, List, Optional
+
+# Directories never indexed, fingerprinted or diffed
+IGNORED_DIRS = {".git", "node_modules", ".venv", "venv", "__pycache__", ".mypy_cache", ".pytest_cache"}
+
+ADDED = "added"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# Files larger than this are tracked by metadata only, without content or diff
+DEFAULT_MAX_DIFF_BYTES = 256 * 1024
+
+
+def _is_text(data: bytes) -> bool:
+    if b"\0" in data[:8192]:
+        return False
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+class FileState:
+    """What the index knows about one file"""
+
+    __slots__ = ("size", "mtime_ns", "_digest", "_content")
+
+    def __init__(self, size: int, mtime_ns: int):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self._digest: Optional[str] = None
+        # zlib-compressed UTF-8 text, None for binary, large or not yet read files
+        self._content: Optional[bytes] = None
+
+    def read(self, path: str, max_diff_bytes: int):
+        """Read the file, keeping its hash and, for small text files, its content"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        self._digest = hashlib.sha256(data).hexdigest()
+        if len(data) <= max_diff_bytes and _is_text(data):
+            self._content = zlib.compress(data, 1)
+
+    def digest(self, path: str, max_diff_bytes: int) -> Optional[str]:
+        """Content hash, reading large files only when first asked"""
+        if self._digest is None:
+            self.read(path, max_diff_bytes)
+        return self._digest
+
+    def text(self) -> Optional[str]:
+        if self._content is None:
+            return None
+        return zlib.decompress(self._content).decode("utf-8")
+
+
+class FileChange:
+    """One file that differs between two snapshots"""
+
+    __slots__ = ("path", "status", "size", "diff", "truncated")
+
+    def __init__(self, path: str, status: str, size: Optional[int], diff: Optional[str] = None,
+                 truncated: bool = False):
+        self.path = path
+        self.status = status
+        self.size = size
+        self.diff = diff
+        self.truncated = truncated
+
+    def to_dict(self) -> dict:
+        return {"path": self.path, "status": self.status, "size": self.size,
+                "diff": self.diff, "truncated": self.truncated}
+
+
+class WorkspaceIndex:
+    """Incrementally updated snapshot of one workspace directory"""
+
+    def __init__(self, root: str, ignored_dirs: Iterable[str] = IGNORED_DIRS,
+                 max_diff_bytes: int = DEFAULT_MAX_DIFF_BYTES):
+        self.root = os.path.realpath(root)
+        self.ignored_dirs = frozenset(ignored_dirs)
+        self.max_diff_bytes = max_diff_bytes
+        # Relative path (with forward slashes) -> state
+        self.files: Dict[str, FileState] = {}
+        self.scanned = False
+        # Set by keep_contents(); until then changes are detected from stat alone
+        self.keeping_contents = False
+        self.files_read = 0
+        self._lock = threading.Lock()
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _absolute(self, relative: str) -> str:
+        return os.path.join(self.root, *relative.split("/"))
+
+    def _ignored(self, relative: str) -> bool:
+        return any(part in self.ignored_dirs for part in relative.split("/")[:-1])
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        found = {}
+        # (absolute directory, its relative prefix), so no path has to be made relative again
+        stack = [(self.root, "")]
+        while stack:
+            directory, prefix = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignored_dirs:
+                            stack.append((entry.path, f"{prefix}{entry.name}/"))
+                    elif entry.is_file(follow_symlinks=False):
+                        found[prefix + entry.name] = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+        return found
+
+    def _stat_paths(self, paths: Iterable[str]) -> Dict[str, Optional[os.stat_result]]:
+        found = {}
+        for path in paths:
+            relative = self._relative(os.path.join(self.root, path))
+            if relative.startswith("..") or self._ignored(relative):
+                continue
+            try:
+                stat = os.stat(self._absolute(relative), follow_symlinks=False)
+            except OSError:
+                stat = None
+            found[relative] = stat if stat is not None and S_ISREG(stat.st_mode) else None
+        return found
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> List[FileChange]:
+        """Bring the snapshot up to date and return what changed since the last refresh.
+
+        Without paths the whole tree is stat'ed; with paths (absolute or
+        relative to the root) only those files are checked. The very first
+        refresh only records the baseline (stat only) and reports nothing.
+        """
+        with self._lock:
+            first = not self.scanned
+            if paths is None or first:
+                stats = self._walk()
+                removed = [relative for relative in self.files if relative not in stats]
+                self.scanned = True
+            else:
+                checked = self._stat_paths(paths)
+                stats = {relative: stat for relative, stat in checked.items() if stat is not None}
+                removed = [relative for relative, stat in checked.items()
+                           if stat is None and relative in self.files]
+
+            changes = []
+            for relative, stat in sorted(stats.items()):
+                old = self.files.get(relative)
+                if old is not None and old.size == stat.st_size and old.mtime_ns == stat.st_mtime_ns:
+                    continue
+                new = FileState(stat.st_size, stat.st_mtime_ns)
+                self.files[relative] = new
+                if first:
+                    continue
+                change = self._compare(relative, old, new)
+                if change is not None:
+                    changes.append(change)
+            for relative in sorted(removed):
+                old = self.files.pop(relative)
+                changes.append(self._diff(relative, DELETED, old, None))
+            return changes
+
+    def keep_contents(self):
+        """Read the small files once so later changes to them can be diffed"""
+        with self._lock:
+            if self.keeping_contents:
+                return
+            self.keeping_contents = True
+            for relative, state in self.files.items():
+                self._load(relative, state)
+
+    def _load(self, relative: str, state: FileState):
+        if state.size > self.max_diff_bytes:
+            return
+        self.files_read += 1
+        state.read(self._absolute(relative), self.max_diff_bytes)
+
+    def _compare(self, relative: str, old: Optional[FileState], new: FileState) -> Optional[FileChange]:
+        if not self.keeping_contents:
+            return FileChange(relative, MODIFIED if old is not None else ADDED, new.size)
+        self._load(relative, new)
+        if old is None:
+            return self._diff(relative, ADDED, None, new)
+        # A touch without a content change is not reported; large files are
+        # never read here, and the old content is gone, so they always count
+        if old._digest is not None and old._digest == new._digest:
+            return None
+        return self._diff(relative, MODIFIED, old, new)
+
+    def _diff(self, relative: str, status: str, old: Optional[FileState], new: Optional[FileState]) -> FileChange:
+        size = new.size if new is not None else None
+        old_text = "" if old is None else old.text()
+        new_text = "" if new is None else new.text()
+        if old_text is None or new_text is None:
+            # Binary or too large to keep: report the path only
+            return FileChange(relative, status, size)
+        lines = difflib.unified_diff(
+            old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+            fromfile="/dev/null" if old is None else f"a/{relative}",
+            tofile="/dev/null" if new is None else f"b/{relative}",
+        )
+        diff, truncated, length = [], False, 0
+        for line in lines:
+            if not line.endswith("\n"):
+                line += "\n\\ No newline at end of file\n"
+            length += len(line)
+            if length > self.max_diff_bytes:
+                truncated = True
+                break
+            diff.append(line)
+        return FileChange(relative, status, size, "".join(diff), truncated)
+
+    def stats(self) -> Dict[str, int]:
+        return {"files": len(self.files), "files_read": self.files_read}